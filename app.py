@@ -4,22 +4,31 @@
 APP.PY (Servidor Flask y Controlador de Tareas)
 ==============================================================================
 Este es el punto de entrada de la aplicación. Levanta un servidor web que
-escucha las peticiones de Node.js, ejecuta el orquestador en segundo plano
-y maneja los bloqueos (Locks) para no saturar el servidor.
+escucha las peticiones de Node.js, maneja la cola de trabajos (job_queue.py)
+para no saturar el servidor y manda cada render a un proceso de trabajo
+(worker_pool.py): este proceso solo encola, sube y notifica.
 """
 
 import os
+import time
 import threading
-import gc
+import json
 import logging
 import requests
-from flask import Flask, request, jsonify
+from datetime import datetime
+from flask import Flask, request, jsonify, Response, stream_with_context
 
-# Importamos nuestros módulos maestros
-import main_orchestrator
+# Importamos nuestros módulos maestros (el orquestador solo lo cargan los procesos de trabajo)
 import youtube_uploader
 import cloudflare_r2
-import subprocess
+import overlay_cache
+import asset_catalog
+import audio_library
+import ffmpeg_core
+import job_registry
+import job_queue
+import render_predictor
+import worker_pool
 
 # ==============================================================================
 # CONFIGURACIÓN INICIAL
@@ -34,15 +43,57 @@ PORT = int(os.getenv("PORT", 3001))
 
 app = Flask(__name__)
 
+# Los procesos de trabajo arrancan con 'spawn' y, si la API se lanzó con
+# 'python app.py', vuelven a importar este archivo como '__mp_main__': lo que
+# arranca hilos y procesos es solo de la API
+ES_PROCESO_API = __name__ != "__mp_main__"
+
+def preparar_assets():
+    """
+    Al arrancar (en segundo plano): cataloga templates, música y efectos con sus
+    metadatos, normaliza la sonoridad de música y efectos, y genera los overlays
+    en ping-pong de Pexels para que ningún render tenga que pagar el filtro 'reverse'.
+    """
+    asset_catalog.cargar_catalogo()
+    audio_library.preparar_biblioteca()
+    overlay_cache.precalentar_pingpong()
+
+if ES_PROCESO_API:
+    threading.Thread(target=preparar_assets, daemon=True).start()
+
 # ==============================================================================
-# SEMÁFORO DE PROCESAMIENTO (ANTI-COLAPSO)
+# COLA DE PROCESAMIENTO (ANTI-COLAPSO)
 # ==============================================================================
-# Este "Lock" asegura que solo se procese 1 video a la vez en todo el servidor.
-processing_lock = threading.Lock()
+# Los videos se producen de a uno y los demás esperan en la cola por carriles de
+# prioridad; los audios tienen su propio carril e hilo (job_queue.py). Cada render
+# corre en un proceso de trabajo que se recicla solo (worker_pool.py).
+if ES_PROCESO_API:
+    job_queue.iniciar()
+    worker_pool.iniciar()
+
+# Prioridades que acepta /generate_video ("priority") y su carril en la cola
+PRIORIDADES = {
+    "urgente": "urgente", "urgent": "urgente", "breaking": "urgente", "high": "urgente",
+    "normal": "normal",
+    "fondo": "fondo", "background": "fondo", "low": "fondo",
+}
 
-def _check_auth():
-    """Verifica que la petición venga de tu API en Node.js (Seguridad)."""
+# Las vistas previas tienen su propio candado: nunca esperan ni ocupan al de producción
+preview_lock = threading.Lock()
+
+# Stream de eventos de un trabajo: cada cuánto se revisa su estado y cada cuánto
+# se manda un comentario para que los proxies no corten la conexión
+INTERVALO_EVENTOS = 1.0
+SEGUNDOS_KEEPALIVE = 15
+
+def _check_auth(permitir_query=False):
+    """
+    Verifica que la petición venga de tu API en Node.js (Seguridad).
+    'permitir_query' acepta la clave en ?api_key= (EventSource no manda headers).
+    """
     api_key = request.headers.get('x-api-key')
+    if not api_key and permitir_query:
+        api_key = request.args.get('api_key')
     return api_key == ADMIN_API_KEY
 
 # ==============================================================================
@@ -86,95 +137,337 @@ def handle_generate_video():
             "article_id": article_id
         }), 200
 
-    # 4. Intentar adquirir el control del servidor (Lock)
-    if processing_lock.acquire(blocking=False):
-        logger.info(f"  [API] [Lock Adquirido] Iniciando producción para ID: {article_id}")
-        
-        # ----------------------------------------------------------------------
-        # HILO EN SEGUNDO PLANO (Background Task)
-        # ----------------------------------------------------------------------
-        def background_task():
-            try:
-                # Paso A: Fabricar el video (Llama al orquestador)
-                video_path = main_orchestrator.process_video_payload(payload)
-                
-                # Paso B: Subir a YouTube si se fabricó bien
-# Paso B: Subir a Cloudflare y YouTube
-                if video_path and os.path.exists(video_path):
-                    logger.info("  [Background] Video listo. Iniciando subidas...")
-                    
-                    # 1. Subir a Cloudflare R2
-                    nombre_video_r2 = f"video_{article_id}.mp4"
-                    url_r2 = cloudflare_r2.upload_media_to_r2(video_path, nombre_video_r2)
-                    
-                    # 2. Subir a YouTube
-                    youtube_id = youtube_uploader.upload_video(
-                        file_path=video_path,
-                        title=youtube_title,
-                        description=youtube_desc,
-                        tags=youtube_tags
-                    )
-                    
-                    # 3. Notificar a Node.js (Solo si se subió a R2 o a YouTube)
-                    if youtube_id or url_r2:
-                        if youtube_id:
-                            youtube_uploader.mark_as_processed(article_id, youtube_id)
-                            
-                        # Pasamos youtube_id Y url_r2 al webhook
-                        _notificar_webhook_node("video_complete", article_id, youtube_id=youtube_id, video_url=url_r2)
-                        
-                        # --- AUTODESTRUCCIÓN PARA LIBERAR ESPACIO ---
-                        try:
-                            os.remove(video_path)
-                            logger.info(f"  [Limpieza] Video borrado del disco: {video_path}")
-                            # Borrar también la miniatura si existe
-                            posible_jpg = video_path.rsplit('.', 1)[0] + '.jpg'
-                            if os.path.exists(posible_jpg):
-                                os.remove(posible_jpg)
-                        except Exception as e:
-                            logger.warning(f"  [Limpieza] No se pudo borrar el video: {e}")
-                        # --------------------------------------------
-                        
-                    else:
-                        logger.error("  [Background] Falló la subida a YouTube.")
-                        _notificar_webhook_node("video_failed", article_id, error="YouTube Upload Failed")
-                else:
-                    logger.error("  [Background] El orquestador no devolvió un video válido.")
-                    _notificar_webhook_node("video_failed", article_id, error="Video Generation Failed")
-
-            except Exception as e:
-                logger.error(f"  [Background] Error fatal en hilo de procesamiento: {e}")
-                _notificar_webhook_node("video_failed", article_id, error=str(e))
-                
-            finally:
-                # ¡CRÍTICO! Liberar el servidor para la siguiente noticia
-                processing_lock.release()
-                logger.info(f"  [API] [Lock Liberado] Servidor listo para nueva tarea.")
-                gc.collect()
-
-        # Lanzar el hilo
-        thread = threading.Thread(target=background_task)
-        thread.daemon = True
-        thread.start()
-
-        # 5. Respuesta inmediata a Node.js
+    carril = PRIORIDADES.get(str(payload.get('priority', 'normal')).lower())
+    if not carril:
+        return jsonify({"error": f"Prioridad inválida. Opciones: {', '.join(sorted(set(PRIORIDADES.values())))}."}), 400
+
+    # 4. "supersede": la versión corregida de la noticia cancela el render viejo
+    #    (mata sus FFmpeg y limpia sus temporales) o lo saca de la cola
+    activos = job_registry.activos_de_articulo(article_id)
+    if payload.get('supersede'):
+        for anterior in activos:
+            if job_registry.cancelar(anterior["id"], "reemplazado por una versión nueva"):
+                job_queue.retirar(anterior["id"])
+    elif activos:
+        # Reintento de una noticia que ya está en cola o en producción: mismo trabajo
+        logger.info(f"  [API] {article_id} ya tiene el trabajo {activos[0]['id']} en curso.")
         return jsonify({
-            "message": "Tarea matricial aceptada. Fabricando en segundo plano.",
+            "message": "La noticia ya está en producción.",
             "status": "processing",
-            "article_id": article_id
+            **_respuesta_cola(activos[0])
         }), 202
 
-    else:
-        # Si el servidor ya está haciendo un video, rechaza la petición
-        logger.warning(f"  [API] Servidor ocupado. Rechazando ID: {article_id}")
+    # 5. Encolar (la cola solo rechaza si está llena)
+    if job_queue.llena():
+        logger.warning(f"  [API] Cola llena. Rechazando ID: {article_id}")
         return jsonify({
-            "error": "El servidor está procesando otro video. Reintente en unos minutos."
+            "error": "Hay demasiados videos en cola. Reintente en unos minutos."
         }), 503
 
+    deadline = _leer_deadline(payload.get('deadline'))
+    trabajo = job_registry.crear_trabajo(
+        article_id, prediccion=render_predictor.predecir(payload), deadline=deadline, carril=carril
+    )
+    job_queue.encolar(trabajo, lambda: _procesar_trabajo(
+        trabajo, payload, youtube_title, youtube_desc, youtube_tags
+    ))
+    respuesta = _respuesta_cola(trabajo)
+    logger.info(f"  [API] Trabajo {trabajo['id']} aceptado para ID: {article_id} (posición {respuesta['queue_position']}, ETA {respuesta['eta_seconds']:.0f}s)")
+
+    # 6. Respuesta inmediata a Node.js
+    return jsonify({
+        "message": "Tarea matricial aceptada. Fabricando en segundo plano.",
+        "status": "processing",
+        **respuesta
+    }), 202
+
+def _respuesta_cola(trabajo):
+    """Id, lugar en la cola y ETA (en segundos y como momento) de un trabajo aceptado."""
+    estado = _estado_publico(trabajo)
+    eta = estado["eta_seconds"] or 0.0
+    return {
+        "article_id": trabajo["article_id"],
+        "job_id": trabajo["id"],
+        "lane": trabajo["carril"],
+        "queue_position": estado.get("queue_position", 0),
+        "eta_seconds": eta,
+        "estimated_ready_at": round(time.time() + eta),
+    }
+
+def _leer_deadline(valor):
+    """Plazo del pedido en epoch (segundos) o ISO 8601. None si no vino o no se entiende."""
+    if valor in (None, ""):
+        return None
+    try:
+        return float(valor)
+    except (TypeError, ValueError):
+        pass
+    try:
+        return datetime.fromisoformat(str(valor).replace("Z", "+00:00")).timestamp()
+    except ValueError:
+        logger.warning(f"  [API] Deadline ilegible ignorado: {valor}")
+        return None
+
+# ----------------------------------------------------------------------
+# TRABAJO EN SEGUNDO PLANO (lo arranca job_queue cuando le toca, de a uno)
+# ----------------------------------------------------------------------
+def _procesar_trabajo(trabajo, payload, youtube_title, youtube_desc, youtube_tags):
+    article_id = trabajo["article_id"]
+    estado_final = "fallido"
+    job_registry.marcar_inicio(trabajo["id"])
+    # Con la cola cargada el trabajo arranca en un escalón más barato (queda en su registro)
+    degradacion = job_queue.escalon_degradacion()
+    logger.info(
+        f"  [API] Iniciando producción para ID: {article_id} (trabajo {trabajo['id']}, "
+        f"calidad {degradacion['nombre'] if degradacion else 'completa'})"
+    )
+    try:
+        # Paso A: Fabricar el video (el orquestador, en un proceso de trabajo)
+        registro = trabajo["registro"]
+        # Entre escenas, un trabajo de "fondo" deja pasar a los urgentes (los demás
+        # carriles no se pausan: sin 'pausa' el proceso no consulta a la API en cada escena)
+        pausable = trabajo["carril"] in job_queue.CARRILES_PAUSABLES
+        video_path = worker_pool.procesar_video(
+            payload, registro, cancelacion=trabajo["cancelacion"],
+            pausa=(lambda: job_queue.ceder(trabajo)) if pausable else None,
+            degradacion=degradacion
+        )
+
+        # Cancelado (por DELETE o por una versión nueva): no se sube ni se notifica nada
+        if trabajo["cancelacion"].is_set():
+            logger.warning(f"  [Background] Trabajo {trabajo['id']} cancelado. Se descarta sin subir.")
+            _borrar_salidas(video_path, registro)
+            return
+
+        # Paso B: Subir a Cloudflare y YouTube
+        if video_path and os.path.exists(video_path):
+            logger.info("  [Background] Video listo. Iniciando subidas...")
+            job_registry.marcar_etapa(registro, "upload")
+
+            # 1. Subir a Cloudflare R2
+            nombre_video_r2 = f"video_{article_id}.mp4"
+            url_r2 = cloudflare_r2.upload_media_to_r2(video_path, nombre_video_r2)
+
+            # Variantes (Shorts / web) salidas de la misma pasada de render
+            variant_urls = {}
+            for variante, ruta_variante in registro.get("variantes", {}).items():
+                url_variante = cloudflare_r2.upload_media_to_r2(ruta_variante, f"video_{article_id}_{variante}.mp4")
+                if url_variante:
+                    variant_urls[variante] = url_variante
+
+            # 2. Subir a YouTube
+            youtube_id = youtube_uploader.upload_video(
+                file_path=video_path,
+                title=youtube_title,
+                description=youtube_desc,
+                tags=youtube_tags
+            )
+
+            # 3. Notificar a Node.js (Solo si se subió a R2 o a YouTube)
+            if youtube_id or url_r2:
+                if youtube_id:
+                    youtube_uploader.mark_as_processed(article_id, youtube_id)
+
+                # Pasamos youtube_id Y url_r2 al webhook
+                _notificar_webhook_node("video_complete", article_id, youtube_id=youtube_id, video_url=url_r2, variant_urls=variant_urls)
+                estado_final = "completado"
+
+                # --- AUTODESTRUCCIÓN PARA LIBERAR ESPACIO ---
+                _borrar_salidas(video_path, registro)
+                # --------------------------------------------
+
+            else:
+                logger.error("  [Background] Falló la subida a YouTube.")
+                _notificar_webhook_node("video_failed", article_id, error="YouTube Upload Failed")
+        else:
+            logger.error("  [Background] El orquestador no devolvió un video válido.")
+            _notificar_webhook_node("video_failed", article_id, error="Video Generation Failed")
+
+    except Exception as e:
+        logger.error(f"  [Background] Error fatal en hilo de procesamiento: {e}")
+        _notificar_webhook_node("video_failed", article_id, error=str(e))
+
+    finally:
+        job_registry.finalizar(trabajo["id"], estado_final)
+        # Cada trabajo completado afina la predicción de los siguientes
+        if trabajo["estado"] == "completado":
+            pausado = trabajo["registro"].get("tiempos_etapas", {}).get("pausa", 0.0)
+            render_predictor.registrar_trabajo(payload, trabajo["registro"], trabajo["fin"] - trabajo["inicio"] - pausado)
+        logger.info(f"  [API] Trabajo {trabajo['id']} terminado ({trabajo['estado']}). Servidor listo para el siguiente.")
+
+def _estado_publico(trabajo):
+    """resumen() del trabajo con su lugar en la cola y la espera sumada a la ETA."""
+    estado = job_registry.resumen(trabajo)
+    if trabajo["estado"] in ("en_cola", "pausado"):
+        posicion, espera = job_queue.espera_estimada(trabajo["id"])
+        estado["queue_position"] = posicion
+        if estado["eta_seconds"] is not None:
+            estado["eta_seconds"] = round(espera + estado["eta_seconds"], 1)
+    return estado
+
+@app.route('/queue', methods=['GET'])
+def handle_queue_status():
+    """
+    Latencia de cola por carril (media, p95, máxima), cuántos esperan en cada uno,
+    el escalón de degradación por carga vigente y los procesos de trabajo.
+    """
+    if not _check_auth():
+        logger.warning(f"  [API] Intento de acceso no autorizado desde {request.remote_addr}")
+        return jsonify({"error": "No autorizado. API Key inválida."}), 403
+    return jsonify({
+        "order": job_queue.ORDEN_COLA,
+        "lanes": job_queue.latencias(),
+        "degradation": job_queue.nivel_degradacion(),
+        "workers": worker_pool.estado()
+    }), 200
+
+@app.route('/jobs/<job_id>', methods=['GET'])
+def handle_job_status(job_id):
+    """Estado del trabajo: etapa (tts/fetch/render/concat/upload), escenas listas y ETA."""
+    if not _check_auth():
+        logger.warning(f"  [API] Intento de acceso no autorizado desde {request.remote_addr}")
+        return jsonify({"error": "No autorizado. API Key inválida."}), 403
+
+    trabajo = job_registry.obtener(job_id)
+    if not trabajo:
+        return jsonify({"error": "Trabajo inexistente.", "job_id": job_id}), 404
+    return jsonify(_estado_publico(trabajo)), 200
+
+@app.route('/jobs/<job_id>/events', methods=['GET'])
+def handle_job_events(job_id):
+    """
+    Server-Sent Events con el mismo estado que GET /jobs/<id>: un evento 'progress'
+    cada vez que algo cambia y uno 'end' cuando el trabajo termina.
+    """
+    if not _check_auth(permitir_query=True):
+        logger.warning(f"  [API] Intento de acceso no autorizado desde {request.remote_addr}")
+        return jsonify({"error": "No autorizado. API Key inválida."}), 403
+
+    trabajo = job_registry.obtener(job_id)
+    if not trabajo:
+        return jsonify({"error": "Trabajo inexistente.", "job_id": job_id}), 404
+
+    def eventos():
+        anterior = None
+        ultimo_envio = time.time()
+        while True:
+            estado = _estado_publico(trabajo)
+            # La ETA cambia en cada consulta: solo cuenta como novedad si cambió otra cosa
+            novedad = {k: v for k, v in estado.items() if k != "eta_seconds"}
+            if novedad != anterior:
+                anterior = novedad
+                ultimo_envio = time.time()
+                tipo = "end" if estado["status"] in job_registry.ESTADOS_FINALES else "progress"
+                yield f"event: {tipo}\ndata: {json.dumps(estado)}\n\n"
+                if tipo == "end":
+                    return
+            elif time.time() - ultimo_envio >= SEGUNDOS_KEEPALIVE:
+                ultimo_envio = time.time()
+                yield ": keepalive\n\n"
+            time.sleep(INTERVALO_EVENTOS)
+
+    return Response(
+        stream_with_context(eventos()),
+        mimetype="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+@app.route('/jobs/<job_id>', methods=['DELETE'])
+def handle_cancel_job(job_id):
+    """
+    Cancela un trabajo en curso: mata sus FFmpeg, corta el bucle de escenas y
+    limpia sus temporales. El servidor queda libre para el siguiente en segundos.
+    """
+    if not _check_auth():
+        logger.warning(f"  [API] Intento de acceso no autorizado desde {request.remote_addr}")
+        return jsonify({"error": "No autorizado. API Key inválida."}), 403
+
+    trabajo = job_registry.obtener(job_id)
+    if not trabajo:
+        return jsonify({"error": "Trabajo inexistente.", "job_id": job_id}), 404
+    if not job_registry.cancelar(job_id, "cancelado por la API"):
+        return jsonify({"error": "El trabajo ya terminó.", "job_id": job_id, "status": trabajo["estado"]}), 409
+    job_queue.retirar(job_id)  # Si todavía no había arrancado, sale de la cola y listo
+
+    return jsonify({
+        "message": "Cancelación en curso.",
+        "status": "cancelling",
+        "job_id": job_id,
+        "article_id": trabajo["article_id"]
+    }), 202
+
+def _borrar_salidas(video_path, registro):
+    """Borra del disco el video final, su miniatura y sus variantes."""
+    if not video_path:
+        return
+    rutas = [video_path, video_path.rsplit('.', 1)[0] + '.jpg', *registro.get("variantes", {}).values()]
+    for ruta in rutas:
+        try:
+            if os.path.exists(ruta):
+                os.remove(ruta)
+                logger.info(f"  [Limpieza] Borrado del disco: {ruta}")
+        except Exception as e:
+            logger.warning(f"  [Limpieza] No se pudo borrar {ruta}: {e}")
+
+@app.route('/preview', methods=['POST'])
+def handle_preview():
+    """
+    Vista previa para revisión editorial: renderiza el payload con el perfil 'draft'
+    (360p, 8 fps) y responde con la URL en la misma petición, en segundos.
+    No sube a YouTube, no notifica a Node.js y no usa el candado de producción.
+    """
+    if not _check_auth():
+        logger.warning(f"  [API] Intento de acceso no autorizado desde {request.remote_addr}")
+        return jsonify({"error": "No autorizado. API Key inválida."}), 403
+
+    payload = request.get_json()
+    if not payload:
+        return jsonify({"error": "No se envió un cuerpo JSON válido."}), 400
+
+    article_id = payload.get('article_id')
+    if not article_id or not payload.get('scenes'):
+        return jsonify({"error": "Faltan datos obligatorios: article_id o scenes."}), 400
+
+    if not preview_lock.acquire(blocking=False):
+        logger.warning(f"  [API] Ya hay una vista previa en curso. Rechazando ID: {article_id}")
+        return jsonify({"error": "Ya se está generando otra vista previa. Reintente en unos segundos."}), 503
+
+    video_path = None
+    try:
+        logger.info(f"  [API] [Preview] Renderizando borrador para ID: {article_id}")
+        inicio = time.time()
+        # Sin variantes: el borrador es solo para revisar guion y diseño
+        video_path = worker_pool.procesar_video({**payload, "variantes": []}, perfil="draft")
+        if not video_path or not os.path.exists(video_path):
+            return jsonify({"error": "No se pudo generar la vista previa.", "article_id": article_id}), 500
+
+        url_r2 = cloudflare_r2.upload_media_to_r2(video_path, f"preview_{article_id}.mp4")
+        if not url_r2:
+            return jsonify({"error": "No se pudo subir la vista previa.", "article_id": article_id}), 502
+
+        return jsonify({
+            "status": "ready",
+            "article_id": article_id,
+            "preview_url": url_r2,
+            "profile": "draft",
+            "render_seconds": round(time.time() - inicio, 1)
+        }), 200
+
+    finally:
+        # La vista previa no se guarda en el disco (ni su miniatura)
+        if video_path:
+            for ruta in (video_path, video_path.rsplit('.', 1)[0] + '.jpg'):
+                try:
+                    if os.path.exists(ruta):
+                        os.remove(ruta)
+                except Exception as e:
+                    logger.warning(f"  [Limpieza] No se pudo borrar la vista previa: {e}")
+        preview_lock.release()
+
 # ==============================================================================
 # SISTEMA DE NOTIFICACIONES (WEBHOOKS)
 # ==============================================================================
-def _notificar_webhook_node(endpoint, article_id, youtube_id=None, video_url=None, audio_url=None, error=None):
+def _notificar_webhook_node(endpoint, article_id, youtube_id=None, video_url=None, audio_url=None, error=None, variant_urls=None):
     """
     Se comunica de vuelta con tu API de Node.js para avisarle cómo terminó todo.
     """
@@ -188,6 +481,8 @@ def _notificar_webhook_node(endpoint, article_id, youtube_id=None, video_url=Non
         payload["videoUrl"] = video_url # <--- Link de Cloudflare para Video
     if audio_url:
         payload["audioUrl"] = audio_url # <--- Link de Cloudflare para Audio MP3
+    if variant_urls:
+        payload["variantUrls"] = variant_urls # <--- Links de Cloudflare de Shorts / web
     if error:
         payload["error"] = error
 
@@ -213,7 +508,14 @@ def index():
 # =====================================================================
 # 🎧 MICROSERVICIO DE AUDIO (Para el botón "Escuchar" de la App)
 # =====================================================================
+def _procesar_audio(trabajo, texto_completo):
+    """Tarea del carril de audio: genera el MP3 y cierra el trabajo."""
+    job_registry.marcar_inicio(trabajo["id"])
+    exito = background_audio_task(trabajo["article_id"], texto_completo)
+    job_registry.finalizar(trabajo["id"], "completado" if exito else "fallido")
+
 def background_audio_task(article_id, texto_completo):
+    """Locución completa de la noticia en MP3, subida a R2. Retorna True si Node.js quedó avisado."""
     logger.info(f"  [Audio] 🎙️ Iniciando locución completa para {article_id}")
     try:
         nombre_archivo = f"audio_{article_id}.mp3"
@@ -221,12 +523,18 @@ def background_audio_task(article_id, texto_completo):
         os.makedirs("temp", exist_ok=True)
         ruta_audio = f"temp/{nombre_archivo}" 
         
-        # 1. Limpiamos comillas que puedan romper la consola
+        # 1. Limpiamos comillas (el texto va como argumento, sin pasar por la consola)
         texto_limpio = texto_completo.replace('"', '').replace("'", "")
         
-        # 2. Generamos el audio de corrido con la mejor voz
-        comando = f'edge-tts --voice "es-MX-JorgeNeural" --rate="+10%" --text "{texto_limpio}" --write-media {ruta_audio}'
-        subprocess.run(comando, shell=True, check=True)
+        # 2. Generamos el audio de corrido con la mejor voz (mismo runner que FFmpeg:
+        #    grupo de procesos propio y timeout, así nunca queda un edge-tts colgado)
+        comando = [
+            "edge-tts", "--voice", "es-MX-JorgeNeural", "--rate=+10%",
+            "--text", texto_limpio, "--write-media", ruta_audio
+        ]
+        resultado = ffmpeg_core.ejecutar_comando(comando, timeout=600)
+        if not resultado["ok"]:
+            raise RuntimeError(f"edge-tts falló ({resultado['motivo']}): {' | '.join(resultado['stderr'][-3:])}")
         
         # 3. Subimos el MP3 a Cloudflare R2
         url_r2 = cloudflare_r2.upload_media_to_r2(ruta_audio, nombre_archivo)
@@ -242,9 +550,11 @@ def background_audio_task(article_id, texto_completo):
                 logger.info(f"  [Limpieza] Audio borrado del disco: {ruta_audio}")
         except Exception as e:
             logger.warning(f"  [Limpieza] No se pudo borrar el audio local: {e}")
+        return bool(url_r2)
             
     except Exception as e:
         logger.error(f"  [Audio] ❌ Error generando MP3: {e}")
+        return False
 
 @app.route('/api/tasks/audio', methods=['POST'])
 def task_audio():
@@ -261,11 +571,11 @@ def task_audio():
     if not article_id or not texto_completo:
         return jsonify({"error": "Faltan datos"}), 400
 
-    # Lanzamos el proceso en segundo plano para no hacer esperar a Node.js
-    thread = threading.Thread(target=background_audio_task, args=(article_id, texto_completo))
-    thread.start()
+    # Carril propio en la cola: un render de video en curso nunca demora al audio
+    trabajo = job_registry.crear_trabajo(article_id, tipo="audio", carril="audio")
+    job_queue.encolar(trabajo, lambda: _procesar_audio(trabajo, texto_completo))
     
-    return jsonify({"message": "Generación de audio iniciada", "articleId": article_id}), 202
+    return jsonify({"message": "Generación de audio iniciada", "articleId": article_id, "job_id": trabajo["id"]}), 202
 
 def run_cleanup_loop():
     import time
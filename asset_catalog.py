@@ -0,0 +1,297 @@
+# -*- coding: utf-8 -*-
+"""
+==============================================================================
+ASSET CATALOG (Catálogo de Plantillas, Música y Efectos)
+==============================================================================
+Antes cada selección hacía os.listdir + isfile sobre la carpeta, y nadie sabía
+la duración, resolución o fps de un recurso hasta que FFmpeg lo abría.
+Este módulo arma al arrancar un catálogo de TODOS los assets (templates, bgm y
+sfx) con sus metadatos ya medidos con ffprobe, el layout de config.py que les
+corresponde y un hash SHA-256 de su contenido.
+
+- Se guarda en CACHE_DIR, así un reinicio no vuelve a medir ni a hashear nada.
+- Si cambia la fecha de modificación de una carpeta (se agregó o borró un
+  archivo), solo esa carpeta se vuelve a escanear.
+- La selección aleatoria sale de listas en memoria y los cachés (ej. overlays
+  en ping-pong) pueden usar el hash del asset como clave.
+"""
+
+import os
+import json
+import hashlib
+import logging
+import threading
+from config import *
+from ffmpeg_core import ejecutar_comando
+
+logger = logging.getLogger(__name__)
+
+ARCHIVO_CATALOGO = os.path.join(CACHE_DIR, "catalogo_assets.json")
+
+# Subir este número obliga a volver a medir todos los assets (cambio de formato)
+VERSION_CATALOGO = 1
+
+# Categorías del catálogo: cada subcarpeta es un "tipo" (ej. templates/hombre, bgm/tension)
+CATEGORIAS_ASSETS = {
+    "templates": TEMPLATES_DIR,
+    "bgm": BGM_DIR,
+    "sfx": SFX_DIR,
+}
+
+_lock = threading.RLock()
+_assets = {}    # ruta relativa a ASSETS_DIR -> metadatos
+_carpetas = {}  # ruta relativa de la carpeta -> {"mtime_ns", "archivos"}
+_cargado = False
+_sin_ffprobe = False
+
+def _relativa(ruta):
+    return os.path.relpath(os.path.abspath(ruta), ASSETS_DIR).replace('\\', '/')
+
+def _absoluta(relativa):
+    return os.path.join(ASSETS_DIR, *relativa.split('/'))
+
+# ==============================================================================
+# MEDICIÓN DE CADA ASSET (Hash + ffprobe)
+# ==============================================================================
+def _hash_archivo(ruta):
+    sha = hashlib.sha256()
+    with open(ruta, "rb") as f:
+        for bloque in iter(lambda: f.read(1024 * 1024), b""):
+            sha.update(bloque)
+    return sha.hexdigest()
+
+def _fps_de(texto):
+    """Convierte el '30000/1001' de ffprobe en número."""
+    try:
+        num, den = texto.split('/')
+        return round(float(num) / float(den), 3) if float(den) else None
+    except (ValueError, AttributeError):
+        return None
+
+def _sondear(ruta):
+    """Duración, resolución, fps y audio del archivo según ffprobe. Vacío si no se pudo."""
+    cmd = [
+        "ffprobe", "-v", "error",
+        "-print_format", "json",
+        "-show_format", "-show_streams",
+        ruta
+    ]
+    global _sin_ffprobe
+    if _sin_ffprobe:
+        return {}
+    salida = ejecutar_comando(cmd, timeout=30)
+    if salida["motivo"] == "sin_binario":
+        _sin_ffprobe = True
+        logger.warning("  [Catálogo] ffprobe no está instalado. Se catalogará sin metadatos de medios.")
+        return {}
+    try:
+        datos = json.loads(salida["stdout"] or "{}")
+    except Exception as e:
+        logger.warning(f"  [Catálogo] No se pudo sondear {os.path.basename(ruta)}: {e}")
+        return {}
+
+    info = {}
+    duracion = datos.get("format", {}).get("duration")
+    if duracion:
+        info["duracion"] = round(float(duracion), 3)
+
+    for stream in datos.get("streams", []):
+        if stream.get("codec_type") == "video" and "ancho" not in info:
+            info["ancho"] = stream.get("width")
+            info["alto"] = stream.get("height")
+            info["fps"] = _fps_de(stream.get("avg_frame_rate")) or _fps_de(stream.get("r_frame_rate"))
+        elif stream.get("codec_type") == "audio" and "sample_rate" not in info:
+            info["sample_rate"] = int(stream.get("sample_rate") or 0) or None
+            info["canales"] = stream.get("channels")
+    return info
+
+def _medir_asset(ruta, categoria, tipo, anterior=None):
+    """Arma la ficha del asset. Si tamaño y fecha no cambiaron, reutiliza la ficha anterior."""
+    estado = os.stat(ruta)
+    if anterior and anterior.get("tamano") == estado.st_size and anterior.get("mtime_ns") == estado.st_mtime_ns:
+        return anterior
+
+    nombre = os.path.basename(ruta)
+    ficha = {
+        "categoria": categoria,
+        "tipo": tipo,
+        "nombre": nombre,
+        "tamano": estado.st_size,
+        "mtime_ns": estado.st_mtime_ns,
+        "sha256": _hash_archivo(ruta),
+        # Solo las plantillas de video tienen zócalo; guardamos qué layout de config.py usan
+        "layout": nombre if categoria == "templates" and nombre in LAYOUT_CONFIG else None,
+    }
+    ficha.update(_sondear(ruta))
+    return ficha
+
+# ==============================================================================
+# ESCANEO Y PERSISTENCIA
+# ==============================================================================
+def _mtime_carpeta(carpeta):
+    try:
+        return os.stat(carpeta).st_mtime_ns
+    except OSError:
+        return None
+
+def _escanear_carpeta(carpeta, categoria, tipo):
+    """Vuelve a listar una carpeta y mide solo los archivos nuevos o modificados."""
+    rel_carpeta = _relativa(carpeta)
+    archivos = []
+    for nombre in sorted(os.listdir(carpeta)):
+        ruta = os.path.join(carpeta, nombre)
+        # Ignorar archivos ocultos o de sistema (como .DS_Store)
+        if nombre.startswith('.') or not os.path.isfile(ruta):
+            continue
+        rel = _relativa(ruta)
+        try:
+            _assets[rel] = _medir_asset(ruta, categoria, tipo, _assets.get(rel))
+            archivos.append(rel)
+        except OSError as e:
+            logger.warning(f"  [Catálogo] No se pudo leer {nombre}: {e}")
+
+    # Quitamos del catálogo lo que ya no está en la carpeta
+    for rel in _carpetas.get(rel_carpeta, {}).get("archivos", []):
+        if rel not in archivos:
+            _assets.pop(rel, None)
+
+    _carpetas[rel_carpeta] = {"mtime_ns": _mtime_carpeta(carpeta), "archivos": archivos}
+
+def _refrescar_categoria(categoria):
+    """Revisa la carpeta raíz de la categoría y sus subcarpetas. Retorna True si algo cambió."""
+    raiz = CATEGORIAS_ASSETS[categoria]
+    if not os.path.isdir(raiz):
+        return False
+
+    cambio = False
+    rel_raiz = _relativa(raiz)
+    mtime_raiz = _mtime_carpeta(raiz)
+    if _carpetas.get(rel_raiz, {}).get("mtime_ns") != mtime_raiz:
+        # Cambiaron las subcarpetas (se agregó o quitó un tipo)
+        tipos = sorted(d for d in os.listdir(raiz) if os.path.isdir(os.path.join(raiz, d)) and not d.startswith('.'))
+        for viejo in _carpetas.get(rel_raiz, {}).get("archivos", []):
+            if viejo not in tipos:
+                for rel in _carpetas.pop(f"{rel_raiz}/{viejo}", {}).get("archivos", []):
+                    _assets.pop(rel, None)
+        _carpetas[rel_raiz] = {"mtime_ns": mtime_raiz, "archivos": tipos}
+        cambio = True
+
+    for tipo in _carpetas[rel_raiz]["archivos"]:
+        carpeta = os.path.join(raiz, tipo)
+        if _carpetas.get(_relativa(carpeta), {}).get("mtime_ns") != _mtime_carpeta(carpeta):
+            if os.path.isdir(carpeta):
+                _escanear_carpeta(carpeta, categoria, tipo)
+                cambio = True
+    return cambio
+
+def _guardar():
+    datos = {"version": VERSION_CATALOGO, "carpetas": _carpetas, "assets": _assets}
+    temporal = f"{ARCHIVO_CATALOGO}.{os.getpid()}.tmp"  # La API y los procesos de trabajo guardan el mismo catálogo
+    try:
+        with open(temporal, "w", encoding="utf-8") as f:
+            json.dump(datos, f, ensure_ascii=False, indent=1)
+        os.replace(temporal, ARCHIVO_CATALOGO)
+    except OSError as e:
+        logger.warning(f"  [Catálogo] No se pudo guardar el catálogo: {e}")
+
+def _leer_guardado():
+    try:
+        with open(ARCHIVO_CATALOGO, "r", encoding="utf-8") as f:
+            datos = json.load(f)
+        if datos.get("version") == VERSION_CATALOGO:
+            _carpetas.update(datos.get("carpetas", {}))
+            _assets.update(datos.get("assets", {}))
+    except (OSError, ValueError):
+        pass  # Sin catálogo previo (o dañado): se arma desde cero
+
+def cargar_catalogo():
+    """
+    Carga el catálogo guardado y revisa todas las carpetas. Se llama al arrancar;
+    si nadie lo llamó, la primera consulta lo hace sola.
+    """
+    global _cargado
+    with _lock:
+        if not _cargado:
+            _leer_guardado()
+            _cargado = True
+        cambio = False
+        for categoria in CATEGORIAS_ASSETS:
+            cambio = _refrescar_categoria(categoria) or cambio
+        if cambio:
+            _guardar()
+            logger.info(f"  [Catálogo] {len(_assets)} assets catalogados.")
+
+def _asegurar_al_dia(categoria):
+    """Chequeo barato antes de cada consulta: un stat por carpeta, sin listar archivos."""
+    with _lock:
+        if not _cargado:
+            cargar_catalogo()
+        elif _refrescar_categoria(categoria):
+            _guardar()
+
+# ==============================================================================
+# CONSULTAS
+# ==============================================================================
+def _categoria_de(directorio):
+    for categoria, raiz in CATEGORIAS_ASSETS.items():
+        rel = os.path.relpath(os.path.abspath(directorio), os.path.abspath(raiz))
+        if not rel.startswith('..') and not os.path.isabs(rel):
+            return categoria
+    return None
+
+def archivos_de_carpeta(directorio):
+    """
+    Rutas absolutas de los assets de una carpeta del catálogo (lista en memoria).
+    Retorna None si la carpeta no pertenece al catálogo.
+    """
+    categoria = _categoria_de(directorio)
+    if not categoria:
+        return None
+    _asegurar_al_dia(categoria)
+    with _lock:
+        carpeta = _carpetas.get(_relativa(directorio))
+        if carpeta is None:
+            return [] if os.path.isdir(directorio) else None
+        return [_absoluta(rel) for rel in carpeta["archivos"]]
+
+def listar(categoria, tipo):
+    """Rutas absolutas de los assets de un tipo (ej. listar('bgm', 'tension'))."""
+    return archivos_de_carpeta(os.path.join(CATEGORIAS_ASSETS[categoria], tipo)) or []
+
+def tipos(categoria):
+    """Subcarpetas conocidas de una categoría (ej. los moods de bgm)."""
+    _asegurar_al_dia(categoria)
+    with _lock:
+        return list(_carpetas.get(_relativa(CATEGORIAS_ASSETS[categoria]), {}).get("archivos", []))
+
+def obtener_info_asset(ruta):
+    """
+    Ficha del asset: categoria, tipo, nombre, tamano, sha256, layout y lo que
+    ffprobe haya podido medir (duracion, ancho, alto, fps, sample_rate, canales).
+    Retorna None si el archivo no está en el catálogo.
+    """
+    if not ruta:
+        return None
+    categoria = _categoria_de(ruta)
+    if not categoria:
+        return None
+    _asegurar_al_dia(categoria)
+    with _lock:
+        rel = _relativa(ruta)
+        ficha = _assets.get(rel)
+        if not ficha:
+            return None
+        # Un archivo reemplazado "en el lugar" no cambia la fecha de su carpeta
+        try:
+            actual = _medir_asset(ruta, ficha["categoria"], ficha["tipo"], ficha)
+        except OSError:
+            return None
+        if actual is not ficha:
+            _assets[rel] = actual
+            _guardar()
+        return dict(actual, path=os.path.abspath(ruta))
+
+def hash_asset(ruta):
+    """SHA-256 del contenido del asset (para usar como clave de caché) o None."""
+    ficha = obtener_info_asset(ruta)
+    return ficha["sha256"] if ficha else None
@@ -0,0 +1,178 @@
+# -*- coding: utf-8 -*-
+"""
+==============================================================================
+AUDIO LIBRARY (Música y Efectos Normalizados y Pre-Decodificados)
+==============================================================================
+Cada escena decodificaba un MP3 de música y otro de efecto y los remuestreaba
+dentro de 'amix'. Además el volumen variaba muchísimo entre pistas (de ahí los
+'weights' afinados a mano en cada plantilla).
+
+Este módulo procesa UNA sola vez cada BGM/SFX:
+- Normalización de sonoridad EBU R128 (loudnorm en dos pasadas, modo lineal).
+- Conversión al sample rate y canales del pipeline (AUDIO_SAMPLE_RATE / AUDIO_CHANNELS).
+- Guardado como WAV PCM (decodificación prácticamente gratis).
+
+El resultado se guarda por hash de contenido (asset_catalog) y media_manager
+lo entrega automáticamente. Si algo falla, se usa el archivo original.
+"""
+
+import os
+import re
+import json
+import glob
+import hashlib
+import logging
+import threading
+import asset_catalog
+from config import *
+from ffmpeg_core import ejecutar_render
+
+logger = logging.getLogger(__name__)
+
+AUDIO_NORM_DIR = os.path.join(CACHE_DIR, "audio_norm")
+os.makedirs(AUDIO_NORM_DIR, exist_ok=True)
+
+# Objetivo EBU R128: sonoridad integrada, pico verdadero y rango de sonoridad
+LOUDNESS_OBJETIVO = -23.0
+PICO_MAXIMO = -2.0
+RANGO_SONORIDAD = 11.0
+
+# Subir este número obliga a regenerar toda la biblioteca (cambio de receta)
+VERSION_RECETA = 1
+
+_locks_pistas = {}
+_lock_global = threading.Lock()
+
+def _lock_de(pista):
+    with _lock_global:
+        return _locks_pistas.setdefault(pista, threading.Lock())
+
+def _ruta_normalizada(audio_path):
+    """WAV de caché para esta pista, o None si la pista no está en el catálogo."""
+    huella = asset_catalog.hash_asset(audio_path)
+    if not huella:
+        return None
+    datos = (
+        f"{huella}|{LOUDNESS_OBJETIVO}|{PICO_MAXIMO}|{RANGO_SONORIDAD}|"
+        f"{AUDIO_SAMPLE_RATE}|{AUDIO_CHANNELS}|v{VERSION_RECETA}"
+    )
+    clave = hashlib.sha1(datos.encode("utf-8")).hexdigest()[:16]
+    return os.path.join(AUDIO_NORM_DIR, f"{clave}.wav")
+
+# ==============================================================================
+# NORMALIZACIÓN EBU R128 (DOS PASADAS)
+# ==============================================================================
+def _medir_sonoridad(audio_path, duracion):
+    """Primera pasada: loudnorm solo mide y escribe sus valores en JSON por stderr."""
+    cmd = [
+        "ffmpeg", "-y", "-v", "info",
+        "-i", audio_path,
+        "-af", f"loudnorm=I={LOUDNESS_OBJETIVO}:TP={PICO_MAXIMO}:LRA={RANGO_SONORIDAD}:print_format=json",
+        "-f", "null", "-"
+    ]
+    resultado = ejecutar_render(cmd, "loudnorm", duracion)
+    if not resultado["ok"]:
+        return None
+
+    texto = "\n".join(resultado["stderr"])
+    bloque = re.search(r"\{[^{}]*\"input_i\"[^{}]*\}", texto)
+    if not bloque:
+        return None
+    try:
+        medidas = json.loads(bloque.group(0))
+        return {clave: float(medidas[clave]) for clave in ("input_i", "input_tp", "input_lra", "input_thresh", "target_offset")}
+    except (ValueError, KeyError):
+        return None
+
+def _normalizar(audio_path, destino, duracion):
+    """Segunda pasada: aplica la ganancia medida (lineal, sin compresión) y guarda el WAV."""
+    medidas = _medir_sonoridad(audio_path, duracion)
+    if not medidas:
+        logger.warning(f"  [Audio Library] No se pudo medir la sonoridad de {os.path.basename(audio_path)}")
+        return False
+
+    # Silencio total: loudnorm devuelve -inf y no hay nada que normalizar
+    if medidas["input_i"] == float("-inf"):
+        filtro = "anull"
+    else:
+        filtro = (
+            f"loudnorm=I={LOUDNESS_OBJETIVO}:TP={PICO_MAXIMO}:LRA={RANGO_SONORIDAD}:"
+            f"measured_I={medidas['input_i']}:measured_TP={medidas['input_tp']}:"
+            f"measured_LRA={medidas['input_lra']}:measured_thresh={medidas['input_thresh']}:"
+            f"offset={medidas['target_offset']}:linear=true"
+        )
+
+    temporal = f"{destino}.{os.getpid()}.tmp.wav"  # Otro proceso puede estar normalizando la misma pista
+    cmd = [
+        "ffmpeg", "-y", "-v", "error",
+        "-i", audio_path,
+        "-af", filtro,
+        "-ar", str(AUDIO_SAMPLE_RATE), "-ac", str(AUDIO_CHANNELS),
+        "-c:a", "pcm_s16le",
+        temporal
+    ]
+    resultado = ejecutar_render(cmd, "loudnorm", duracion)
+    if resultado["ok"] and os.path.exists(temporal):
+        os.replace(temporal, destino)
+        logger.info(
+            f"  [Audio Library] {os.path.basename(audio_path)}: {medidas['input_i']:.1f} LUFS -> "
+            f"{LOUDNESS_OBJETIVO:.0f} LUFS ({AUDIO_SAMPLE_RATE} Hz, {AUDIO_CHANNELS} canales)"
+        )
+        return True
+
+    if os.path.exists(temporal):
+        os.remove(temporal)
+    return False
+
+def _borrar_huerfanos():
+    """Quita los WAV que ya no corresponden a ninguna pista del catálogo."""
+    vigentes = set()
+    for categoria in ("bgm", "sfx"):
+        for tipo in asset_catalog.tipos(categoria):
+            for pista in asset_catalog.listar(categoria, tipo):
+                ruta = _ruta_normalizada(pista)
+                if ruta:
+                    vigentes.add(ruta)
+    for archivo in glob.glob(os.path.join(AUDIO_NORM_DIR, "*.wav")):
+        if archivo not in vigentes:
+            try:
+                os.remove(archivo)
+            except OSError:
+                pass
+
+# ==============================================================================
+# API PÚBLICA
+# ==============================================================================
+def obtener_audio_normalizado(audio_path):
+    """
+    Devuelve la versión normalizada (WAV) de una pista de bgm/sfx, generándola
+    si hace falta. Si no se puede, devuelve la ruta original sin tocar.
+    """
+    if not audio_path or not os.path.exists(audio_path):
+        return audio_path
+
+    destino = _ruta_normalizada(audio_path)
+    if not destino:
+        return audio_path
+
+    with _lock_de(destino):
+        if os.path.exists(destino) and os.path.getsize(destino) > 44:
+            return destino
+
+        info = asset_catalog.obtener_info_asset(audio_path) or {}
+        if _normalizar(audio_path, destino, info.get("duracion")):
+            return destino
+
+    logger.warning(f"  [Audio Library] Usando {os.path.basename(audio_path)} sin normalizar.")
+    return audio_path
+
+def preparar_biblioteca():
+    """Normaliza por adelantado todas las músicas y efectos del catálogo."""
+    total = 0
+    for categoria in ("bgm", "sfx"):
+        for tipo in asset_catalog.tipos(categoria):
+            for pista in asset_catalog.listar(categoria, tipo):
+                if obtener_audio_normalizado(pista) != pista:
+                    total += 1
+    _borrar_huerfanos()
+    logger.info(f"  [Audio Library] {total} pistas de música y efectos listas (EBU R128).")
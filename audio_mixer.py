@@ -0,0 +1,245 @@
+# -*- coding: utf-8 -*-
+"""
+==============================================================================
+AUDIO MIXER (Mezclador de Voz, Música y Efectos en NumPy)
+==============================================================================
+Mezcla la banda sonora del video dentro del proceso, sin grafo de 'amix':
+
+- Cada pista se decodifica UNA sola vez a PCM float32 (las músicas y efectos
+  normalizados de audio_library ya son WAV y se leen sin FFmpeg).
+- Ganancias, fundidos, ducking y limitador se aplican vectorizados sobre
+  buffers completos.
+- Usa la misma línea de tiempo que soundtrack_builder (una entrada por escena)
+  y escribe un WAV listo para unirse al video en la concatenación.
+
+La mezcla queda en memoria como arreglo (muestras x canales), así una misma
+banda sonora se puede reutilizar para varias salidas del mismo trabajo.
+Para comparar niveles con 'amix': python test_mezclador.py
+Para medir tiempos de mezcla: python benchmark_mezclador.py
+"""
+
+import os
+import wave
+import logging
+import numpy as np
+from config import *
+from ffmpeg_core import ejecutar_comando
+
+logger = logging.getLogger(__name__)
+
+# Mismos parámetros de ducking y fundidos que el grafo de soundtrack_builder
+FUNDIDO_MUSICA = 1.0
+DUCKING_UMBRAL = 0.02
+DUCKING_RATIO = 4
+DUCKING_ATAQUE_MS = 50
+DUCKING_LIBERACION_MS = 600
+LIMITE_MEZCLA = 0.95
+
+# Tamaño del bloque con el que se mide la envolvente de la voz y los picos
+BLOQUE_MS = 10
+
+# ==============================================================================
+# DECODIFICACIÓN A PCM
+# ==============================================================================
+def _leer_wav_directo(path):
+    """Lee un WAV PCM 16 bits ya en el formato del pipeline sin lanzar FFmpeg. None si no aplica."""
+    try:
+        with wave.open(path, "rb") as wav:
+            if (wav.getsampwidth() != 2 or wav.getframerate() != AUDIO_SAMPLE_RATE
+                    or wav.getnchannels() != AUDIO_CHANNELS):
+                return None
+            datos = wav.readframes(wav.getnframes())
+    except (wave.Error, EOFError, OSError):
+        return None
+    muestras = np.frombuffer(datos, dtype=np.int16).astype(np.float32) / 32768.0
+    return muestras.reshape(-1, AUDIO_CHANNELS)
+
+def decodificar_pcm(path):
+    """
+    Devuelve la pista como arreglo float32 (muestras x canales) en el formato del
+    pipeline (AUDIO_SAMPLE_RATE, AUDIO_CHANNELS).
+    """
+    if path.lower().endswith(".wav"):
+        pcm = _leer_wav_directo(path)
+        if pcm is not None:
+            return pcm
+
+    cmd = [
+        "ffmpeg", "-v", "error",
+        "-i", path,
+        "-f", "f32le", "-acodec", "pcm_f32le",
+        "-ar", str(AUDIO_SAMPLE_RATE), "-ac", str(AUDIO_CHANNELS),
+        "-"
+    ]
+    salida = ejecutar_comando(cmd, timeout=120, texto=False)
+    if not salida["ok"]:
+        raise RuntimeError(f"no se pudo decodificar {os.path.basename(path)} ({salida['motivo']})")
+    return np.frombuffer(salida["stdout"], dtype=np.float32).reshape(-1, AUDIO_CHANNELS)
+
+# ==============================================================================
+# OPERACIONES VECTORIZADAS
+# ==============================================================================
+def _muestras(segundos):
+    return int(round(segundos * AUDIO_SAMPLE_RATE))
+
+def _pegar(destino, pista, inicio):
+    """Suma 'pista' sobre 'destino' a partir de la muestra 'inicio' (recortando lo que sobre)."""
+    fin = min(len(destino), inicio + len(pista))
+    if fin > inicio:
+        destino[inicio:fin] += pista[:fin - inicio]
+
+def _en_bucle(pista, largo):
+    """Repite la pista hasta cubrir 'largo' muestras (como -stream_loop -1)."""
+    if len(pista) == 0:
+        return np.zeros((largo, AUDIO_CHANNELS), dtype=np.float32)
+    repeticiones = -(-largo // len(pista))
+    return np.tile(pista, (repeticiones, 1))[:largo]
+
+def _fundidos(pista, segundos):
+    """Fundido lineal de entrada y salida (igual que afade t=in / t=out)."""
+    n = min(_muestras(segundos), len(pista) // 2)
+    if n > 0:
+        rampa = np.linspace(0.0, 1.0, n, dtype=np.float32)[:, None]
+        pista[:n] *= rampa
+        pista[-n:] *= rampa[::-1]
+    return pista
+
+def _suavizar_ganancia(objetivo, ataque_ms, liberacion_ms):
+    """
+    Suavizado de un polo con ataque/liberación sobre la ganancia por bloque.
+    Son ~100 bloques por segundo, así que el bucle es corto aunque el video sea largo.
+    """
+    a_ataque = np.exp(-BLOQUE_MS / max(ataque_ms, 1e-3))
+    a_liberacion = np.exp(-BLOQUE_MS / max(liberacion_ms, 1e-3))
+    salida = np.empty_like(objetivo)
+    actual = 1.0
+    for i, valor in enumerate(objetivo):
+        coef = a_ataque if valor < actual else a_liberacion
+        actual = coef * actual + (1.0 - coef) * valor
+        salida[i] = actual
+    return salida
+
+def _por_muestra(ganancia_bloques, largo):
+    """Interpola la ganancia de cada bloque a todas las muestras."""
+    bloque = _muestras(BLOQUE_MS / 1000)
+    centros = np.arange(len(ganancia_bloques)) * bloque + bloque / 2
+    return np.interp(np.arange(largo), centros, ganancia_bloques).astype(np.float32)[:, None]
+
+def _ganancia_ducking(voz, umbral, ratio, ataque_ms, liberacion_ms):
+    """Ganancia (por muestra) que la voz le impone a la música, como sidechaincompress."""
+    bloque = _muestras(BLOQUE_MS / 1000)
+    bloques = len(voz) // bloque
+    if bloques == 0:
+        return np.ones((len(voz), 1), dtype=np.float32)
+    mono = voz[:bloques * bloque].mean(axis=1).reshape(bloques, bloque)
+    nivel = np.sqrt((mono ** 2).mean(axis=1))
+
+    # Por encima del umbral: reducción según el ratio (en dominio lineal)
+    objetivo = np.ones_like(nivel)
+    encima = nivel > umbral
+    objetivo[encima] = (umbral / nivel[encima]) ** (1.0 - 1.0 / ratio)
+
+    return _por_muestra(_suavizar_ganancia(objetivo, ataque_ms, liberacion_ms), len(voz))
+
+def _limitar(mezcla, limite):
+    """Limitador por bloques: baja la ganancia solo donde los picos pasan el techo (en el lugar)."""
+    bloque = _muestras(BLOQUE_MS / 1000)
+    completos = len(mezcla) // bloque
+    picos = np.abs(mezcla[:completos * bloque]).reshape(completos, -1).max(axis=1)
+    if len(mezcla) > completos * bloque:
+        picos = np.append(picos, np.abs(mezcla[completos * bloque:]).max())
+    ganancia = np.minimum(1.0, limite / np.maximum(picos, 1e-9))
+    # Mirada hacia adelante de un bloque para que la bajada empiece antes del pico
+    ganancia = np.minimum(ganancia, np.append(ganancia[1:], 1.0))
+    mezcla *= _por_muestra(_suavizar_ganancia(ganancia, 1, DUCKING_LIBERACION_MS), len(mezcla))
+    return np.clip(mezcla, -1.0, 1.0, out=mezcla)
+
+# ==============================================================================
+# MEZCLA DE LA BANDA SONORA
+# ==============================================================================
+def mezclar(escenas, ducking=True, limitador=True):
+    """
+    Mezcla la línea de tiempo completa y devuelve el arreglo float32 (muestras x canales).
+    'escenas': [{"inicio", "duracion", "voz", "bgm", "sfx", "refuerzo"}] como en soundtrack_builder.
+    """
+    if not escenas:
+        return np.zeros((0, AUDIO_CHANNELS), dtype=np.float32)
+
+    largo = _muestras(escenas[-1]["inicio"] + escenas[-1]["duracion"])
+    decodificadas = {}
+
+    def pcm(path):
+        if path not in decodificadas:
+            decodificadas[path] = decodificar_pcm(path)
+        return decodificadas[path]
+
+    # 1. VOCES: el buffer de la voz es también el de la mezcla final (un solo
+    #    arreglo del largo del video, para no multiplicar la RAM en videos largos)
+    mezcla = np.zeros((largo, AUDIO_CHANNELS), dtype=np.float32)
+    for escena in escenas:
+        if escena.get("voz"):
+            _pegar(mezcla, pcm(escena["voz"]), _muestras(escena["inicio"]))
+
+    # El ducking se calcula con la voz sola, antes de sumarle nada
+    hay_musica = any(e.get("bgm") for e in escenas)
+    duck = None
+    if ducking and hay_musica:
+        duck = _ganancia_ducking(mezcla, DUCKING_UMBRAL, DUCKING_RATIO, DUCKING_ATAQUE_MS, DUCKING_LIBERACION_MS)
+
+    # 2. CAMA DE MÚSICA (escenas seguidas con la misma pista = una sola reproducción)
+    tramo = []
+    for escena in escenas + [{"bgm": None}]:
+        if tramo and escena.get("bgm") != tramo[0]["bgm"]:
+            inicio = _muestras(tramo[0]["inicio"])
+            # Hasta el final de la última escena (no la suma: las transiciones del grafo solapan)
+            n = min(_muestras(tramo[-1]["inicio"] + tramo[-1]["duracion"]) - inicio, largo - inicio)
+            musica = _en_bucle(pcm(tramo[0]["bgm"]), n).copy()
+            _fundidos(musica, min(FUNDIDO_MUSICA, n / AUDIO_SAMPLE_RATE / 4))
+            ganancia = np.full((n, 1), PESO_MUSICA, dtype=np.float32)
+            for e in tramo:
+                if e.get("refuerzo", 1.0) != 1.0:
+                    desde = _muestras(e["inicio"]) - inicio
+                    ganancia[desde:desde + _muestras(e["duracion"])] *= e["refuerzo"]
+            if duck is not None:
+                ganancia *= duck[inicio:inicio + n]
+            musica *= ganancia
+            _pegar(mezcla, musica, inicio)
+            tramo = []
+        if escena.get("bgm"):
+            tramo.append(escena)
+
+    # 3. EFECTOS (recortados a su escena)
+    for escena in escenas:
+        if escena.get("sfx"):
+            sfx = pcm(escena["sfx"])[:_muestras(escena["duracion"])]
+            _pegar(mezcla, sfx * (PESO_EFECTOS * escena.get("refuerzo", 1.0)), _muestras(escena["inicio"]))
+
+    # 4. SUMA DIRECTA + LIMITADOR
+    if limitador:
+        _limitar(mezcla, LIMITE_MEZCLA)
+    return mezcla
+
+def guardar_wav(mezcla, output_path):
+    """Escribe la mezcla como WAV PCM 16 bits en el formato del pipeline."""
+    pcm16 = (np.clip(mezcla, -1.0, 1.0) * 32767).astype("<i2")
+    with wave.open(output_path, "wb") as wav:
+        wav.setnchannels(AUDIO_CHANNELS)
+        wav.setsampwidth(2)
+        wav.setframerate(AUDIO_SAMPLE_RATE)
+        wav.writeframes(pcm16.tobytes())
+
+def mezclar_banda_sonora(escenas, output_path):
+    """
+    Mezcla la banda sonora del trabajo y la guarda en 'output_path' (WAV).
+    Retorna True si quedó lista.
+    """
+    try:
+        mezcla = mezclar(escenas)
+        if not len(mezcla):
+            return False
+        guardar_wav(mezcla, output_path)
+        logger.info(f"  [Audio Mixer] Banda sonora mezclada en NumPy ({len(mezcla) / AUDIO_SAMPLE_RATE:.1f}s).")
+        return True
+    except Exception as e:
+        logger.error(f"  [Audio Mixer] Falló la mezcla en NumPy: {e}")
+        return False
@@ -12,9 +12,10 @@ import time
 import random
 import logging
 import requests
-import subprocess
 import urllib.parse
 from config import *
+from ffmpeg_core import ejecutar_comando
+import shared_store
 
 logger = logging.getLogger(__name__)
 
@@ -25,8 +26,10 @@ MAPBOX_API_KEY = os.getenv("MAPBOX_API_KEY", "TU_CLAVE_MAPBOX_AQUI")
 PEXELS_API_KEY = os.getenv("PEXELS_API_KEY", "TU_CLAVE_PEXELS_AQUI")
 PIXABAY_API_KEY = os.getenv("PIXABAY_API_KEY", "TU_CLAVE_PIXABAY_AQUI")
 
-# Historial global para no repetir videos de Pexels
-_historial_pexels = []
+# Historial de videos de Pexels ya usados, para no repetirlos. Va en un archivo
+# compartido: cada trabajo corre en un proceso propio (ver worker_pool.py)
+ARCHIVO_HISTORIAL_PEXELS = os.path.join(STATS_DIR, "historial_pexels.json")
+MAX_HISTORIAL_PEXELS = 50
 
 
 # ==============================================================================
@@ -47,8 +50,9 @@ def sanitizar_imagen(ruta_archivo):
         clean_path
     ]
     try:
-        # Silenciamos la salida completamente
-        subprocess.run(cmd_sanitize, timeout=10, check=True, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+        # La salida queda en el resultado, no en la consola
+        if not ejecutar_comando(cmd_sanitize, timeout=10)["ok"]:
+            raise RuntimeError("imagen inválida")
         os.replace(clean_path, ruta_archivo) 
         return True
     except:
@@ -174,16 +178,19 @@ def sanitizar_video(ruta_archivo):
         ruta_archivo
     ]
     try:
-        resultado = subprocess.run(cmd_check, capture_output=True, text=True, timeout=5)
+        resultado = ejecutar_comando(cmd_check, timeout=5)
         # Si ffprobe responde "video", entonces es un MP4 válido
-        if "video" in resultado.stdout.lower():
+        if "video" in resultado["stdout"].lower():
             return True
         return False
     except:
         return False
 
-def obtener_video_stock(termino_busqueda, save_path):
-    global _historial_pexels
+def obtener_video_stock(termino_busqueda, save_path, rng=None):
+    """
+    Descarga un video de stock de Pexels para el término. 'rng' (random.Random
+    sembrado) hace la elección reproducible; el historial evita repetir videos.
+    """
     logger.info(f"  [Fetcher] Buscando video B-Roll sobre: '{termino_busqueda}'")
     
     if PEXELS_API_KEY == "TU_CLAVE_PEXELS_AQUI":
@@ -202,16 +209,17 @@ def obtener_video_stock(termino_busqueda, save_path):
             logger.warning(f"  [Fetcher] Cero resultados en Pexels para '{termino_busqueda}'.")
             return None
             
-        videos_disponibles = [v for v in data['videos'] if v['id'] not in _historial_pexels]
+        historial = shared_store.leer(ARCHIVO_HISTORIAL_PEXELS, [])
+        videos_disponibles = [v for v in data['videos'] if v['id'] not in historial]
         
         if not videos_disponibles:
             videos_disponibles = data['videos']
 
-        video_elegido = random.choice(videos_disponibles)
+        video_elegido = (rng or random).choice(videos_disponibles)
         
-        _historial_pexels.append(video_elegido['id'])
-        if len(_historial_pexels) > 50:
-            _historial_pexels.pop(0)
+        with shared_store.modificar(ARCHIVO_HISTORIAL_PEXELS, []) as historial:
+            historial.append(video_elegido['id'])
+            del historial[:-MAX_HISTORIAL_PEXELS]
 
         video_link = None
         video_files = video_elegido.get('video_files', [])
@@ -0,0 +1,138 @@
+# -*- coding: utf-8 -*-
+"""
+==============================================================================
+BENCHMARK DEL GRAFO ÚNICO CONTRA EL RENDER POR ESCENA
+==============================================================================
+Mide, para videos de distinta cantidad de escenas, los dos motores de render:
+
+- Por escena (como siempre): un FFmpeg por escena con la plantilla universal
+  y la concatenación con '-c copy' al final.
+- Grafo único (grafo_unico.py): las mismas escenas compiladas en un solo grafo
+  unido con 'xfade' y codificado una vez.
+
+Reporta tiempo real, tiempo de CPU de los procesos FFmpeg y pico de RAM (el
+mayor RSS de un proceso FFmpeg, que es lo que vigila el gobernador de memoria).
+Con esto se elige UMBRAL_ESCENAS_GRAFO para MODO_RENDER="auto".
+
+Usa entradas sintéticas: una foto de prueba, un overlay verde con un recuadro
+y una voz muda (la duración de cada escena se pasa directo).
+
+Uso:  python benchmark_grafo_unico.py [escenas,escenas,...] [segundos_por_escena]
+"""
+
+import os
+import sys
+import time
+import random
+import resource
+import subprocess
+from config import *
+import ffmpeg_core
+import grafo_unico
+import scene_templates.ffmpeg_universal as ffmpeg_universal
+from main_orchestrator import concatenar_escenas
+
+CANTIDADES = [int(n) for n in sys.argv[1].split(",")] if len(sys.argv) > 1 else [2, 4, 8, 12]
+SEGUNDOS_ESCENA = float(sys.argv[2]) if len(sys.argv) > 2 else 8.0
+
+def generar(nombre, fuente, formato):
+    ruta = os.path.join(TEMP_VIDEO_DIR, f"bench_grafo_{nombre}")
+    cmd = ["ffmpeg", "-y", "-v", "error", "-f", "lavfi", "-i", fuente, *formato, ruta]
+    subprocess.run(cmd, check=True)
+    return ruta
+
+def crear_entradas():
+    foto = generar("foto.jpg", "testsrc2=size=1600x1000", ["-frames:v", "1"])
+    overlay = generar(
+        "overlay.mp4",
+        f"color=c={CHROMA_COLOR}:size=1280x720:rate=30:duration=6,drawbox=x=880:y=120:w=300:h=480:color=navy:t=fill",
+        ["-pix_fmt", "yuv420p"]
+    )
+    # La voz solo marca la duración (las escenas van sin audio, como en el orquestador)
+    voz = generar("voz.mp3", "anullsrc=r=24000:cl=mono", ["-t", "1"])
+    return foto, overlay, voz
+
+def _cpu_hijos():
+    uso = resource.getrusage(resource.RUSAGE_CHILDREN)
+    return uso.ru_utime + uso.ru_stime
+
+def _medir(funcion):
+    """Ejecuta 'funcion(registros)' y devuelve (ok, segundos, cpu, pico_mb)."""
+    registros = []
+    cpu = _cpu_hijos()
+    inicio = time.perf_counter()
+    ok = funcion(registros)
+    segundos = time.perf_counter() - inicio
+    pico = max((r.get("rss_pico_mb", 0.0) for r in registros), default=0.0)
+    return ok, segundos, _cpu_hijos() - cpu, pico
+
+def medir_por_escena(n, foto, overlay, voz):
+    def correr(registros):
+        escenas = []
+        try:
+            for i in range(n):
+                salida = os.path.join(TEMP_VIDEO_DIR, f"bench_grafo_escena_{i}.mp4")
+                registros.append({})
+                with ffmpeg_core.contexto_escena(registros[-1]):
+                    if not ffmpeg_universal.ensamblar_escena(
+                        foto, overlay, voz, None, None, f"Escena de prueba {i}", salida,
+                        duracion_audio=SEGUNDOS_ESCENA - ffmpeg_core.PADDING_VOZ, sin_audio=True,
+                        rng=random.Random(i)
+                    ):
+                        return False
+                escenas.append(salida)
+            registros.append({})
+            with ffmpeg_core.contexto_escena(registros[-1]):
+                return concatenar_escenas(escenas, os.path.join(TEMP_VIDEO_DIR, "bench_grafo_final.mp4"), "bench")
+        finally:
+            for ruta in escenas + [os.path.join(TEMP_VIDEO_DIR, "bench_grafo_final.mp4")]:
+                if os.path.exists(ruta):
+                    os.remove(ruta)
+    return _medir(correr)
+
+def medir_grafo(n, foto, overlay, voz):
+    def correr(registros):
+        salida = os.path.join(TEMP_VIDEO_DIR, "bench_grafo_unico.mp4")
+        partes = [
+            ffmpeg_universal.ensamblar_escena(
+                foto, overlay, voz, None, None, f"Escena de prueba {i}", salida,
+                duracion_audio=SEGUNDOS_ESCENA - ffmpeg_core.PADDING_VOZ, sin_audio=True,
+                rng=random.Random(i), solo_grafo=True
+            )
+            for i in range(n)
+        ]
+        registros.append({})
+        try:
+            with ffmpeg_core.contexto_escena(registros[-1]):
+                return grafo_unico.renderizar_video(partes, salida) is not None
+        finally:
+            if os.path.exists(salida):
+                os.remove(salida)
+    return _medir(correr)
+
+def ejecutar_benchmark():
+    print("\n" + "=" * 78)
+    print(f"🎬 BENCHMARK GRAFO ÚNICO vs POR ESCENA: escenas de {SEGUNDOS_ESCENA:.0f}s, perfil {ffmpeg_core.perfil_activo()['nombre']}")
+    print("=" * 78 + "\n")
+
+    entradas = crear_entradas()
+    filas = []
+    try:
+        for n in CANTIDADES:
+            filas.append((n, "por escena + concat", *medir_por_escena(n, *entradas)))
+            filas.append((n, "grafo único (xfade)", *medir_grafo(n, *entradas)))
+    finally:
+        for ruta in entradas:
+            os.remove(ruta)
+
+    print(f"{'ESCENAS':>7}  {'MOTOR':<22} {'REAL (s)':>9} {'CPU (s)':>9} {'PICO RAM':>10}")
+    print("-" * 62)
+    for n, motor, ok, segundos, cpu, pico in filas:
+        if ok:
+            print(f"{n:>7}  {motor:<22} {segundos:>9.2f} {cpu:>9.2f} {pico:>7.0f} MB")
+        else:
+            print(f"{n:>7}  {motor:<22} {'FALLÓ':>9}")
+
+if __name__ == "__main__":
+    init_directories()
+    ejecutar_benchmark()
@@ -0,0 +1,131 @@
+# -*- coding: utf-8 -*-
+"""
+==============================================================================
+BENCHMARK DE LA MEZCLA DE AUDIO POR TRABAJO
+==============================================================================
+Mide cuánto tarda armar el audio de un trabajo completo con:
+
+- amix por escena (como antes): un FFmpeg por escena que decodifica voz,
+  música y efecto, los mezcla y codifica su propio AAC.
+- Grafo FFmpeg único (soundtrack_builder.py).
+- Mezclador NumPy (audio_mixer.py): decodificación, mezcla y WAV en proceso,
+  más la codificación AAC que luego se hace en la concatenación.
+
+Usa pistas sintéticas: voces mono a 24 kHz (como edge-tts) y música y
+efectos en WAV 48 kHz estéreo (como los deja audio_library).
+
+Uso:  python benchmark_mezclador.py [escenas] [segundos_por_escena]
+"""
+
+import os
+import sys
+import time
+import subprocess
+from config import *
+import audio_mixer
+import soundtrack_builder
+
+ESCENAS = int(sys.argv[1]) if len(sys.argv) > 1 else 12
+SEGUNDOS_ESCENA = float(sys.argv[2]) if len(sys.argv) > 2 else 15.0
+
+def generar(nombre, fuente, segundos, formato):
+    ruta = os.path.join(TEMP_AUDIO_DIR, f"bench_mezcla_{nombre}")
+    cmd = ["ffmpeg", "-y", "-v", "error", "-f", "lavfi", "-i", fuente, "-t", str(segundos), *formato, ruta]
+    subprocess.run(cmd, check=True)
+    return ruta
+
+def crear_linea_de_tiempo():
+    voces = [
+        generar(f"voz_{i}.mp3", f"sine=frequency={200 + 10 * i}:sample_rate=24000",
+                SEGUNDOS_ESCENA - 0.4, ["-ac", "1", "-b:a", "48k"])
+        for i in range(ESCENAS)
+    ]
+    musicas = [
+        generar(f"bgm_{i}.wav", "anoisesrc=color=pink:amplitude=0.2", 60, ["-ar", str(AUDIO_SAMPLE_RATE), "-ac", "2"])
+        for i in range(2)
+    ]
+    efecto = generar("sfx.wav", "sine=frequency=1000", 2, ["-ar", str(AUDIO_SAMPLE_RATE), "-ac", "2"])
+
+    escenas = []
+    for i, voz in enumerate(voces):
+        escenas.append({
+            "inicio": i * SEGUNDOS_ESCENA,
+            "duracion": SEGUNDOS_ESCENA,
+            "voz": voz,
+            "bgm": musicas[0] if i < ESCENAS // 2 else musicas[1],  # Dos moods en el video
+            "sfx": efecto if i % 3 == 0 else None,
+        })
+    return escenas, voces + musicas + [efecto]
+
+def medir_amix_por_escena(escenas):
+    inicio = time.perf_counter()
+    for i, escena in enumerate(escenas):
+        salida = os.path.join(TEMP_AUDIO_DIR, f"bench_mezcla_escena_{i}.m4a")
+        entradas = ["-i", escena["voz"], "-i", escena["bgm"]]
+        pesos = f"1 {PESO_MUSICA}"
+        if escena["sfx"]:
+            entradas.extend(["-i", escena["sfx"]])
+            pesos += f" {PESO_EFECTOS}"
+        cmd = [
+            "ffmpeg", "-y", "-v", "error", *entradas,
+            "-filter_complex",
+            f"amix=inputs={len(entradas) // 2}:duration=first:dropout_transition=2:weights={pesos}[aout]",
+            "-map", "[aout]", "-c:a", "aac", "-b:a", "128k", "-t", str(escena["duracion"]), salida
+        ]
+        subprocess.run(cmd, check=True)
+        os.remove(salida)
+    return time.perf_counter() - inicio
+
+def medir_grafo_ffmpeg(escenas):
+    salida = os.path.join(TEMP_AUDIO_DIR, "bench_mezcla_grafo.m4a")
+    inicio = time.perf_counter()
+    ok = soundtrack_builder.construir_banda_sonora(escenas, salida)
+    segundos = time.perf_counter() - inicio
+    if os.path.exists(salida):
+        os.remove(salida)
+    return segundos if ok else None
+
+def medir_numpy(escenas):
+    wav = os.path.join(TEMP_AUDIO_DIR, "bench_mezcla_numpy.wav")
+    m4a = os.path.join(TEMP_AUDIO_DIR, "bench_mezcla_numpy.m4a")
+    inicio = time.perf_counter()
+    ok = audio_mixer.mezclar_banda_sonora(escenas, wav)
+    mezcla = time.perf_counter() - inicio
+    subprocess.run(["ffmpeg", "-y", "-v", "error", "-i", wav, "-c:a", "aac", "-b:a", "128k", m4a], check=True)
+    total = time.perf_counter() - inicio
+    for ruta in (wav, m4a):
+        if os.path.exists(ruta):
+            os.remove(ruta)
+    return (mezcla, total) if ok else (None, None)
+
+def ejecutar_benchmark():
+    duracion = ESCENAS * SEGUNDOS_ESCENA
+    print("\n" + "=" * 70)
+    print(f"🎧 BENCHMARK DE MEZCLA: {ESCENAS} escenas de {SEGUNDOS_ESCENA:.0f}s ({duracion:.0f}s de video)")
+    print("=" * 70 + "\n")
+
+    escenas, archivos = crear_linea_de_tiempo()
+    try:
+        antes = medir_amix_por_escena(escenas)
+        grafo = medir_grafo_ffmpeg(escenas)
+        numpy_mezcla, numpy_total = medir_numpy(escenas)
+    finally:
+        for ruta in archivos:
+            os.remove(ruta)
+
+    print(f"{'MÉTODO':<34} {'SEGUNDOS':>9} {'x REAL':>8}")
+    print("-" * 53)
+    for nombre, segundos in (
+        ("amix por escena (antes)", antes),
+        ("grafo FFmpeg único", grafo),
+        ("NumPy (solo mezcla + WAV)", numpy_mezcla),
+        ("NumPy + codificación AAC", numpy_total),
+    ):
+        if segundos:
+            print(f"{nombre:<34} {segundos:>9.2f} {duracion / segundos:>8.1f}")
+        else:
+            print(f"{nombre:<34} {'FALLÓ':>9}")
+
+if __name__ == "__main__":
+    init_directories()
+    ejecutar_benchmark()
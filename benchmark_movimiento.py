@@ -0,0 +1,69 @@
+# -*- coding: utf-8 -*-
+"""
+==============================================================================
+BENCHMARK DEL MOTOR DE MOVIMIENTO (Ken Burns)
+==============================================================================
+Mide cuántos fotogramas por segundo procesa cada preset de motion_engine a la
+resolución configurada, usando una foto sintética de 1920x1080.
+Solo se mide el filtro de movimiento (salida a '-f null'), sin encoder.
+
+Uso:  python benchmark_movimiento.py [segundos_de_video]
+"""
+
+import os
+import sys
+import time
+import subprocess
+from config import *
+from motion_engine import construir_movimiento, PRESETS_MOVIMIENTO, EFECTOS_MOVIMIENTO
+
+SEGUNDOS = float(sys.argv[1]) if len(sys.argv) > 1 else 10.0
+IMAGEN_PRUEBA = os.path.join(TEMP_IMG_DIR, "benchmark_movimiento.jpg")
+
+def crear_imagen_prueba():
+    """Foto de prueba con detalle fino (testsrc2) para que el escalado trabaje de verdad."""
+    cmd = [
+        "ffmpeg", "-y", "-v", "error",
+        "-f", "lavfi", "-i", "testsrc2=size=1920x1080",
+        "-frames:v", "1", IMAGEN_PRUEBA
+    ]
+    subprocess.run(cmd, check=True)
+
+def medir(preset, efecto):
+    args_entrada, filtro = construir_movimiento(preset, efecto)
+    cmd = [
+        "ffmpeg", "-y", "-v", "error",
+        *args_entrada, "-i", IMAGEN_PRUEBA,
+        "-filter_complex", filtro.rstrip(';'),
+        "-map", "[bg]",
+        "-t", str(SEGUNDOS),
+        "-f", "null", "-"
+    ]
+    inicio = time.perf_counter()
+    subprocess.run(cmd, check=True)
+    return time.perf_counter() - inicio
+
+def ejecutar_benchmark():
+    print("\n" + "=" * 70)
+    print(f"🎥 BENCHMARK MOTION ENGINE: {RESOLUTION_W}x{RESOLUTION_H} @ {FPS}fps, {SEGUNDOS:.0f}s por prueba")
+    print("=" * 70 + "\n")
+
+    crear_imagen_prueba()
+    fotogramas = SEGUNDOS * FPS
+
+    print(f"{'PRESET':<12} {'EFECTO':<17} {'SEGUNDOS':>9} {'FPS':>9} {'x REAL':>8}")
+    print("-" * 60)
+    try:
+        for preset in PRESETS_MOVIMIENTO:
+            for efecto in EFECTOS_MOVIMIENTO:
+                try:
+                    segundos = medir(preset, efecto)
+                    print(f"{preset:<12} {efecto:<17} {segundos:>9.2f} {fotogramas / segundos:>9.1f} {SEGUNDOS / segundos:>8.2f}")
+                except subprocess.CalledProcessError:
+                    print(f"{preset:<12} {efecto:<17} {'FALLÓ':>9}")
+    finally:
+        if os.path.exists(IMAGEN_PRUEBA):
+            os.remove(IMAGEN_PRUEBA)
+
+if __name__ == "__main__":
+    ejecutar_benchmark()
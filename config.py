@@ -21,6 +21,10 @@ TEMP_AUDIO_DIR = os.path.join(BASE_DIR, "temp_audio")
 TEMP_VIDEO_DIR = os.path.join(BASE_DIR, "temp_video")
 TEMP_IMG_DIR = os.path.join(BASE_DIR, "temp_processing")
 OUTPUT_DIR = os.path.join(BASE_DIR, "output")
+# Métricas que sobreviven reinicios (velocidades históricas de render, etc.)
+STATS_DIR = os.path.join(BASE_DIR, "render_stats")
+# Recursos derivados que se generan una vez y se reutilizan entre trabajos
+CACHE_DIR = os.path.join(BASE_DIR, "cache_media")
 
 ASSETS_DIR = os.path.join(BASE_DIR, "assets_video")
 
@@ -40,10 +44,96 @@ RESOLUTION_W = 1280
 RESOLUTION_H = 720
 FPS = 15
 VIDEO_PRESET = "ultrafast"
+
+# Perfiles de render con nombre. "standard" es la producción (los valores de
+# arriba); "draft" es la vista previa rápida para revisión editorial (/preview)
+# y "high" una salida de mayor calidad. Todas las plantillas los respetan.
+# Un solo preset por perfil: escenas con distinto preset no se pueden pegar con
+# '-c copy' (ver el contrato de codificación en ffmpeg_core.py).
+PERFILES_RENDER = {
+    "draft": {"ancho": 640, "alto": 360, "fps": 8, "preset": "ultrafast", "crf": 32},
+    "standard": {"ancho": RESOLUTION_W, "alto": RESOLUTION_H, "fps": FPS, "preset": "superfast", "crf": 23},
+    "high": {"ancho": 1920, "alto": 1080, "fps": 30, "preset": "veryfast", "crf": 20},
+}
+PERFIL_RENDER = os.getenv("PERFIL_RENDER", "standard")
+
 CHROMA_COLOR = "0x00FF00"
 CHROMA_SIMILARITY = "0.30"
 CHROMA_BLEND = "0.10"
 
+# Formato de audio del pipeline: la música y los efectos se pre-convierten a esto
+# (ver audio_library.py) para que 'amix' no tenga que remuestrear en cada escena.
+AUDIO_SAMPLE_RATE = 48000
+AUDIO_CHANNELS = 2
+
+# Pesos de 'amix' respecto de la voz (1). Como la música y los efectos llegan
+# normalizados a -23 LUFS, estos pesos valen igual para todas las pistas.
+PESO_MUSICA = 0.28
+PESO_EFECTOS = 0.45
+
+# Quién mezcla la banda sonora del trabajo: "numpy" (audio_mixer.py, en proceso)
+# o "ffmpeg" (grafo de soundtrack_builder.py). Si NumPy falla se usa FFmpeg.
+MEZCLADOR_AUDIO = os.getenv("MEZCLADOR_AUDIO", "numpy")
+
+# Variantes extra que una escena puede codificar en la misma pasada que el master
+# 16:9 (se piden con "variantes" en el payload). 'filtro' parte del cuadro ya
+# compuesto y 'args' son los ajustes de codificación propios de la variante.
+VARIANTES_SALIDA = {
+    # Shorts 9:16: recorte central a pantalla completa vertical
+    "shorts": {
+        "filtro": "crop=trunc(ih*9/32)*2:ih,scale=720:1280,setsar=1",
+        "args": ["-crf", "23"],
+    },
+    # Versión liviana para la app/web
+    "web": {
+        "filtro": "scale=854:480,setsar=1",
+        "args": ["-b:v", "600k", "-maxrate", "800k", "-bufsize", "1200k"],
+    },
+}
+
+# Tope del caché de escenas renderizadas (scene_cache.py), en MB
+MAX_MB_CACHE_ESCENAS = int(os.getenv("MAX_MB_CACHE_ESCENAS", "2048"))
+
+# Motor de render del video (ver grafo_unico.py): "escenas" (un FFmpeg por escena
+# + concatenación), "grafo" (todo el video en un solo grafo con transiciones) o
+# "auto" (grafo hasta UMBRAL_ESCENAS_GRAFO escenas). Medido con benchmark_grafo_unico.py:
+# el grafo ahorra ~5-15% de tiempo pero su RAM crece ~120 MB por escena.
+MODO_RENDER = os.getenv("MODO_RENDER", "auto")
+UMBRAL_ESCENAS_GRAFO = int(os.getenv("UMBRAL_ESCENAS_GRAFO", "4"))
+TRANSICION_GRAFO_TIPO = "fade"
+TRANSICION_GRAFO_SEGUNDOS = 0.3
+
+# Cola de trabajos de video (ver job_queue.py): orden "fifo" (llegada), "sjf" (el
+# más corto según render_predictor.py primero) o "deadline" (el plazo más cercano)
+ORDEN_COLA = os.getenv("ORDEN_COLA", "fifo")
+MAX_TRABAJOS_EN_COLA = int(os.getenv("MAX_TRABAJOS_EN_COLA", "10"))
+
+# Escalera de degradación por carga (ver job_queue.nivel_degradacion): con la cola
+# cargada, cada escalón abarata el render de los trabajos que arrancan. Se sube al
+# escalón cuando esperan 'cola' trabajos o 'espera' segundos de trabajo predicho;
+# se baja de a uno cuando la presión cae bajo HISTERESIS_DEGRADACION de su umbral.
+# Cada escalón incluye lo del anterior: 'movimiento' es el preset más caro permitido
+# (motion_engine), 'overlay_simple' congela el overlay en un cuadro con el chroma
+# aplicado una sola vez y 'perfil' cambia el perfil de render.
+DEGRADACION_POR_CARGA = os.getenv("DEGRADACION_POR_CARGA", "1") == "1"
+ESCALERA_DEGRADACION = [
+    {"nombre": "movimiento_barato", "cola": 3, "espera": 900, "movimiento": "crop"},
+    {"nombre": "fondo_estatico", "cola": 5, "espera": 1800, "movimiento": "estatico"},
+    {"nombre": "overlay_simple", "cola": 7, "espera": 2700, "movimiento": "estatico", "overlay_simple": True},
+    {"nombre": "borrador", "cola": 9, "espera": 3600, "movimiento": "estatico", "overlay_simple": True, "perfil": "draft"},
+]
+HISTERESIS_DEGRADACION = 0.6
+
+# Procesos de trabajo (ver worker_pool.py): los renders corren fuera del proceso de
+# la API y cada proceso se recicla tras TRABAJOS_POR_PROCESO trabajos o si al
+# terminar uno su RSS (sin contar los FFmpeg hijos) pasa de MAX_RSS_PROCESO_MB.
+TRABAJOS_POR_PROCESO = int(os.getenv("TRABAJOS_POR_PROCESO", "20"))
+MAX_RSS_PROCESO_MB = int(os.getenv("MAX_RSS_PROCESO_MB", "500"))
+
+# Implementación del movimiento de cámara en fotos (ver motion_engine.py):
+# "zoompan" (clásico), "scale_eval", "crop" o "estatico", de más caro a más barato.
+MOTION_PRESET = os.getenv("MOTION_PRESET", "zoompan")
+
 # ==============================================================================
 # 3. VOCES DEL TTS (Edge TTS)
 # ==============================================================================
@@ -102,7 +192,7 @@ def get_layout_config(filename):
 # ==============================================================================
 def init_directories():
     directories = [
-        TEMP_AUDIO_DIR, TEMP_VIDEO_DIR, TEMP_IMG_DIR, OUTPUT_DIR,
+        TEMP_AUDIO_DIR, TEMP_VIDEO_DIR, TEMP_IMG_DIR, OUTPUT_DIR, STATS_DIR, CACHE_DIR,
         ASSETS_DIR, 
         os.path.join(ASSETS_DIR, "fonts"), # <-- ESTA ES LA LÍNEA CORREGIDA
         TEMPLATES_DIR, BGM_DIR, SFX_DIR,
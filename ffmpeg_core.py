@@ -5,123 +5,878 @@ FFMPEG CORE (El Motor de Renderizado)
 ==============================================================================
 Este módulo maneja la ejecución segura de comandos de FFmpeg, evitando
 que los procesos se cuelguen (Timeouts) y consuman toda la memoria del servidor.
+Todo proceso externo (FFmpeg, ffprobe, edge-tts) pasa por el mismo runner asyncio:
+grupo de procesos propio, cancelación por trabajo y resultados en el mismo formato.
 """
 
 import os
-import subprocess
+import json
+import math
+import time
+import atexit
+import signal
+import asyncio
+import threading
 import logging
+import multiprocessing
+from collections import deque
+from contextlib import contextmanager
 from config import *
+import shared_store
 
 logger = logging.getLogger(__name__)
 
 # ==============================================================================
-# FUNCIÓN DE EJECUCIÓN SEGURA
+# TELEMETRÍA: CONTEXTO DE LA ESCENA EN CURSO
 # ==============================================================================
-def execute_ffmpeg_command(cmd, timeout=300):
+# Cada hilo de trabajo apunta al registro de la escena que está renderizando;
+# el runner publica ahí el progreso sin que las plantillas tengan que saberlo.
+_contexto = threading.local()
+
+# Líneas de stderr que guardamos para diagnosticar fallos (el resto se descarta)
+LINEAS_STDERR_GUARDADAS = 40
+
+# Cada cuánto se muestrea el RSS del proceso y se revisa el timeout
+INTERVALO_MUESTREO = 0.5
+
+# Si FFmpeg no avanza ni un fotograma en este tiempo, está colgado
+SEGUNDOS_SIN_PROGRESO = 60
+
+# Fracción de la RAM del contenedor que puede usar un render antes de que el
+# vigilante lo mate (el resto es para Flask, Python y el page cache).
+FRACCION_MEMORIA_RENDER = 0.75
+
+@contextmanager
+def contexto_escena(registro):
     """
-    Ejecuta un comando de FFmpeg de manera segura.
-    Retorna True si fue exitoso, False si falló o hubo Timeout.
+    Asocia un diccionario de registro (el de la escena dentro del registro del
+    trabajo) a todos los renders que se lancen desde este hilo.
     """
+    anterior = getattr(_contexto, "registro", None)
+    _contexto.registro = registro
     try:
-        logger.info(f"  [FFmpeg Core] Ejecutando comando... (Timeout: {timeout}s)")
-        
-        # Ejecutar con subprocess.run para bloquear hasta que termine
-        subprocess.run(
-            cmd, 
-            check=True, 
-            stdout=subprocess.DEVNULL, # Oculta el log masivo de FFmpeg en consola
-            stderr=subprocess.DEVNULL, 
-            timeout=timeout
-        )
-        return True
-        
-    except subprocess.TimeoutExpired:
-        logger.error("  [FFmpeg Core] ERROR: El renderizado excedió el tiempo límite. Proceso abortado para proteger el servidor.")
-        return False
-    except subprocess.CalledProcessError as err:
-        logger.error(f"  [FFmpeg Core] FALLO de FFmpeg: Posible falta de RAM o archivo de entrada corrupto.")
-        return False
-    except Exception as e:
-        logger.error(f"  [FFmpeg Core] Error inesperado en FFmpeg: {e}")
-        return False
+        yield registro
+    finally:
+        _contexto.registro = anterior
 
 # ==============================================================================
-# AYUDANTES (HELPERS) PARA FILTROS FFMPEG
+# PERFIL DE RENDER ACTIVO (draft / standard / high)
 # ==============================================================================
-def get_chroma_filter(video_index, out_name):
+@contextmanager
+def contexto_perfil(nombre=None):
     """
-    Devuelve la cadena de filtro para perforar la pantalla verde (Chroma Key).
+    Activa un perfil de PERFILES_RENDER para todos los renders que se lancen desde
+    este hilo (por defecto PERFIL_RENDER). Así una vista previa en 'draft' puede
+    correr al lado de un trabajo de producción sin pisarle la configuración.
     """
-    return f"[{video_index}:v]chromakey={CHROMA_COLOR}:{CHROMA_SIMILARITY}:{CHROMA_BLEND}[{out_name}];"
+    if nombre not in PERFILES_RENDER:
+        if nombre:
+            logger.warning(f"  [FFmpeg Core] Perfil de render desconocido '{nombre}'. Usando '{PERFIL_RENDER}'.")
+        nombre = PERFIL_RENDER if PERFIL_RENDER in PERFILES_RENDER else "standard"
+    anterior = getattr(_contexto, "perfil", None)
+    _contexto.perfil = nombre
+    try:
+        yield perfil_activo()
+    finally:
+        _contexto.perfil = anterior
+
+@contextmanager
+def contexto_degradacion(escalon=None):
+    """
+    Activa un escalón de ESCALERA_DEGRADACION (o ninguno) para los renders de este
+    hilo. Sus ajustes ('movimiento', 'overlay_simple') viajan en perfil_activo(),
+    así las plantillas los ven y la clave del caché de escenas los incluye.
+    """
+    anterior = getattr(_contexto, "degradacion", None)
+    _contexto.degradacion = escalon
+    try:
+        yield escalon
+    finally:
+        _contexto.degradacion = anterior
+
+def perfil_activo():
+    """Ajustes del perfil de render de este hilo ({nombre, ancho, alto, fps, ...})."""
+    nombre = getattr(_contexto, "perfil", None) or PERFIL_RENDER
+    if nombre not in PERFILES_RENDER:
+        nombre = "standard"
+    ajustes = {"nombre": nombre, **PERFILES_RENDER[nombre]}
+    escalon = getattr(_contexto, "degradacion", None)
+    if escalon:
+        ajustes["degradacion"] = escalon["nombre"]
+        ajustes["movimiento"] = escalon.get("movimiento")
+        ajustes["overlay_simple"] = bool(escalon.get("overlay_simple"))
+    return ajustes
+
+def _publicar(datos):
+    registro = getattr(_contexto, "registro", None)
+    if registro is not None:
+        registro.update(datos)
 
-def get_text_filter(text, config_dict, in_name, out_name):
+def leer_rss_mb(pid):
+    """RSS actual de un proceso en MB, leído de /proc (0 si no está disponible)."""
+    try:
+        with open(f"/proc/{pid}/status", 'r') as f:
+            for linea in f:
+                if linea.startswith("VmRSS:"):
+                    return int(linea.split()[1]) / 1024
+    except Exception:
+        pass
+    return 0.0
+
+def limite_memoria_render_mb():
     """
-    Devuelve la cadena de filtro para dibujar el texto sobre el video, 
-    usando las coordenadas de tu diccionario en config.py.
+    RSS máximo que se le tolera a un FFmpeg hijo: una fracción de la RAM del
+    contenedor menos lo que ya ocupa este mismo proceso de Python (y, en un
+    proceso de trabajo de worker_pool.py, el de la API que lo lanzó).
+    None si no conocemos el límite del contenedor.
     """
-    x = config_dict.get("texto_x", 50)
-    y = config_dict.get("texto_y", 600)
-    color = config_dict.get("color", "white")
-    size = config_dict.get("font_size", 45)
-    
-    # Efecto de sombra profesional para que siempre se lea bien
-    shadow = "shadowcolor=black@0.8:shadowx=0:shadowy=0"
-    
-    return f"[{in_name}]drawtext=fontfile='{FONT_PATH}':text='{text}':fontcolor={color}:fontsize={size}:{shadow}:x={x}:y={y}[{out_name}];"
+    memoria = LIMITES_CONTENEDOR["memoria_bytes"]
+    if not memoria:
+        return None
+    ocupado = leer_rss_mb(os.getpid())
+    padre = multiprocessing.parent_process()
+    if padre:
+        ocupado += leer_rss_mb(padre.pid)
+    return memoria / (1024 * 1024) * FRACCION_MEMORIA_RENDER - ocupado
+
+def _interpretar_progreso(linea, estado):
+    """Interpreta una línea clave=valor de las que FFmpeg escribe con '-progress pipe:1'."""
+    clave, _, valor = linea.strip().partition("=")
+    if clave == "out_time_us" and valor.isdigit():
+        estado["segundos_codificados"] = int(valor) / 1_000_000
+    elif clave == "fps":
+        try:
+            estado["fps"] = float(valor)
+        except ValueError:
+            pass
+    elif clave == "speed" and valor.endswith("x"):
+        try:
+            estado["velocidad"] = float(valor[:-1])
+        except ValueError:
+            pass
+    elif clave == "progress":
+        estado["actualizado"] = time.monotonic()
 
-def apply_background_music(video_in, bgm_path, out_name, volume="0.1"):
+# ==============================================================================
+# TIMEOUTS ADAPTATIVOS (VELOCIDAD HISTÓRICA POR TIPO DE ESCENA)
+# ==============================================================================
+ARCHIVO_VELOCIDADES = os.path.join(STATS_DIR, "velocidades_render.json")
+
+# Velocidad supuesta (x tiempo real) mientras no haya historial. Conservadora a propósito.
+VELOCIDAD_INICIAL = 0.3
+# Peso de cada medición nueva en la media móvil exponencial
+PESO_MEDICION = 0.3
+# El timeout es el tiempo esperado multiplicado por este margen, más el arranque de FFmpeg
+MARGEN_TIMEOUT = 3.0
+SEGUNDOS_ARRANQUE = 20
+TIMEOUT_MINIMO = 60
+TIMEOUT_MAXIMO = 1800
+TIMEOUT_POR_DEFECTO = 300
+
+def registrar_velocidad(etiqueta, duracion_video, segundos_reales):
     """
-    Devuelve la cadena de filtro para mezclar el audio principal con música de fondo.
-    Asume que el audio de voz es la pista [0:a] y la BGM es [1:a].
+    Actualiza la velocidad histórica (segundos de video por segundo de reloj) de un
+    tipo de escena. Vive en un archivo compartido: la miden los procesos de trabajo
+    y la lee también la API (render_predictor.py).
     """
-    if not bgm_path:
-        return "" # Si no hay BGM, no hacemos nada
-    
-    # 'amix' mezcla las pistas. 'duration=first' hace que la música dure lo mismo que la voz.
-    return f"[{video_in}a][1:a]amix=inputs=2:duration=first:dropout_transition=2:weights=1 {volume}[{out_name}];"
+    if not duracion_video or segundos_reales <= 0:
+        return
+    medida = duracion_video / segundos_reales
+    with shared_store.modificar(ARCHIVO_VELOCIDADES, {}) as velocidades:
+        anterior = velocidades.get(etiqueta)
+        velocidades[etiqueta] = round(medida if anterior is None else anterior + PESO_MEDICION * (medida - anterior), 4)
+
+def velocidad_historica(etiqueta):
+    """Segundos de video por segundo de reloj que suele rendir ese tipo de escena."""
+    return shared_store.leer(ARCHIVO_VELOCIDADES, {}).get(etiqueta, VELOCIDAD_INICIAL)
+
+def calcular_timeout(etiqueta, duracion_video):
+    """
+    Timeout proporcional a lo que debería tardar la escena según su historial.
+    Sin duración conocida se usa el timeout por defecto.
+    """
+    if not duracion_video:
+        return TIMEOUT_POR_DEFECTO
+    velocidad = velocidad_historica(etiqueta)
+    esperado = duracion_video / max(velocidad, 0.01)
+    return int(min(TIMEOUT_MAXIMO, max(TIMEOUT_MINIMO, SEGUNDOS_ARRANQUE + esperado * MARGEN_TIMEOUT)))
 
 # ==============================================================================
-# EL ENSAMBLADOR FINAL (CONCATENACIÓN HIPER-RÁPIDA)
+# PROCESOS VIVOS Y CANCELACIÓN
 # ==============================================================================
-def concatenate_scenes(scene_files, final_output_path, unique_id):
+# Cada FFmpeg corre en su propio grupo de procesos: cancelar mata el grupo
+# entero y no quedan procesos huérfanos comiendo CPU tras un trabajo abandonado.
+_lock_procesos = threading.Lock()
+_procesos_vivos = {}
+
+@contextmanager
+def contexto_cancelacion(evento):
     """
-    Toma una lista de videos ya renderizados (escenas) y los pega en uno solo
-    en menos de 2 segundos sin volver a codificar (re-encode).
+    Asocia un threading.Event de cancelación a todos los procesos que se lancen
+    desde este hilo: si el evento se activa, el runner los mata (motivo "cancelado").
     """
-    if not scene_files:
-        logger.error("  [FFmpeg Core] No hay escenas para concatenar.")
+    anterior = getattr(_contexto, "cancelacion", None)
+    _contexto.cancelacion = evento
+    try:
+        yield evento
+    finally:
+        _contexto.cancelacion = anterior
+
+def cancelado():
+    """True si el trabajo de este hilo fue cancelado."""
+    evento = getattr(_contexto, "cancelacion", None)
+    return bool(evento and evento.is_set())
+
+def _matar_grupo(pid):
+    """Mata el grupo de procesos de 'pid' (o solo el proceso donde no hay grupos)."""
+    try:
+        if hasattr(os, "killpg"):
+            os.killpg(pid, signal.SIGKILL)
+        else:
+            os.kill(pid, signal.SIGTERM)
+    except (ProcessLookupError, PermissionError, OSError):
+        pass
+
+# Cada proceso lanzado va en su propia sesión, así que no muere con el proceso de
+# trabajo que lo lanzó (si se lo llevó el OOM-killer o se lo mató por no
+# responder). Sus grupos quedan anotados aquí con el pid del padre y la API mata
+# los de padres muertos (ver matar_grupos_huerfanos y worker_pool._cerrar).
+ARCHIVO_GRUPOS_PROCESOS = os.path.join(STATS_DIR, "grupos_procesos.json")
+
+def _anotar_grupo(pid, programa):
+    with shared_store.modificar(ARCHIVO_GRUPOS_PROCESOS, {}) as grupos:
+        grupos[str(pid)] = {"padre": os.getpid(), "programa": os.path.basename(programa)}
+
+def _olvidar_grupo(pid):
+    with shared_store.modificar(ARCHIVO_GRUPOS_PROCESOS, {}) as grupos:
+        grupos.pop(str(pid), None)
+
+def _es_el_mismo_programa(pid, programa):
+    """False si el pid ya es de otro programa (se reusó) o no existe; sin /proc no se puede saber."""
+    try:
+        with open(f"/proc/{pid}/comm", 'r') as f:
+            return f.read().strip() == programa[:15]  # El kernel corta 'comm' a 15 caracteres
+    except FileNotFoundError:
+        return not os.path.isdir("/proc") and _proceso_vivo(pid)
+    except OSError:
         return False
-        
-    list_file_path = os.path.join(TEMP_VIDEO_DIR, f"list_{unique_id}.txt")
-    
+
+def matar_grupos_huerfanos():
+    """Mata los grupos de procesos cuyo proceso padre ya murió (retorna cuántos)."""
+    muertos = 0
+    with shared_store.modificar(ARCHIVO_GRUPOS_PROCESOS, {}) as grupos:
+        for pid, grupo in list(grupos.items()):
+            if _proceso_vivo(grupo["padre"]):
+                continue
+            if _es_el_mismo_programa(int(pid), grupo["programa"]):
+                _matar_grupo(int(pid))
+                muertos += 1
+            del grupos[pid]
+    if muertos:
+        logger.warning(f"  [FFmpeg Core] {muertos} proceso(s) huérfano(s) de un proceso de trabajo muerto. Terminados.")
+    return muertos
+
+@atexit.register
+def terminar_procesos():
+    """Mata todos los FFmpeg vivos (al apagar el servidor)."""
+    with _lock_procesos:
+        pids = list(_procesos_vivos)
+    for pid in pids:
+        _matar_grupo(pid)
+
+async def _correr_proceso(cmd, timeout, al_leer_linea=None, vigilar=None):
+    """
+    Núcleo asyncio del runner: lanza 'cmd' en un grupo de procesos nuevo y lo
+    supervisa hasta que termine. Cada INTERVALO_MUESTREO revisa la cancelación del
+    hilo, el timeout y 'vigilar(pid)', que puede devolver un motivo para matarlo.
+    Con 'al_leer_linea' el stdout se entrega línea por línea; si no, se guarda entero.
+    Retorna {"codigo", "motivo", "stdout", "stderr"}.
+    """
+    stderr_buffer = deque(maxlen=LINEAS_STDERR_GUARDADAS)
+    proceso = await asyncio.create_subprocess_exec(
+        *cmd, stdin=asyncio.subprocess.DEVNULL,
+        stdout=asyncio.subprocess.PIPE, stderr=asyncio.subprocess.PIPE,
+        start_new_session=True
+    )
+    with _lock_procesos:
+        _procesos_vivos[proceso.pid] = cmd[0]
+    _anotar_grupo(proceso.pid, cmd[0])
+
+    async def leer_stdout():
+        if al_leer_linea is None:
+            return await proceso.stdout.read()
+        async for linea in proceso.stdout:
+            al_leer_linea(linea.decode("utf-8", errors="replace"))
+        return b""
+
+    async def leer_stderr():
+        async for linea in proceso.stderr:
+            stderr_buffer.append(linea.decode("utf-8", errors="replace").rstrip())
+
+    lectores = [asyncio.create_task(leer_stdout()), asyncio.create_task(leer_stderr())]
+    espera = asyncio.create_task(proceso.wait())
+    inicio = time.monotonic()
+    motivo = None
     try:
-        # 1. Crear el archivo de lista requerido por FFmpeg
-        logger.info(f"  [FFmpeg Core] Ensamblando {len(scene_files)} escenas...")
-        with open(list_file_path, 'w', encoding='utf-8') as f:
-            for scene in scene_files:
-                # FFmpeg requiere la ruta absoluta envuelta en comillas simples
-                # y caracteres de escape para rutas en Windows/Linux
-                safe_path = scene.replace('\\', '/')
-                f.write(f"file '{safe_path}'\n")
-                
-        # 2. Comando de concatenación pura (Stream Copy)
-        cmd = [
-            "ffmpeg", "-y",
-            "-f", "concat",
-            "-safe", "0",
-            "-i", list_file_path,
-            "-c", "copy", # ¡ESTA ES LA MAGIA! No re-renderiza, solo pega
-            final_output_path
-        ]
-        
-        success = execute_ffmpeg_command(cmd, timeout=60) # Esto es rapidísimo
-        
-        return success and os.path.exists(final_output_path)
-        
+        while True:
+            terminado, _ = await asyncio.wait({espera}, timeout=INTERVALO_MUESTREO)
+            if terminado:
+                break
+            if cancelado():
+                motivo = "cancelado"
+            elif time.monotonic() - inicio > timeout:
+                motivo = "timeout"
+            elif vigilar:
+                motivo = vigilar(proceso.pid)
+            if motivo:
+                _matar_grupo(proceso.pid)
+                break
+        await espera
+        stdout, _ = await asyncio.wait_for(asyncio.gather(*lectores), timeout=5)
+    except BaseException:
+        _matar_grupo(proceso.pid)
+        await espera
+        for tarea in lectores:
+            tarea.cancel()
+        raise
+    finally:
+        with _lock_procesos:
+            _procesos_vivos.pop(proceso.pid, None)
+        _olvidar_grupo(proceso.pid)
+    return {"codigo": proceso.returncode, "motivo": motivo, "stdout": stdout, "stderr": list(stderr_buffer)}
+
+# ==============================================================================
+# RUNNER ÚNICO DE FFMPEG
+# ==============================================================================
+def ejecutar_render(cmd, etiqueta, duracion_esperada=None, timeout=None):
+    """
+    Ejecuta un comando de FFmpeg con telemetría en vivo (núcleo asyncio, ver _correr_proceso).
+    - Reserva los hilos al gobernador de recursos.
+    - Lee '-progress pipe:1' para saber % completado, fps y velocidad (x tiempo real).
+    - Muestrea el RSS del proceso desde /proc y guarda el pico.
+    - Conserva las últimas líneas de stderr para explicar los fallos.
+    - Si no se pasa 'timeout', lo calcula con la velocidad histórica de 'etiqueta'.
+    - Mata el proceso si deja de avanzar durante SEGUNDOS_SIN_PROGRESO.
+    - Mata el proceso si su RSS supera limite_memoria_render_mb(), antes de que
+      el OOM-killer del kernel se lleve puesto a Flask (motivo "memoria").
+    - Mata el proceso (y su grupo) si el trabajo se cancela (motivo "cancelado").
+    Publica todo en el registro de la escena activa (ver contexto_escena) y en los logs.
+    Retorna un diccionario con ok, codigo, motivo, segundos, velocidad, fps, rss_pico_mb y stderr.
+    """
+    estado = {"segundos_codificados": 0.0, "fps": 0.0, "velocidad": 0.0, "progreso": 0.0, "actualizado": time.monotonic()}
+    resultado = {"ok": False, "codigo": None, "motivo": None, "segundos": 0.0,
+                 "velocidad": 0.0, "fps": 0.0, "rss_pico_mb": 0.0, "stderr": []}
+
+    # Opciones globales: progreso legible por máquina y sin la barra de estadísticas
+    cmd = [cmd[0], "-hide_banner", "-progress", "pipe:1", "-nostats"] + list(cmd[1:])
+    if timeout is None:
+        timeout = calcular_timeout(etiqueta, duracion_esperada)
+    inicio = time.monotonic()
+    limite_mb = limite_memoria_render_mb()
+
+    # Detector de cuelgues: último instante en que out_time avanzó
+    vigilancia = {"ultimo_log": -1, "ultimo_avance": inicio, "ultimo_segundo": 0.0}
+
+    def vigilar(pid):
+        """Muestreo periódico: RSS, progreso publicado y cuelgues. Retorna el motivo para matar o None."""
+        rss_mb = leer_rss_mb(pid)
+        resultado["rss_pico_mb"] = max(resultado["rss_pico_mb"], rss_mb)
+
+        if limite_mb and rss_mb > limite_mb:
+            logger.error(
+                f"  [FFmpeg Core] {etiqueta}: RSS {rss_mb:.0f} MB supera el límite de "
+                f"{limite_mb:.0f} MB. Matando antes de que llegue el OOM-killer..."
+            )
+            return "memoria"
+
+        progreso = 0.0
+        if duracion_esperada:
+            progreso = min(100.0, 100.0 * estado["segundos_codificados"] / duracion_esperada)
+        estado["progreso"] = progreso
+        _publicar({
+            "progreso": round(progreso, 1),
+            "velocidad": estado["velocidad"],
+            "fps": estado["fps"],
+            "rss_pico_mb": round(resultado["rss_pico_mb"], 1),
+        })
+
+        # Un log cada 25% para no inundar la consola
+        if int(progreso // 25) > vigilancia["ultimo_log"]:
+            vigilancia["ultimo_log"] = int(progreso // 25)
+            logger.info(
+                f"    [FFmpeg Core] {etiqueta}: {progreso:.0f}% | {estado['fps']:.1f} fps | "
+                f"{estado['velocidad']:.2f}x | RSS pico {resultado['rss_pico_mb']:.0f} MB"
+            )
+
+        ahora = time.monotonic()
+        if estado["segundos_codificados"] > vigilancia["ultimo_segundo"]:
+            vigilancia["ultimo_segundo"] = estado["segundos_codificados"]
+            vigilancia["ultimo_avance"] = ahora
+
+        if ahora - vigilancia["ultimo_avance"] > SEGUNDOS_SIN_PROGRESO:
+            logger.error(
+                f"  [FFmpeg Core] {etiqueta}: sin progreso hace {SEGUNDOS_SIN_PROGRESO}s "
+                f"(atascado en {vigilancia['ultimo_segundo']:.1f}s). Liberando el worker..."
+            )
+            return "estancado"
+        return None
+
+    _publicar({"render": etiqueta, "progreso": 0.0})
+    try:
+        with reservar_hilos(etiqueta) as hilos:
+            salida = asyncio.run(_correr_proceso(
+                aplicar_hilos(cmd, hilos), timeout,
+                al_leer_linea=lambda linea: _interpretar_progreso(linea, estado),
+                vigilar=vigilar
+            ))
+        resultado["codigo"] = salida["codigo"]
+        resultado["motivo"] = salida["motivo"]
+        resultado["stderr"] = salida["stderr"]
+        resultado["ok"] = salida["codigo"] == 0 and salida["motivo"] is None
+        if not resultado["ok"] and resultado["motivo"] is None:
+            resultado["motivo"] = "error_ffmpeg"
+        elif resultado["motivo"] == "timeout":
+            logger.error(f"  [FFmpeg Core] {etiqueta}: excedió {timeout}s. Matando proceso Zombi...")
+        elif resultado["motivo"] == "cancelado":
+            logger.warning(f"  [FFmpeg Core] {etiqueta}: trabajo cancelado. Proceso terminado.")
+
     except Exception as e:
-        logger.error(f"  [FFmpeg Core] Fallo en la concatenación: {e}")
+        resultado["motivo"] = f"excepcion: {e}"
+
+    resultado["segundos"] = round(time.monotonic() - inicio, 2)
+    resultado["velocidad"] = estado["velocidad"]
+    resultado["fps"] = estado["fps"]
+    resultado["rss_pico_mb"] = round(resultado["rss_pico_mb"], 1)
+
+    _publicar({
+        "progreso": 100.0 if resultado["ok"] else round(estado["progreso"], 1),
+        "velocidad": resultado["velocidad"],
+        "fps": resultado["fps"],
+        "rss_pico_mb": resultado["rss_pico_mb"],
+        "segundos_render": resultado["segundos"],
+        "motivo_fallo": resultado["motivo"],
+        "stderr": resultado["stderr"][-10:] if not resultado["ok"] else [],
+    })
+
+    if resultado["ok"]:
+        registrar_velocidad(etiqueta, duracion_esperada, resultado["segundos"])
+        logger.info(
+            f"  [FFmpeg Core] {etiqueta}: listo en {resultado['segundos']}s "
+            f"({resultado['velocidad']:.2f}x, pico {resultado['rss_pico_mb']:.0f} MB)"
+        )
+    elif resultado["motivo"] != "cancelado":
+        logger.error(f"  [FFmpeg Core] {etiqueta}: FALLO ({resultado['motivo']}, código {resultado['codigo']}, pico {resultado['rss_pico_mb']:.0f} MB)")
+        for linea in resultado["stderr"][-10:]:
+            logger.error(f"    [FFmpeg stderr] {linea}")
+    return resultado
+
+def ejecutar_comando(cmd, timeout=30, texto=True):
+    """
+    Runner de los comandos cortos (ffprobe, chequeos, decodificaciones a memoria):
+    mismo núcleo que ejecutar_render (grupo de procesos propio, cancelación del
+    trabajo, timeout) pero sin telemetría ni gobernador de hilos.
+    Retorna un diccionario con ok, codigo, motivo ("timeout", "cancelado",
+    "sin_binario", "error"), stdout (str, o bytes con texto=False) y stderr.
+    """
+    resultado = {"ok": False, "codigo": None, "motivo": None, "stdout": "" if texto else b"", "stderr": []}
+    try:
+        salida = asyncio.run(_correr_proceso(list(cmd), timeout))
+    except FileNotFoundError:
+        resultado["motivo"] = "sin_binario"
+        return resultado
+    except Exception as e:
+        resultado["motivo"] = f"excepcion: {e}"
+        return resultado
+    resultado["codigo"] = salida["codigo"]
+    resultado["stderr"] = salida["stderr"]
+    resultado["stdout"] = salida["stdout"].decode("utf-8", errors="replace") if texto else salida["stdout"]
+    resultado["ok"] = salida["codigo"] == 0 and salida["motivo"] is None
+    resultado["motivo"] = salida["motivo"] or (None if resultado["ok"] else "error")
+    return resultado
+
+# ==============================================================================
+# GOBERNADOR DE RECURSOS (LÍMITES REALES DEL CONTENEDOR)
+# ==============================================================================
+# Memoria aproximada que consume cada hilo de libx264/filtros a 720p. Sirve para
+# no repartir más hilos de los que la RAM del contenedor puede sostener.
+MB_POR_HILO_FFMPEG = 120
+
+def _leer_archivo(ruta):
+    try:
+        with open(ruta, 'r') as f:
+            return f.read().strip()
+    except Exception:
+        return None
+
+def _leer_cpus_cgroup():
+    """CPUs disponibles según la cuota del cgroup (v2 o v1). None si no hay límite."""
+    # cgroup v2: "200000 100000" o "max 100000"
+    cpu_max = _leer_archivo("/sys/fs/cgroup/cpu.max")
+    if cpu_max:
+        partes = cpu_max.split()
+        if len(partes) == 2 and partes[0] != "max":
+            return int(partes[0]) / int(partes[1])
+        return None
+
+    # cgroup v1: cuota -1 significa sin límite
+    cuota = _leer_archivo("/sys/fs/cgroup/cpu/cpu.cfs_quota_us")
+    periodo = _leer_archivo("/sys/fs/cgroup/cpu/cpu.cfs_period_us")
+    if cuota and periodo and int(cuota) > 0:
+        return int(cuota) / int(periodo)
+    return None
+
+def _leer_memoria_cgroup():
+    """Bytes de RAM del contenedor (cgroup v2, v1 o /proc/meminfo como último recurso)."""
+    for ruta in ("/sys/fs/cgroup/memory.max", "/sys/fs/cgroup/memory/memory.limit_in_bytes"):
+        valor = _leer_archivo(ruta)
+        # v1 reporta un número absurdo (~2^63) cuando no hay límite
+        if valor and valor.isdigit() and int(valor) < 1 << 60:
+            return int(valor)
+
+    meminfo = _leer_archivo("/proc/meminfo")
+    if meminfo:
+        for linea in meminfo.splitlines():
+            if linea.startswith("MemTotal:"):
+                return int(linea.split()[1]) * 1024
+    return None
+
+def detectar_limites_contenedor():
+    """Lee CPU y memoria reales del contenedor (no los del host)."""
+    cpus_host = os.cpu_count() or 1
+    cpus = _leer_cpus_cgroup() or cpus_host
+    cpus = max(1, min(int(cpus), cpus_host))
+    return {"cpus": cpus, "memoria_bytes": _leer_memoria_cgroup()}
+
+LIMITES_CONTENEDOR = detectar_limites_contenedor()
+
+# Renders en curso de TODOS los procesos (la API y los de worker_pool.py), para
+# repartir las CPUs entre ellos: "pid:id" -> presupuesto
+ARCHIVO_RENDERS_ACTIVOS = os.path.join(STATS_DIR, "renders_activos.json")
+
+_lock_gobernador = threading.Lock()
+_siguiente_render_id = 0
+
+def _proceso_vivo(pid):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
         return False
+    except PermissionError:
+        pass
+    return True
+
+def olvidar_renders_activos():
+    """Al arrancar la API no hay renders de nadie: descarta los que dejó la ejecución anterior."""
+    with shared_store.modificar(ARCHIVO_RENDERS_ACTIVOS, {}) as activos:
+        activos.clear()
+
+def _calcular_presupuesto(renders_simultaneos):
+    """Reparte las CPUs (y la RAM) del contenedor entre los renders en curso."""
+    hilos = max(1, LIMITES_CONTENEDOR["cpus"] // renders_simultaneos)
+
+    memoria = LIMITES_CONTENEDOR["memoria_bytes"]
+    if memoria:
+        hilos_por_ram = (memoria // (1024 * 1024)) // (MB_POR_HILO_FFMPEG * renders_simultaneos)
+        hilos = max(1, min(hilos, hilos_por_ram))
+
+    # Los filtros (chroma, zoompan) escalan peor que el encoder: la mitad basta
+    return {"threads": hilos, "filter_threads": max(1, hilos // 2)}
+
+@contextmanager
+def reservar_hilos(etiqueta="render"):
+    """
+    Reserva un presupuesto de hilos para un render de FFmpeg mientras dure el bloque 'with'.
+    Cada render nuevo recibe su parte de las CPUs contando los que ya están corriendo
+    en cualquier proceso; al terminar, el presupuesto queda libre para los siguientes.
+    """
+    global _siguiente_render_id
+    with _lock_gobernador:
+        _siguiente_render_id += 1
+        render_id = f"{os.getpid()}:{_siguiente_render_id}"
+    with shared_store.modificar(ARCHIVO_RENDERS_ACTIVOS, {}) as activos:
+        # Los de un proceso que murió (reciclado o caído a mitad de render) ya no cuentan
+        for clave in [c for c in activos if not _proceso_vivo(int(c.split(":")[0]))]:
+            del activos[clave]
+        presupuesto = _calcular_presupuesto(len(activos) + 1)
+        activos[render_id] = presupuesto
+        en_curso = len(activos)
+
+    logger.info(
+        f"  [FFmpeg Core] Gobernador: {etiqueta} -> {presupuesto['threads']} hilos, "
+        f"{presupuesto['filter_threads']} de filtros ({en_curso} render(s) activos, "
+        f"{LIMITES_CONTENEDOR['cpus']} CPUs)"
+    )
+    try:
+        yield presupuesto
     finally:
-        # Limpieza del archivo de texto
-        if os.path.exists(list_file_path):
-            os.remove(list_file_path)
\ No newline at end of file
+        with shared_store.modificar(ARCHIVO_RENDERS_ACTIVOS, {}) as activos:
+            activos.pop(render_id, None)
+
+# '-threads' es una opción de salida: con varias salidas (master, variantes,
+# miniatura) cada una lleva la suya. preparar_salidas deja esta marca como valor
+# y aplicar_hilos la cambia por el presupuesto reservado.
+MARCA_HILOS = "{hilos}"
+
+def aplicar_hilos(cmd, presupuesto):
+    """
+    Inyecta el presupuesto en un comando de FFmpeg ya armado.
+    '-filter_threads' es global (va tras 'ffmpeg'); '-threads' va en cada salida
+    marcada con MARCA_HILOS o, si el comando no trae marcas, justo antes de la única salida.
+    """
+    hilos = str(presupuesto["threads"])
+    if MARCA_HILOS in cmd:
+        cmd = [hilos if arg == MARCA_HILOS else arg for arg in cmd]
+    else:
+        cmd = list(cmd)
+        cmd[-1:-1] = ["-threads", hilos]
+    cmd[1:1] = ["-filter_threads", str(presupuesto["filter_threads"])]
+    return cmd
+
+# ==============================================================================
+# DURACIÓN DE LAS ESCENAS
+# ==============================================================================
+# Silencio extra al final de cada escena para que el corte no muerda la última sílaba
+PADDING_VOZ = 0.4
+
+def redondear_a_fotogramas(segundos, fps=None):
+    """
+    Ajusta una duración al siguiente borde de fotograma. Así cada escena dura
+    exactamente lo que su video y la banda sonora no se desfasa al concatenar.
+    """
+    fps = fps or perfil_activo()["fps"]
+    return round(math.ceil(round(segundos * fps, 6)) / fps, 6)
+
+def obtener_duracion_escena(audio_path, duracion_audio=None):
+    """
+    Segundos que debe durar la escena (voz + padding), redondeados a fotogramas.
+    Si el motor TTS ya nos dio la duración exacta, no lanzamos ningún ffprobe.
+    """
+    if duracion_audio:
+        return redondear_a_fotogramas(duracion_audio + PADDING_VOZ)
+
+    cmd = ["ffprobe", "-v", "error", "-show_entries", "format=duration", "-of", "default=noprint_wrappers=1:nokey=1", audio_path]
+    try:
+        resultado = ejecutar_comando(cmd)
+        return redondear_a_fotogramas(float(resultado["stdout"].strip()) + PADDING_VOZ)
+    except Exception:
+        return 25.0
+
+# ==============================================================================
+# CONTRATO DE CODIFICACIÓN (Escenas que se pegan con '-c copy')
+# ==============================================================================
+# Todas las escenas de un trabajo salen con los mismos parámetros: mismo preset y
+# fps del perfil, mismo formato de píxel, base de tiempo y GOP. Así el concat
+# demuxer las une sin recodificar, sin saltos ni cuadros corruptos.
+PIX_FMT_CONTRATO = "yuv420p"
+TIMESCALE_CONTRATO = 90000
+SEGUNDOS_GOP = 2
+BITRATE_AUDIO = "128k"
+
+def argumentos_video():
+    """Códec y parámetros de video del contrato para el perfil de render activo."""
+    perfil = perfil_activo()
+    return [
+        "-c:v", "libx264", "-preset", perfil["preset"],
+        "-pix_fmt", PIX_FMT_CONTRATO,
+        "-r", str(perfil["fps"]),
+        "-g", str(perfil["fps"] * SEGUNDOS_GOP), "-sc_threshold", "0",
+        "-video_track_timescale", str(TIMESCALE_CONTRATO),
+    ]
+
+def argumentos_audio():
+    """Códec, sample rate y canales del contrato (los del pipeline de audio)."""
+    return [
+        "-c:a", "aac", "-b:a", BITRATE_AUDIO,
+        "-ar", str(AUDIO_SAMPLE_RATE), "-ac", str(AUDIO_CHANNELS),
+    ]
+
+def _sondear_video(ruta):
+    """Parámetros del primer stream de video según ffprobe (None si no se pudo medir)."""
+    cmd = [
+        "ffprobe", "-v", "error", "-select_streams", "v:0",
+        "-show_entries", "stream=codec_name,width,height,pix_fmt,r_frame_rate,time_base",
+        "-of", "json", ruta
+    ]
+    resultado = ejecutar_comando(cmd)
+    if resultado["motivo"] == "sin_binario":
+        raise FileNotFoundError("ffprobe")
+    streams = json.loads(resultado["stdout"] or "{}").get("streams") or []
+    return streams[0] if streams else None
+
+def _incumplimientos(info, ancho, alto):
+    """Lista de lo que una escena no cumple del contrato (vacía si es concatenable)."""
+    perfil = perfil_activo()
+    esperado = {
+        "codec_name": "h264",
+        "pix_fmt": PIX_FMT_CONTRATO,
+        "r_frame_rate": f"{perfil['fps']}/1",
+        "time_base": f"1/{TIMESCALE_CONTRATO}",
+        "width": ancho,
+        "height": alto,
+    }
+    return [f"{clave}={info.get(clave)}" for clave, valor in esperado.items() if info.get(clave) != valor]
+
+def asegurar_concatenables(escenas):
+    """
+    Revisión rápida antes del concat: mide cada escena con ffprobe y vuelve a
+    codificar SOLO las que no cumplen el contrato. La resolución esperada es la
+    de la mayoría (así sirve igual para el master y para las variantes).
+    Retorna (lista_para_concatenar, archivos_normalizados_a_borrar).
+    """
+    try:
+        infos = [_sondear_video(ruta) for ruta in escenas]
+    except (OSError, ValueError) as e:
+        logger.warning(f"  [FFmpeg Core] No se pudo revisar el contrato de las escenas ({e}). Se concatena tal cual.")
+        return list(escenas), []
+
+    medidas = [(i["width"], i["height"]) for i in infos if i]
+    if not medidas:
+        return list(escenas), []
+    ancho, alto = max(set(medidas), key=medidas.count)
+
+    lista, normalizadas = [], []
+    for ruta, info in zip(escenas, infos):
+        fallas = _incumplimientos(info or {}, ancho, alto)
+        if not fallas:
+            lista.append(ruta)
+            continue
+
+        logger.warning(f"  [FFmpeg Core] {os.path.basename(ruta)} no cumple el contrato ({', '.join(fallas)}). Normalizando...")
+        destino = ruta.rsplit(".", 1)[0] + "_norm.mp4"
+        cmd = [
+            "ffmpeg", "-y", "-i", ruta, "-map", "0:v:0",
+            "-vf", f"scale={ancho}:{alto},setsar=1", "-an",
+            *argumentos_video(), "-crf", str(perfil_activo()["crf"]),
+            destino
+        ]
+        resultado = ejecutar_render(cmd, "normalizar")
+        if resultado["ok"] and os.path.exists(destino):
+            lista.append(destino)
+            normalizadas.append(destino)
+        else:
+            # Mejor un corte imperfecto que perder la escena
+            lista.append(ruta)
+    return lista, normalizadas
+
+# ==============================================================================
+# SALIDAS DE CADA ESCENA (Master, variantes y miniatura)
+# ==============================================================================
+# Segundo de la escena del que sale la miniatura del video
+SEGUNDO_MINIATURA = 2.0
+
+def preparar_salidas(etiqueta, output_path, duracion, args_audio, variantes=None, miniatura=None, segundo_miniatura=None):
+    """
+    Arma las salidas de una escena a partir del cuadro compuesto '[etiqueta]'.
+    Todas siguen el contrato de codificación del perfil de render activo.
+    Sin 'variantes' es la salida de siempre. Con variantes ({nombre: ruta}, nombres
+    de VARIANTES_SALIDA) el cuadro se divide con 'split' y cada variante se
+    codifica en la MISMA invocación: decodificación, chroma y movimiento se hacen
+    una sola vez. Las variantes van sin audio (se les une la banda sonora al concatenar).
+    'miniatura' (ruta .jpg) agrega un solo fotograma en SEGUNDO_MINIATURA como salida
+    más, así la miniatura está lista apenas termina la escena (sin volver a decodificarla).
+    'segundo_miniatura' elige otro instante (el grafo único la toma dentro de su escena "body").
+    Retorna (filtro_extra, argumentos_de_salida); el filtro va al final del filter_complex.
+    """
+    codec = argumentos_video()
+    calidad = ["-crf", str(perfil_activo()["crf"])]
+    hilos = ["-threads", MARCA_HILOS]  # Lo completa aplicar_hilos al reservar el presupuesto
+    variantes = {n: r for n, r in (variantes or {}).items() if n in VARIANTES_SALIDA}
+    if not variantes and not miniatura:
+        return "", ["-map", f"[{etiqueta}]", *args_audio, *codec, *calidad, *hilos, "-t", str(duracion), output_path]
+
+    ramas = ["master"] + list(variantes) + (["miniatura"] if miniatura else [])
+    filtros = [f"[{etiqueta}]split={len(ramas)}" + "".join(f"[{etiqueta}_{r}]" for r in ramas)]
+    args = ["-map", f"[{etiqueta}_master]", *args_audio, *codec, *calidad, *hilos, "-t", str(duracion), output_path]
+
+    for nombre, ruta in variantes.items():
+        ajustes = VARIANTES_SALIDA[nombre]
+        filtros.append(f"[{etiqueta}_{nombre}]{ajustes['filtro']}[{etiqueta}_{nombre}_out]")
+        args.extend([
+            "-map", f"[{etiqueta}_{nombre}_out]", "-an",
+            *codec, *ajustes.get("args", []), *hilos,
+            "-t", str(duracion), ruta
+        ])
+
+    if miniatura:
+        # En escenas más cortas que SEGUNDO_MINIATURA se toma la mitad de la escena
+        segundo = segundo_miniatura if segundo_miniatura is not None else min(SEGUNDO_MINIATURA, float(duracion) / 2)
+        filtros.append(f"[{etiqueta}_miniatura]select='gte(t,{segundo:.3f})'[{etiqueta}_miniatura_out]")
+        args.extend([
+            "-map", f"[{etiqueta}_miniatura_out]", "-an",
+            "-frames:v", "1", "-q:v", "2", "-update", "1", *hilos,
+            miniatura
+        ])
+    return ";".join(filtros), args
+
+def completar_plantilla(cmd, filter_complex, etiqueta_render, output_path, duracion, voz=None, bgm_path=None, sfx_path=None,
+                        refuerzo_musica=1.0, variantes=None, miniatura=None, solo_grafo=False, temporales=()):
+    """
+    Cierre común de las plantillas de scene_templates. 'cmd' trae las entradas de
+    video y 'filter_complex' deja el cuadro compuesto en [vout].
+    'voz' (ruta del TTS) agrega el audio de la escena: la voz y, por debajo, la
+    música y los efectos ('refuerzo_musica' los sube). Sin voz la escena es solo
+    video y la banda sonora del trabajo se arma aparte (soundtrack_builder).
+    'variantes' ({nombre: ruta}) y 'miniatura' (ruta .jpg) salen de la misma pasada
+    (ver preparar_salidas).
+    'solo_grafo' no renderiza: retorna la parte de la escena para grafo_unico, con
+    los 'temporales' que hay que borrar al terminar el trabajo.
+    Si renderiza, retorna el resultado de ejecutar_render.
+    """
+    if not voz:
+        filter_complex = filter_complex.rstrip(';')
+        args_audio = ["-an"]
+    else:
+        # Cada pista entra con el índice que le toca después de las entradas de video
+        pistas = [(voz, 1)] + [
+            (ruta, peso * refuerzo_musica)
+            for ruta, peso in ((bgm_path, PESO_MUSICA), (sfx_path, PESO_EFECTOS))
+            if ruta and os.path.exists(ruta)
+        ]
+        primera = cmd.count("-i")
+        for ruta, _ in pistas:
+            cmd.extend(["-i", ruta])
+
+        if len(pistas) > 1:
+            entradas = "".join(f"[{primera + i}:a]" for i in range(len(pistas)))
+            pesos = " ".join(f"{peso:g}" for _, peso in pistas)
+            filter_complex += f"{entradas}amix=inputs={len(pistas)}:duration=first:dropout_transition=2:weights={pesos}[aout]"
+            args_audio = ["-map", "[aout]", *argumentos_audio()]
+        else:
+            filter_complex = filter_complex.rstrip(';')
+            args_audio = ["-map", f"{primera}:a", *argumentos_audio()]
+
+    if solo_grafo:
+        # Modo grafo único: entradas y filtros de la escena, sin salidas
+        return {
+            "entradas": cmd[2:], "filtro": filter_complex, "etiqueta": "vout",
+            "duracion": duracion, "temporales": list(temporales),
+        }
+
+    # Salidas: el master 16:9 y, si se pidieron, las variantes (Shorts/web) y la miniatura
+    filtro_variantes, args_salida = preparar_salidas("vout", output_path, duracion, args_audio, variantes, miniatura)
+    if filtro_variantes:
+        filter_complex = filter_complex.rstrip(';') + ";" + filtro_variantes
+    cmd.extend(["-filter_complex", filter_complex, *args_salida])
+
+    # El timeout sale de la duración de la escena y la velocidad histórica de la plantilla
+    return ejecutar_render(cmd, etiqueta_render, duracion)
+
+# ==============================================================================
+# AYUDANTES (HELPERS) PARA FILTROS FFMPEG
+# ==============================================================================
+def filtro_overlay_congelado(video_index, out_name, escala, fps):
+    """
+    Overlay simple (degradación por carga): toma el primer cuadro del overlay verde,
+    le aplica el chroma una sola vez y lo repite. El overlay va sin '-stream_loop'.
+    """
+    return (
+        f"[{video_index}:v]trim=end_frame=1,format=yuv420p,scale={escala},"
+        f"chromakey={CHROMA_COLOR}:{CHROMA_SIMILARITY}:{CHROMA_BLEND},"
+        f"loop=loop=-1:size=1:start=0,setpts=N/({fps}*TB)[{out_name}];"
+    )
+
+def get_chroma_filter(video_index, out_name):
+    """
+    Devuelve la cadena de filtro para perforar la pantalla verde (Chroma Key).
+    """
+    return f"[{video_index}:v]chromakey={CHROMA_COLOR}:{CHROMA_SIMILARITY}:{CHROMA_BLEND}[{out_name}];"
@@ -0,0 +1,137 @@
+# -*- coding: utf-8 -*-
+"""
+==============================================================================
+GRAFO ÚNICO (Todo el Video en una sola Invocación de FFmpeg)
+==============================================================================
+Motor alternativo al render por escena + concatenación: cada plantilla aporta
+su parte del grafo (entradas y filtros, ver 'solo_grafo'), aquí se renumeran
+las entradas y se renombran las etiquetas para que no choquen, y las escenas
+se unen con transiciones 'xfade'. El video se codifica UNA sola vez, con las
+variantes y la miniatura como salidas extra de la misma pasada.
+
+La voz, la música y los efectos siguen en la banda sonora única del trabajo:
+el orquestador solo corre el inicio de cada escena lo que dura cada transición
+(por eso no hace falta 'acrossfade').
+
+Para comparar contra el render por escena: python benchmark_grafo_unico.py
+"""
+
+import os
+import re
+import logging
+from config import *
+from ffmpeg_core import (
+    perfil_activo, ejecutar_render, preparar_salidas, limite_memoria_render_mb,
+    PIX_FMT_CONTRATO, PADDING_VOZ
+)
+
+logger = logging.getLogger(__name__)
+
+# Las transiciones se comen el silencio del final de cada escena, nunca la voz
+TRANSICION_SEGUNDOS = min(TRANSICION_GRAFO_SEGUNDOS, PADDING_VOZ)
+
+# RAM que suma cada escena al proceso único (medido: ~120 MB por escena a 720p,
+# contra ~155 MB fijos del render por escena, que solo tiene una abierta a la vez)
+MB_BASE_GRAFO = 160
+MB_POR_ESCENA_GRAFO = 120
+
+# ==============================================================================
+# ELECCIÓN DEL MOTOR
+# ==============================================================================
+def elegir_modo(n_escenas, n_en_cache=0, visto_antes=False):
+    """
+    "grafo" o "escenas" según MODO_RENDER. En "auto" el grafo único (algo más
+    rápido: un solo arranque y una sola codificación) se usa para videos de hasta
+    UMBRAL_ESCENAS_GRAFO escenas, siempre que su RAM estimada entre en el límite
+    de memoria de los renders (el proceso único tiene abiertas todas las escenas),
+    y solo si ninguna escena está en el caché de escenas (el grafo no las aprovecha).
+    Una noticia que vuelve ('visto_antes') va por escena mientras el caché esté
+    activo: el grafo no guarda escenas y la próxima corrección no aprovecharía nada.
+    """
+    if MODO_RENDER in ("grafo", "escenas"):
+        return MODO_RENDER
+    if visto_antes and MAX_MB_CACHE_ESCENAS > 0:
+        return "escenas"
+    limite_mb = limite_memoria_render_mb()
+    estimado_mb = MB_BASE_GRAFO + MB_POR_ESCENA_GRAFO * n_escenas
+    if (n_en_cache == 0 and 1 < n_escenas <= UMBRAL_ESCENAS_GRAFO
+            and (limite_mb is None or estimado_mb < limite_mb)):
+        return "grafo"
+    return "escenas"
+
+# ==============================================================================
+# COMPILACIÓN DEL GRAFO
+# ==============================================================================
+def _renombrar(filtro, indice, desplazamiento):
+    """Corre las entradas [N:v] de la escena y le pone el prefijo s<indice>_ a sus etiquetas."""
+    filtro = re.sub(r"\[(\d+):v\]", lambda m: f"[{int(m.group(1)) + desplazamiento}:v]", filtro)
+    filtro = re.sub(r"\[([A-Za-z_]\w*)\]", lambda m: f"[s{indice}_{m.group(1)}]", filtro)
+    return filtro.rstrip(";")
+
+def _transicion(anterior, siguiente):
+    """
+    Largo de la transición entre dos escenas (nunca más de la mitad de ninguna),
+    redondeado hacia abajo a fotogramas para no pasarse del silencio de la voz.
+    """
+    fps = perfil_activo()["fps"]
+    return round(int(min(TRANSICION_SEGUNDOS, anterior / 2, siguiente / 2) * fps) / fps, 6)
+
+def compilar_grafo(partes):
+    """
+    Une las partes de las escenas (dicts de las plantillas con 'solo_grafo') en un grafo.
+    Retorna (entradas, filtro, etiqueta_final, duracion_total, inicios) donde 'inicios'
+    es el segundo en que arranca cada escena dentro del video.
+    """
+    perfil = perfil_activo()
+    entradas, cadenas = [], []
+    desplazamiento = 0
+    for i, parte in enumerate(partes):
+        cadenas.append(_renombrar(parte["filtro"], i, desplazamiento))
+        # Todas las escenas con el mismo fps, formato y base de tiempo: 'xfade' lo exige
+        # ('fps' va al final: 'setpts' deja el cuadro sin frecuencia fija)
+        cadenas.append(
+            f"[s{i}_{parte['etiqueta']}]trim=duration={parte['duracion']},setpts=PTS-STARTPTS,"
+            f"fps={perfil['fps']},format={PIX_FMT_CONTRATO},setsar=1[e{i}]"
+        )
+        entradas.extend(parte["entradas"])
+        desplazamiento += parte["entradas"].count("-i")
+
+    inicios = [0.0]
+    fin = partes[0]["duracion"]
+    actual = "e0"
+    for i in range(1, len(partes)):
+        transicion = _transicion(partes[i - 1]["duracion"], partes[i]["duracion"])
+        offset = round(fin - transicion, 6)
+        cadenas.append(
+            f"[{actual}][e{i}]xfade=transition={TRANSICION_GRAFO_TIPO}:"
+            f"duration={transicion}:offset={offset}[x{i}]"
+        )
+        inicios.append(offset)
+        fin = round(offset + partes[i]["duracion"], 6)
+        actual = f"x{i}"
+    return entradas, ";".join(cadenas), actual, fin, inicios
+
+# ==============================================================================
+# RENDER
+# ==============================================================================
+def renderizar_video(partes, output_path, variantes=None, miniatura=None, segundo_miniatura=None):
+    """
+    Renderiza todas las partes como un solo video (sin audio) en 'output_path'.
+    'variantes' y 'miniatura' como en preparar_salidas, en la misma pasada.
+    Retorna los inicios de cada escena (para la banda sonora) o None si falló.
+    """
+    if not partes:
+        return None
+    entradas, filtro, etiqueta, duracion, inicios = compilar_grafo(partes)
+    filtro_salidas, args_salida = preparar_salidas(
+        etiqueta, output_path, duracion, ["-an"], variantes, miniatura, segundo_miniatura
+    )
+    if filtro_salidas:
+        filtro += ";" + filtro_salidas
+
+    cmd = ["ffmpeg", "-y", *entradas, "-filter_complex", filtro, *args_salida]
+    logger.info(f"  [Grafo Único] Renderizando {len(partes)} escenas en una sola pasada ({duracion:.1f}s)...")
+    resultado = ejecutar_render(cmd, "grafo", duracion)
+    if resultado["ok"] and os.path.exists(output_path) and os.path.getsize(output_path) > 1024:
+        return inicios
+    return None
@@ -0,0 +1,301 @@
+# -*- coding: utf-8 -*-
+"""
+==============================================================================
+JOB QUEUE (Cola de Trabajos por Carriles)
+==============================================================================
+Reemplaza al "servidor ocupado" (503): los pedidos esperan en una cola y se
+producen de a uno por grupo, como antes el candado.
+
+Cada trabajo va a un carril según su prioridad:
+- Video ("urgente", "normal", "fondo"): comparten un solo permiso de render;
+  siempre arranca primero el del carril más alto. Un trabajo con plazo en
+  riesgo (le queda menos de FACTOR_DEADLINE_EN_RIESGO veces su predicción)
+  sube a "urgente".
+- Audio ("audio"): los MP3 del botón "Escuchar" tienen su propio permiso e
+  hilo, así un render largo nunca los deja esperando.
+
+Dentro de cada carril el orden lo define ORDEN_COLA:
+- "fifo":     por orden de llegada.
+- "sjf":      el más corto primero, según la predicción de render_predictor.py
+              (los que esperan más de MAX_ESPERA_SJF pasan adelante igual).
+- "deadline": el de plazo más cercano primero; los que no tienen plazo, al final.
+
+Los trabajos de los carriles de CARRILES_PAUSABLES ceden el permiso entre
+escenas (ver ceder) si espera uno de un carril más alto, y retoman apenas
+vuelve a ser su turno, antes que los de su carril que todavía no arrancaron.
+
+Con las predicciones de cada trabajo se estima cuánto espera uno nuevo: lo que
+le falta al que está en curso más lo que tardan los que van antes que él. La
+latencia de cola medida por carril queda en latencias() (GET /queue).
+
+Esa misma presión (trabajos de video esperando y segundos predichos) decide el
+escalón de ESCALERA_DEGRADACION con el que arranca cada trabajo (ver
+escalon_degradacion): con la cola cargada se renderiza más barato.
+"""
+
+import time
+import logging
+import threading
+from collections import deque
+from config import *
+import job_registry
+
+logger = logging.getLogger(__name__)
+
+# Carriles de cada grupo, del más alto al más bajo. Cada grupo tiene un permiso propio.
+GRUPOS = {
+    "video": ("urgente", "normal", "fondo"),
+    "audio": ("audio",),
+}
+CARRILES = {carril: grupo for grupo, carriles in GRUPOS.items() for carril in carriles}
+
+# Carriles cuyos trabajos dejan pasar a los de más prioridad entre escenas
+CARRILES_PAUSABLES = ("fondo",)
+
+# Un plazo está en riesgo si lo que falta para él es menos que esto por la predicción
+FACTOR_DEADLINE_EN_RIESGO = 2.0
+
+# Con "sjf", un trabajo largo no espera más que esto a que pasen los cortos
+MAX_ESPERA_SJF = 1800
+
+# Cuántas latencias de cola recientes se guardan por carril
+MUESTRAS_LATENCIA = 200
+
+# Cada cuánto un trabajo pausado revisa si lo cancelaron
+INTERVALO_PAUSA = 1.0
+
+_condicion = threading.Condition()
+_grupos = {grupo: {"cola": [], "en_curso": None, "hilo": None} for grupo in GRUPOS}
+_latencias = {carril: deque(maxlen=MUESTRAS_LATENCIA) for carril in CARRILES}
+_nivel_degradacion = 0  # 0: calidad completa; n: ESCALERA_DEGRADACION[n - 1]
+
+# ==============================================================================
+# ORDEN
+# ==============================================================================
+def carril_efectivo(trabajo, ahora=None):
+    """El carril del trabajo, o "urgente" si es de video y su plazo está en riesgo."""
+    carril = trabajo["carril"]
+    if CARRILES[carril] != "video" or not trabajo["deadline"]:
+        return carril
+    ahora = ahora or time.time()
+    margen = (trabajo["prediccion"] or 0) * FACTOR_DEADLINE_EN_RIESGO
+    return "urgente" if trabajo["deadline"] - ahora < margen else carril
+
+def _rango(trabajo, ahora):
+    return GRUPOS[CARRILES[trabajo["carril"]]].index(carril_efectivo(trabajo, ahora))
+
+def _clave_orden(entrada, ahora):
+    trabajo = entrada["trabajo"]
+    # Carril primero; dentro del carril, los pausados (ya invirtieron trabajo) antes que los nuevos
+    clave = (_rango(trabajo, ahora), 0 if entrada["reanudar"] else 1)
+    if ORDEN_COLA == "sjf":
+        vencido = ahora - trabajo["creado"] > MAX_ESPERA_SJF
+        return clave + (0 if vencido else 1, trabajo["prediccion"] or 0, trabajo["creado"])
+    if ORDEN_COLA == "deadline":
+        return clave + (trabajo["deadline"] or float("inf"), trabajo["creado"])
+    return clave + (trabajo["creado"],)
+
+def _ordenada(grupo):
+    ahora = time.time()
+    return sorted(_grupos[grupo]["cola"], key=lambda entrada: _clave_orden(entrada, ahora))
+
+def _grupo_de(trabajo):
+    return _grupos[CARRILES[trabajo["carril"]]]
+
+# ==============================================================================
+# ALTA, BAJA Y CONSULTA
+# ==============================================================================
+def llena(grupo="video"):
+    """True si el grupo no acepta más trabajos (solo el de video tiene tope)."""
+    with _condicion:
+        return grupo == "video" and len(_grupos[grupo]["cola"]) >= MAX_TRABAJOS_EN_COLA
+
+def encolar(trabajo, tarea):
+    """Pone el trabajo en la cola de su carril. 'tarea' (sin argumentos) lo produce cuando le toque."""
+    with _condicion:
+        cola = _grupo_de(trabajo)["cola"]
+        cola.append({"trabajo": trabajo, "tarea": tarea, "reanudar": None})
+        _condicion.notify_all()
+    logger.info(
+        f"  [Cola] Trabajo {trabajo['id']} ({trabajo['article_id']}) en el carril '{trabajo['carril']}' "
+        f"({len(cola)} esperando, orden {ORDEN_COLA})."
+    )
+
+def retirar(job_id):
+    """Saca de la cola un trabajo que todavía no arrancó (y lo cierra como cancelado)."""
+    with _condicion:
+        for grupo in _grupos.values():
+            entrada = next((e for e in grupo["cola"] if e["trabajo"]["id"] == job_id), None)
+            # Los pausados no: su hilo ve la cancelación y hace su propia limpieza
+            if entrada and not entrada["reanudar"]:
+                grupo["cola"].remove(entrada)
+                break
+        else:
+            return False
+    job_registry.finalizar(job_id, "cancelado")
+    return True
+
+def _restante(trabajo):
+    """Segundos que le faltan al trabajo en curso según su predicción."""
+    if not trabajo["inicio"]:
+        return trabajo["prediccion"] or 0
+    return max(0.0, (trabajo["prediccion"] or 0) - (time.time() - trabajo["inicio"]))
+
+def espera_estimada(job_id):
+    """
+    (posición, segundos) del trabajo en la cola: cuántos van antes que él y cuánto
+    tardarían en terminar, incluido el que está en curso. (0, 0) si ya no espera.
+    """
+    with _condicion:
+        for nombre, grupo in _grupos.items():
+            ordenada = _ordenada(nombre)
+            posicion = next((i for i, e in enumerate(ordenada) if e["trabajo"]["id"] == job_id), None)
+            if posicion is None:
+                continue
+            en_curso = grupo["en_curso"]
+            segundos = _restante(en_curso) if en_curso else 0.0
+            segundos += sum(_restante(e["trabajo"]) for e in ordenada[:posicion])
+            return posicion + (1 if en_curso else 0), round(segundos, 1)
+        return 0, 0.0
+
+def latencias():
+    """Por carril: trabajos esperando y latencia de cola (llegada -> arranque) de los últimos."""
+    with _condicion:
+        resultado = {}
+        for carril, grupo in CARRILES.items():
+            medidas = sorted(_latencias[carril])
+            resultado[carril] = {
+                "waiting": sum(1 for e in _grupos[grupo]["cola"] if e["trabajo"]["carril"] == carril),
+                "samples": len(medidas),
+                "mean_seconds": round(sum(medidas) / len(medidas), 1) if medidas else None,
+                "p95_seconds": round(medidas[int(0.95 * (len(medidas) - 1))], 1) if medidas else None,
+                "max_seconds": round(medidas[-1], 1) if medidas else None,
+            }
+        return resultado
+
+# ==============================================================================
+# DEGRADACIÓN POR CARGA
+# ==============================================================================
+def _presion():
+    """(trabajos de video esperando, segundos de video predichos por delante). Con el lock tomado."""
+    grupo = _grupos["video"]
+    segundos = _restante(grupo["en_curso"]) if grupo["en_curso"] else 0.0
+    segundos += sum(_restante(e["trabajo"]) for e in grupo["cola"])
+    return len(grupo["cola"]), segundos
+
+def escalon_degradacion():
+    """
+    Escalón de ESCALERA_DEGRADACION para el trabajo que arranca (None: calidad completa).
+    Sube directo al escalón que marque la presión; baja de a uno y solo cuando la
+    presión cae por debajo de HISTERESIS_DEGRADACION de los umbrales del actual.
+    """
+    global _nivel_degradacion
+    if not DEGRADACION_POR_CARGA:
+        return None
+    with _condicion:
+        cola, espera = _presion()
+        objetivo = max(
+            (i + 1 for i, e in enumerate(ESCALERA_DEGRADACION) if cola >= e["cola"] or espera >= e["espera"]),
+            default=0
+        )
+        anterior = _nivel_degradacion
+        if objetivo > anterior:
+            _nivel_degradacion = objetivo
+        elif objetivo < anterior:
+            actual = ESCALERA_DEGRADACION[anterior - 1]
+            if cola < actual["cola"] * HISTERESIS_DEGRADACION and espera < actual["espera"] * HISTERESIS_DEGRADACION:
+                _nivel_degradacion = anterior - 1
+        nivel = _nivel_degradacion
+    if nivel != anterior:
+        nombre = ESCALERA_DEGRADACION[nivel - 1]["nombre"] if nivel else "completo"
+        logger.warning(f"  [Cola] Degradación por carga: escalón {anterior} -> {nivel} ({nombre}; {cola} en cola, {espera:.0f}s por delante).")
+    return ESCALERA_DEGRADACION[nivel - 1] if nivel else None
+
+def nivel_degradacion():
+    """Escalón de degradación vigente (0 = calidad completa) y la presión que lo sostiene."""
+    with _condicion:
+        cola, espera = _presion()
+        nivel = _nivel_degradacion
+    return {
+        "level": nivel,
+        "name": ESCALERA_DEGRADACION[nivel - 1]["nombre"] if nivel else "completo",
+        "waiting": cola,
+        "predicted_backlog_seconds": round(espera, 1),
+    }
+
+# ==============================================================================
+# PAUSA ENTRE ESCENAS
+# ==============================================================================
+def ceder(trabajo):
+    """
+    Punto de pausa que el orquestador llama entre escenas. Si el trabajo es de un
+    carril pausable y espera uno de más prioridad, le deja el permiso y se bloquea
+    hasta que vuelva a ser su turno (o hasta que lo cancelen).
+    """
+    if trabajo["carril"] not in CARRILES_PAUSABLES:
+        return
+    grupo = _grupo_de(trabajo)
+    with _condicion:
+        ahora = time.time()
+        propio = _rango(trabajo, ahora)
+        if grupo["en_curso"] is not trabajo or not any(_rango(e["trabajo"], ahora) < propio for e in grupo["cola"]):
+            return
+        entrada = {"trabajo": trabajo, "tarea": None, "reanudar": threading.Event()}
+        grupo["cola"].append(entrada)
+        grupo["en_curso"] = None
+        _condicion.notify_all()
+    logger.info(f"  [Cola] ⏸️ Trabajo {trabajo['id']} ({trabajo['carril']}) en pausa: pasa uno más urgente.")
+    job_registry.marcar_pausa(trabajo["id"], True)
+
+    while not entrada["reanudar"].wait(INTERVALO_PAUSA):
+        if trabajo["cancelacion"].is_set():
+            with _condicion:
+                if entrada in grupo["cola"]:
+                    # Sale de la cola y termina su limpieza sin volver a tomar el permiso
+                    grupo["cola"].remove(entrada)
+                    break
+    job_registry.marcar_pausa(trabajo["id"], False)
+    if entrada["reanudar"].is_set():
+        logger.info(f"  [Cola] ▶️ Trabajo {trabajo['id']} retomado.")
+
+# ==============================================================================
+# DESPACHO
+# ==============================================================================
+def _correr(grupo, entrada):
+    trabajo = entrada["trabajo"]
+    try:
+        entrada["tarea"]()
+    except Exception as e:
+        logger.error(f"  [Cola] Error no controlado en el trabajo {trabajo['id']}: {e}")
+    finally:
+        with _condicion:
+            # Un trabajo cancelado en pausa termina sin tener el permiso: no lo suelta por otro
+            if grupo["en_curso"] is trabajo:
+                grupo["en_curso"] = None
+            _condicion.notify_all()
+
+def _despachador(nombre):
+    """Da el permiso del grupo al primero de la cola: arranca su hilo o retoma al pausado."""
+    grupo = _grupos[nombre]
+    while True:
+        with _condicion:
+            while grupo["en_curso"] is not None or not grupo["cola"]:
+                _condicion.wait()
+            entrada = _ordenada(nombre)[0]
+            grupo["cola"].remove(entrada)
+            trabajo = entrada["trabajo"]
+            grupo["en_curso"] = trabajo
+            if not entrada["reanudar"]:
+                _latencias[trabajo["carril"]].append(time.time() - trabajo["creado"])
+        if entrada["reanudar"]:
+            entrada["reanudar"].set()
+        else:
+            threading.Thread(target=_correr, args=(grupo, entrada), name=f"trabajo-{trabajo['id']}", daemon=True).start()
+
+def iniciar():
+    """Arranca un despachador por grupo (una sola vez)."""
+    with _condicion:
+        for nombre, grupo in _grupos.items():
+            if grupo["hilo"] is None:
+                grupo["hilo"] = threading.Thread(target=_despachador, args=(nombre,), name=f"cola-{nombre}", daemon=True)
+                grupo["hilo"].start()
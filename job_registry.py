@@ -0,0 +1,239 @@
+# -*- coding: utf-8 -*-
+"""
+==============================================================================
+JOB REGISTRY (Registro de Trabajos en Memoria)
+==============================================================================
+Cada pedido a /generate_video es un trabajo con un id propio. El registro
+guarda su estado y el evento de cancelación que worker_pool.py le reenvía a
+su proceso de trabajo, donde lo revisan el orquestador y el runner de FFmpeg
+(ver ffmpeg_core.contexto_cancelacion): cancelar un trabajo mata sus procesos,
+corta el bucle de escenas y deja que la limpieza normal borre sus temporales.
+
+Estados: "en_cola" -> "procesando" (<-> "pausado") -> "completado" | "fallido" | "cancelado".
+Mientras procesa, el trabajo pasa por las etapas de ETAPAS (ver marcar_etapa) y
+resumen() arma la vista pública: etapa, escenas listas, progreso y ETA.
+"""
+
+import time
+import uuid
+import logging
+import threading
+
+logger = logging.getLogger(__name__)
+
+# Trabajos terminados que se conservan para consultas (los más viejos se olvidan)
+MAX_TRABAJOS_TERMINADOS = 200
+
+ESTADOS_FINALES = ("completado", "fallido", "cancelado")
+
+# Etapas de un trabajo de video, en orden
+ETAPAS = ("tts", "fetch", "render", "concat", "upload")
+
+# Parte del progreso total que representa cada tramo (el render es casi todo)
+PESO_PREPARACION = 0.10
+PESO_RENDER = 0.80
+PROGRESO_CONCAT = 0.90
+PROGRESO_UPLOAD = 0.95
+
+# Con menos progreso que esto la ETA por extrapolación no es confiable
+PROGRESO_MINIMO_ETA = 0.05
+
+_lock_trabajos = threading.Lock()
+_trabajos = {}
+
+# ==============================================================================
+# ALTA Y CONSULTA
+# ==============================================================================
+def crear_trabajo(article_id, tipo="video", prediccion=None, deadline=None, carril="normal"):
+    """
+    Registra un trabajo nuevo y lo retorna (dict con id, estado y evento de cancelación).
+    'prediccion' son los segundos que debería tardar (render_predictor.py),
+    'deadline' el momento (epoch) en que tiene que estar listo, si lo hay, y
+    'carril' la prioridad con la que espera en la cola (ver job_queue.CARRILES).
+    """
+    trabajo = {
+        "id": uuid.uuid4().hex[:12],
+        "article_id": article_id,
+        "tipo": tipo,
+        "estado": "en_cola",
+        "creado": time.time(),
+        "inicio": None,
+        "fin": None,
+        "cancelacion": threading.Event(),
+        "motivo_cancelacion": None,
+        "prediccion": prediccion,
+        "deadline": deadline,
+        "carril": carril,
+        "registro": {},  # Telemetría del orquestador (escenas, perfil, variantes...), copiada de su proceso
+    }
+    with _lock_trabajos:
+        _trabajos[trabajo["id"]] = trabajo
+        _podar()
+    return trabajo
+
+def obtener(job_id):
+    """El trabajo con ese id, o None."""
+    with _lock_trabajos:
+        return _trabajos.get(job_id)
+
+def activos_de_articulo(article_id, tipo="video"):
+    """Trabajos de la noticia (de ese tipo) que todavía no terminaron."""
+    with _lock_trabajos:
+        return [
+            t for t in _trabajos.values()
+            if t["article_id"] == article_id and t["tipo"] == tipo and t["estado"] not in ESTADOS_FINALES
+        ]
+
+# ==============================================================================
+# CAMBIOS DE ESTADO
+# ==============================================================================
+def marcar_inicio(job_id):
+    with _lock_trabajos:
+        trabajo = _trabajos.get(job_id)
+        if trabajo:
+            trabajo["estado"] = "procesando"
+            trabajo["inicio"] = time.time()
+
+def marcar_pausa(job_id, pausado):
+    """
+    Un trabajo de carril bajo cedió su turno a uno más urgente (o lo retomó).
+    El tiempo en pausa se anota como etapa "pausa" para no ensuciar las demás.
+    """
+    with _lock_trabajos:
+        trabajo = _trabajos.get(job_id)
+        if not trabajo or trabajo["estado"] not in ("procesando", "pausado"):
+            return
+        registro = trabajo["registro"]
+        if pausado and trabajo["estado"] == "procesando":
+            registro["etapa_antes_de_pausa"] = registro.get("etapa")
+            marcar_etapa(registro, "pausa")
+        elif not pausado and trabajo["estado"] == "pausado":
+            marcar_etapa(registro, registro.pop("etapa_antes_de_pausa", None))
+        trabajo["estado"] = "pausado" if pausado else "procesando"
+
+def finalizar(job_id, estado):
+    """Cierra el trabajo. Si fue cancelado, queda "cancelado" aunque el hilo diga otra cosa."""
+    with _lock_trabajos:
+        trabajo = _trabajos.get(job_id)
+        if trabajo:
+            marcar_etapa(trabajo["registro"], None)
+            trabajo["estado"] = "cancelado" if trabajo["cancelacion"].is_set() else estado
+            trabajo["fin"] = time.time()
+
+def marcar_etapa(registro, etapa):
+    """
+    Anota en el registro del trabajo la etapa en curso (una de ETAPAS, o None al
+    terminar) y acumula en 'tiempos_etapas' los segundos de la que termina.
+    """
+    ahora = time.time()
+    anterior = registro.get("etapa")
+    if anterior and registro.get("etapa_desde"):
+        tiempos = registro.setdefault("tiempos_etapas", {})
+        tiempos[anterior] = round(tiempos.get(anterior, 0.0) + ahora - registro["etapa_desde"], 2)
+    registro["etapa"] = etapa
+    registro["etapa_desde"] = ahora if etapa else None
+
+def cancelar(job_id, motivo="cancelado"):
+    """
+    Pide la cancelación de un trabajo en curso. Retorna False si no existe o ya terminó.
+    El hilo del trabajo la ve en su próximo chequeo; sus FFmpeg mueren de inmediato.
+    """
+    with _lock_trabajos:
+        trabajo = _trabajos.get(job_id)
+        if not trabajo or trabajo["estado"] in ESTADOS_FINALES:
+            return False
+        trabajo["motivo_cancelacion"] = motivo
+        trabajo["cancelacion"].set()
+    logger.warning(f"  [Jobs] Trabajo {job_id} ({trabajo['article_id']}) cancelado: {motivo}.")
+    return True
+
+def _podar():
+    """Olvida los trabajos terminados más viejos por encima de MAX_TRABAJOS_TERMINADOS."""
+    terminados = sorted(
+        (t for t in _trabajos.values() if t["estado"] in ESTADOS_FINALES),
+        key=lambda t: t["fin"] or t["creado"]
+    )
+    for trabajo in terminados[:max(0, len(terminados) - MAX_TRABAJOS_TERMINADOS)]:
+        _trabajos.pop(trabajo["id"], None)
+
+# ==============================================================================
+# VISTA PÚBLICA (GET /jobs/<id> y su stream de eventos)
+# ==============================================================================
+def _etapa_visible(registro):
+    """La etapa del trabajo (en pausa, la que tenía al pausarse)."""
+    etapa = registro.get("etapa")
+    return registro.get("etapa_antes_de_pausa") if etapa == "pausa" else etapa
+
+def _progreso(trabajo):
+    """Fracción completada del trabajo (0 a 1) según su etapa y sus escenas."""
+    if trabajo["estado"] in ESTADOS_FINALES:
+        return 1.0
+    registro = trabajo["registro"]
+    etapa = _etapa_visible(registro)
+    total = registro.get("escenas_total") or 0
+    if not etapa or not total:
+        return 0.0
+    if etapa == "concat":
+        return PROGRESO_CONCAT
+    if etapa == "upload":
+        return PROGRESO_UPLOAD
+
+    escenas = registro.get("escenas", [])
+    preparadas = min(1.0, len(escenas) / total)
+    if etapa in ("tts", "fetch"):
+        return PESO_PREPARACION * preparadas
+
+    # Render: escenas terminadas más el avance de la que está en FFmpeg (o del grafo único)
+    if registro.get("modo_render") == "grafo":
+        avance = registro.get("grafo", {}).get("progreso", 0.0) / 100
+    else:
+        listas = sum(1 for e in escenas if e.get("estado") in ("ok", "fallo"))
+        en_curso = next((e for e in escenas if e.get("estado") == "renderizando"), {})
+        avance = (listas + en_curso.get("progreso", 0.0) / 100) / max(1, len(escenas))
+    return PESO_PREPARACION + PESO_RENDER * min(1.0, avance)
+
+def _eta(trabajo, progreso):
+    """
+    Segundos que le faltan al trabajo. Al principio manda la predicción; a medida
+    que avanza pesa más la extrapolación de lo que lleva (progreso real medido).
+    En cola es solo lo que tardará una vez que arranque (la espera la suma job_queue).
+    """
+    prediccion = trabajo["prediccion"]
+    if trabajo["estado"] in ESTADOS_FINALES:
+        return 0.0
+    if trabajo["estado"] == "en_cola":
+        return prediccion
+    transcurrido = time.time() - trabajo["inicio"]
+    restante_predicho = max(0.0, prediccion - transcurrido) if prediccion else None
+    if progreso < PROGRESO_MINIMO_ETA:
+        return None if restante_predicho is None else round(restante_predicho, 1)
+    extrapolado = transcurrido * (1 - progreso) / progreso
+    if restante_predicho is None:
+        return round(extrapolado, 1)
+    return round(progreso * extrapolado + (1 - progreso) * restante_predicho, 1)
+
+def resumen(trabajo):
+    """Estado público del trabajo: etapa, escenas listas del total, progreso y ETA."""
+    registro = trabajo["registro"]
+    progreso = _progreso(trabajo)
+    eta = _eta(trabajo, progreso)
+    return {
+        "job_id": trabajo["id"],
+        "article_id": trabajo["article_id"],
+        "status": trabajo["estado"],
+        "stage": _etapa_visible(registro),
+        "scenes_done": sum(1 for e in registro.get("escenas", []) if e.get("estado") == "ok"),
+        "scenes_total": registro.get("escenas_total") or 0,
+        "progress": round(100 * progreso, 1),
+        "eta_seconds": eta,
+        "predicted_seconds": trabajo["prediccion"],
+        "deadline": trabajo["deadline"],
+        "lane": trabajo["carril"],
+        "render_mode": registro.get("modo_render"),
+        "degradation": registro.get("degradacion"),
+        "stage_seconds": registro.get("tiempos_etapas", {}),
+        "created_at": trabajo["creado"],
+        "started_at": trabajo["inicio"],
+        "finished_at": trabajo["fin"],
+        "cancel_reason": trabajo["motivo_cancelacion"],
+    }
@@ -5,21 +5,32 @@ MAIN ORCHESTRATOR (El Director de Orquesta de Noticias.lat)
 ==============================================================================
 Este archivo recibe el payload JSON estructurado, coordina a los recolectores
 de fondos, al motor de voz, y a los diferentes módulos de FFmpeg.
-Al final, concatena todas las escenas sin pérdida de calidad y limpia el servidor.
+Las escenas se renderizan solo con video; la voz, la música y los efectos se
+arman en una única banda sonora (soundtrack_builder.py). Al final, concatena
+todas las escenas sin pérdida de calidad, les une esa banda sonora y limpia el servidor.
+Con pocas escenas el video entero puede salir de un solo grafo con transiciones
+(grafo_unico.py, ver MODO_RENDER); si ese render falla se vuelve al de por escena.
+El avance se anota en el registro del trabajo por etapas (tts, fetch, render,
+concat; ver job_registry.marcar_etapa) para GET /jobs/<id>.
 """
 
 import os
 import uuid
+import random
 import time
 import logging
-import gc
-import subprocess
 from config import *
 
 # Importamos nuestros submódulos especializados
 import media_manager
 import background_fetcher
 import tts_engine
+import ffmpeg_core
+import soundtrack_builder
+import scene_cache
+import grafo_unico
+import audio_mixer
+import job_registry
 import scene_templates.ffmpeg_intro as ffmpeg_intro
 import scene_templates.ffmpeg_01_mapa as ffmpeg_mapa
 import scene_templates.ffmpeg_02_pexels as ffmpeg_pexels
@@ -30,15 +41,24 @@ logger = logging.getLogger(__name__)
 # ==============================================================================
 # FUNCIÓN AUXILIAR: CONCATENACIÓN RÁPIDA
 # ==============================================================================
-def concatenar_escenas(lista_escenas, output_path, unique_id):
-    """Pega múltiples videos .mp4 en uno solo usando 'concat' de FFmpeg."""
+def concatenar_escenas(lista_escenas, output_path, unique_id, duracion_total=None, audio_path=None):
+    """
+    Pega múltiples videos .mp4 en uno solo usando 'concat' de FFmpeg.
+    'duracion_total' (segundos del video final) permite un timeout proporcional.
+    'audio_path' es la banda sonora del video: se une en la misma pasada. Si ya viene en AAC
+    se copia tal cual; si es la mezcla en WAV de audio_mixer, se codifica aquí (una sola vez).
+    Antes de pegar, las escenas que no cumplen el contrato de codificación se normalizan
+    (solo esas): el '-c copy' con streams distintos da saltos o falla.
+    """
     if not lista_escenas:
         logger.error("  [Orchestrator] Lista de escenas vacía. No hay nada que concatenar.")
         return False
         
     archivo_lista = os.path.join(TEMP_VIDEO_DIR, f"concat_list_{unique_id}.txt")
+    normalizadas = []
     
     try:
+        lista_escenas, normalizadas = ffmpeg_core.asegurar_concatenables(lista_escenas)
         logger.info(f"  [Orchestrator] Ensamblando {len(lista_escenas)} escenas...")
         with open(archivo_lista, 'w', encoding='utf-8') as f:
             for escena in lista_escenas:
@@ -49,148 +69,308 @@ def concatenar_escenas(lista_escenas, output_path, unique_id):
             "ffmpeg", "-y",
             "-f", "concat",
             "-safe", "0",
-            "-i", archivo_lista,
-            "-c", "copy",
-            output_path
+            "-i", archivo_lista
         ]
+        if audio_path:
+            cmd.extend(["-i", audio_path, "-map", "0:v", "-map", "1:a"])
+        cmd.extend(["-c", "copy"])
+        if audio_path and audio_path.lower().endswith(".wav"):
+            # Va después de '-c copy' para que solo el audio se codifique
+            cmd.extend(ffmpeg_core.argumentos_audio())
+        cmd.append(output_path)
         
-        subprocess.run(cmd, check=True, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL, timeout=120)
-        return os.path.exists(output_path) and os.path.getsize(output_path) > 1024
+        resultado = ffmpeg_core.ejecutar_render(cmd, "concat", duracion_total)
+        return resultado["ok"] and os.path.exists(output_path) and os.path.getsize(output_path) > 1024
         
     except Exception as e:
         logger.error(f"  [Orchestrator] Error crítico al concatenar: {e}")
         return False
     finally:
-        if os.path.exists(archivo_lista):
-            os.remove(archivo_lista)
+        for archivo in [archivo_lista, *normalizadas]:
+            if os.path.exists(archivo):
+                os.remove(archivo)
+
+# ==============================================================================
+# RUTEO DE ESCENAS A SUS MÓDULOS ESPECÍFICOS
+# ==============================================================================
+def renderizar_escena(scene, idx, unique_id, audio_path, duracion_audio, escena_output, archivos_temporales, ligero=False, variantes=None, miniatura=None, rng=None, solo_grafo=False, fondo_path=None, registro=None):
+    """
+    Envía la escena a su plantilla de FFmpeg (solo video). Retorna True si se renderizó.
+    'audio_path' solo marca la duración; el audio va en la banda sonora del trabajo.
+    'ligero' pide la variante barata (sin reverse, movimiento simple, escalado menor).
+    'variantes' ({nombre: ruta}) son las salidas extra (Shorts, web) de la misma pasada.
+    'miniatura' (ruta .jpg) pide la miniatura del video como salida más (solo escenas "body").
+    'rng' (random.Random sembrado con la semilla de la escena) hace todas las elecciones.
+    'solo_grafo' no renderiza: retorna la parte de la escena para el grafo único (o None).
+    'fondo_path' es la imagen de una escena "body" ya descargada (ver _descargar_fondo).
+    'registro' (el de la escena) recibe la categoría de la plantilla elegida.
+    """
+    scene_type = scene.get("type", "body")
+    texto_guion = scene.get("text", "")
+    # Descargas propias de la escena: en el grafo único conviven todas a la vez
+    id_escena = f"{unique_id}_{idx}"
+    exito = None if solo_grafo else False
+
+    if scene_type == "intro":
+        intro_path = media_manager.get_random_template("intros", rng)
+        _anotar_plantilla(registro, intro_path)
+        if intro_path:
+            exito = ffmpeg_intro.ensamblar_intro(
+                intro_path, audio_path, None, None, texto_guion, escena_output,
+                duracion_audio=duracion_audio, sin_audio=True, variantes=variantes, solo_grafo=solo_grafo
+            )
+
+    elif scene_type == "mapa":
+        ubicacion = scene.get("ubicacion", "Paraguay")
+        overlay_path = media_manager.get_random_template("sin_presentador", rng)
+        _anotar_plantilla(registro, overlay_path)
+        if overlay_path:
+            exito = ffmpeg_mapa.renderizar_escena_mapa(
+                ubicacion, overlay_path, audio_path, None, None, texto_guion, escena_output, id_escena,
+                duracion_audio=duracion_audio, ligero=ligero, sin_audio=True, variantes=variantes,
+                solo_grafo=solo_grafo
+            )
+
+    elif scene_type == "pexels":
+        termino = scene.get("termino_busqueda", "news")
+        overlay_path = media_manager.get_random_template(scene.get("layout_category", "sin_presentador"), rng)
+        _anotar_plantilla(registro, overlay_path)
+        if overlay_path:
+            exito = ffmpeg_pexels.renderizar_escena_pexels(
+                termino, overlay_path, audio_path, None, None, texto_guion, escena_output, id_escena,
+                duracion_audio=duracion_audio, ligero=ligero, sin_audio=True, variantes=variantes, rng=rng,
+                solo_grafo=solo_grafo
+            )
+
+    elif scene_type == "body":
+        if not fondo_path:
+            fondo_path = _descargar_fondo(scene, id_escena, archivos_temporales)
+
+        if fondo_path:
+            overlay_path = media_manager.get_random_template(scene.get("layout_category", "hombre"), rng)
+            _anotar_plantilla(registro, overlay_path)
+            if overlay_path:
+                exito = ffmpeg_universal.ensamblar_escena(
+                    fondo_path, overlay_path, audio_path, None, None, texto_guion, escena_output,
+                    duracion_audio=duracion_audio, ligero=ligero, sin_audio=True, variantes=variantes,
+                    miniatura=miniatura, rng=rng, solo_grafo=solo_grafo
+                )
+
+    return exito
+
+def _anotar_plantilla(registro, plantilla_path):
+    """Categoría de la plantilla que se usó (su carpeta), para el historial de render_predictor."""
+    if registro is not None and plantilla_path:
+        registro["plantilla"] = os.path.basename(os.path.dirname(plantilla_path))
+
+def _descargar_fondo(scene, id_escena, archivos_temporales):
+    """Descarga la imagen de la noticia de una escena "body". Retorna la ruta o None."""
+    fondo_path = os.path.join(TEMP_IMG_DIR, f"bg_img_{id_escena}.jpg")
+    fondo_path = background_fetcher.obtener_imagen_noticia(scene.get("image_url", ""), fondo_path)
+    if fondo_path:
+        archivos_temporales.append(fondo_path)
+    return fondo_path
 
 # ==============================================================================
 # EL CEREBRO PRINCIPAL
 # ==============================================================================
-def process_video_payload(payload):
-    """Función principal que procesa el JSON enviado por Node.js o el test local."""
+def process_video_payload(payload, registro=None, perfil=None, cancelacion=None, pausa=None, degradacion=None):
+    """
+    Función principal que procesa el JSON enviado por Node.js o el test local.
+    'registro' es el diccionario del trabajo donde se publica el estado de cada escena.
+    'perfil' es el perfil de render (PERFILES_RENDER): "draft" para las vistas previas.
+    Sin perfil se usa PERFIL_RENDER y las salidas llevan el nombre de siempre.
+    'cancelacion' (threading.Event, ver job_registry) corta el trabajo: mata sus FFmpeg,
+    no arranca más escenas y retorna None tras limpiar los temporales.
+    'pausa' (sin argumentos) se llama entre escenas: puede bloquear mientras pasa
+    un trabajo más urgente (ver job_queue.ceder).
+    'degradacion' es el escalón de ESCALERA_DEGRADACION que toca por la carga (o None):
+    abarata movimiento, overlay y perfil, pero las salidas llevan el nombre de siempre.
+    """
+    if registro is None:
+        registro = {}
+    perfil_render = perfil or (degradacion or {}).get("perfil")
+    with ffmpeg_core.contexto_perfil(perfil_render) as ajustes, \
+            ffmpeg_core.contexto_degradacion(degradacion), \
+            ffmpeg_core.contexto_cancelacion(cancelacion):
+        registro["perfil"] = ajustes["nombre"]
+        registro["degradacion"] = degradacion["nombre"] if degradacion else None
+        return _producir_video(payload, registro, f"_{ajustes['nombre']}" if perfil else "", pausa)
+
+def _trabajo_cancelado(registro):
+    """True (y lo deja anotado en el registro) si el trabajo de este hilo fue cancelado."""
+    if ffmpeg_core.cancelado():
+        if not registro.get("cancelado"):
+            logger.warning("  [Orchestrator] 🛑 Trabajo cancelado. Abortando y limpiando temporales...")
+        registro["cancelado"] = True
+        return True
+    return False
+
+def _producir_video(payload, registro, sufijo_salida, pausa=None):
+    """Produce el video del payload con el perfil de render ya activo en este hilo."""
     article_id = payload.get("article_id", "NO_ID")
     scenes = payload.get("scenes", [])
-    
+
+    registro.setdefault("article_id", article_id)
+    registro["escenas"] = []
+    registro["escenas_total"] = len(scenes)
+
+    # Semilla de la noticia: las elecciones "al azar" se repiten si la noticia vuelve
+    # (así las escenas sin cambios salen del caché de escenas)
+    semilla_articulo = str(payload.get("seed", article_id))
+
+    # Variantes pedidas (opt-in): se codifican en la misma pasada que cada escena
+    nombres_variantes = [v for v in payload.get("variantes", []) if v in VARIANTES_SALIDA]
+
     if not scenes:
         logger.error(f"  [Orchestrator] El payload {article_id} no contiene escenas válidas.")
         return None
 
     unique_id = uuid.uuid4().hex[:8]
-    final_output_path = os.path.join(OUTPUT_DIR, f"{article_id}.mp4")
-    thumbnail_output_path = os.path.join(OUTPUT_DIR, f"{article_id}.jpg") # <--- El path del JPG
-    
+    final_output_path = os.path.join(OUTPUT_DIR, f"{article_id}{sufijo_salida}.mp4")
+    thumbnail_output_path = os.path.join(OUTPUT_DIR, f"{article_id}{sufijo_salida}.jpg") # <--- El path del JPG
+
     archivos_temporales = []
-    escenas_renderizadas = []
-    miniatura_creada = False
-    
+    preparadas = []       # Lo que cada escena necesita para renderizarse (voz, semilla, rutas)
+    musica_por_mood = {}  # Una sola pista por mood: así la música sigue sin cortes entre escenas
+
     logger.info(f"========== INICIANDO PRODUCCIÓN MATRICIAL: NOTICIA {article_id} ==========")
-    
+
     try:
         for idx, scene in enumerate(scenes):
-            logger.info(f"  --- Procesando Escena {idx + 1}/{len(scenes)} ---")
-            
+            if idx and pausa:
+                pausa()
+            if _trabajo_cancelado(registro):
+                return None
+            logger.info(f"  --- Preparando Escena {idx + 1}/{len(scenes)} ---")
+
             scene_type = scene.get("type", "body") # intro, mapa, pexels, body
             texto_guion = scene.get("text", "")
-            
+
             # 1. GENERAR EL AUDIO TTS
+            job_registry.marcar_etapa(registro, "tts")
             audio_filename = f"audio_{unique_id}_{idx}.mp3"
             voz_elegida = scene.get("voice", "hombre_1")
-            audio_path = tts_engine.generate_audio_clip(texto_guion, voz_elegida, audio_filename)
-            
-            if audio_path:
+            clip = tts_engine.generate_audio_with_timings(texto_guion, voz_elegida, audio_filename)
+
+            if clip:
+                audio_path = clip["path"]
+                duracion_audio = clip["duracion"]
                 archivos_temporales.append(audio_path)
+                archivos_temporales.append(tts_engine.ruta_tiempos(audio_path))
             else:
                 logger.error(f"  [Orchestrator] Falló el audio en escena {idx}. Saltando.")
                 continue
 
-            # 2. OBTENER BGM Y SFX COMUNES
+            # 2. OBTENER BGM Y SFX COMUNES (con semilla: la misma noticia suena igual)
+            semilla = scene_cache.semilla_escena(semilla_articulo, scene)
             bgm_mood = scene.get("bgm_mood")
-            bgm_path = media_manager.get_random_bgm(bgm_mood) if bgm_mood else None
+            if bgm_mood and bgm_mood not in musica_por_mood:
+                musica_por_mood[bgm_mood] = media_manager.get_random_bgm(
+                    bgm_mood, random.Random(f"{semilla_articulo}|bgm|{bgm_mood}")
+                )
             sfx_type = scene.get("sfx_type")
-            sfx_path = media_manager.get_random_sfx(sfx_type) if sfx_type else None
-            
-            escena_output = os.path.join(TEMP_VIDEO_DIR, f"escena_{unique_id}_{idx}.mp4")
-            exito = False
-
-            # ==========================================================
-            # RUTEO DE ESCENAS A SUS MÓDULOS ESPECÍFICOS
-            # ==========================================================
-            
-            if scene_type == "intro":
-                intro_path = media_manager.get_random_template("intros")
-                if intro_path:
-                    exito = ffmpeg_intro.ensamblar_intro(
-                        intro_path, audio_path, bgm_path, sfx_path, texto_guion, escena_output
-                    )
-            
-            elif scene_type == "mapa":
-                ubicacion = scene.get("ubicacion", "Paraguay")
-                overlay_path = media_manager.get_random_template("sin_presentador")
-                if overlay_path:
-                    exito = ffmpeg_mapa.renderizar_escena_mapa(
-                        ubicacion, overlay_path, audio_path, bgm_path, sfx_path, texto_guion, escena_output, unique_id
-                    )
-                    
-            elif scene_type == "pexels":
-                termino = scene.get("termino_busqueda", "news")
-                overlay_path = media_manager.get_random_template(scene.get("layout_category", "sin_presentador"))
-                if overlay_path:
-                    exito = ffmpeg_pexels.renderizar_escena_pexels(
-                        termino, overlay_path, audio_path, bgm_path, sfx_path, texto_guion, escena_output, unique_id
-                    )
-                    
-            elif scene_type == "body":
-                img_url = scene.get("image_url", "")
-                fondo_path = os.path.join(TEMP_IMG_DIR, f"bg_img_{unique_id}_{idx}.jpg")
-                fondo_path = background_fetcher.obtener_imagen_noticia(img_url, fondo_path)
-                
-                if fondo_path:
-                    archivos_temporales.append(fondo_path)
-                    overlay_path = media_manager.get_random_template(scene.get("layout_category", "hombre"))
-                    if overlay_path:
-                        exito = ffmpeg_universal.ensamblar_escena(
-                            fondo_path, overlay_path, audio_path, bgm_path, sfx_path, texto_guion, escena_output
-                        )
-
-            # ==========================================================
-            # GUARDAR SI FUE EXITOSO
-            # ==========================================================
-            # ==========================================================
-            # GUARDAR SI FUE EXITOSO
-            # ==========================================================
-            if exito and os.path.exists(escena_output):
-                escenas_renderizadas.append(escena_output)
-                archivos_temporales.append(escena_output)
-                
-                # --- 📸 MAGIA DE LA MINIATURA ---
-                # Si es una escena "body" (que tiene la imagen original) y aún no sacamos foto
-                if scene_type == "body" and not miniatura_creada:
-                    try:
-                        # Extraemos un fotograma exacto en el segundo 2 (Alta calidad)
-                        cmd_thumb = [
-                            "ffmpeg", "-y",
-                            "-ss", "00:00:02", 
-                            "-i", escena_output,
-                            "-vframes", "1",
-                            "-q:v", "2", 
-                            thumbnail_output_path
-                        ]
-                        subprocess.run(cmd_thumb, check=True, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
-                        
-                        if os.path.exists(thumbnail_output_path):
-                            logger.info(f"  [Orchestrator] 📸 Miniatura capturada y guardada exitosamente.")
-                            miniatura_creada = True # Cerramos el candado
-                    except Exception as e:
-                        logger.warning(f"  [Orchestrator] ⚠️ No se pudo crear la miniatura: {e}")
-                # -----------------------------
-            else:
-                logger.error(f"  [Orchestrator] Falló el ensamblaje de la escena {idx} ({scene_type}).")
 
-        # 5. CONCATENACIÓN FINAL
+            # 3. RUTAS, REGISTRO Y CLAVE DE CACHÉ DE LA ESCENA
+            variantes_escena = {
+                v: os.path.join(TEMP_VIDEO_DIR, f"escena_{unique_id}_{idx}_{v}.mp4") for v in nombres_variantes
+            }
+            archivos_temporales.extend(variantes_escena.values())
+
+            # La telemetría de FFmpeg (progreso, velocidad, RAM) se publica en este registro
+            registro_escena = {
+                "indice": idx, "tipo": scene_type, "estado": "pendiente", "duracion_audio": duracion_audio
+            }
+            registro["escenas"].append(registro_escena)
+
+            duracion_escena = ffmpeg_core.obtener_duracion_escena(audio_path, duracion_audio)
+            clave = scene_cache.clave_escena(
+                scene, semilla, duracion_escena, ffmpeg_core.perfil_activo(), nombres_variantes
+            )
+
+            # 4. DESCARGAR LA IMAGEN DE LA NOTICIA (las escenas en caché no la necesitan;
+            # Pexels y el mapa bajan lo suyo dentro de su plantilla)
+            fondo_path = None
+            if scene_type == "body" and not scene_cache.esta_en_cache(clave, nombres_variantes):
+                job_registry.marcar_etapa(registro, "fetch")
+                fondo_path = _descargar_fondo(scene, f"{unique_id}_{idx}", archivos_temporales)
+
+            preparadas.append({
+                "idx": idx,
+                "scene": scene,
+                "tipo": scene_type,
+                "audio_path": audio_path,
+                "duracion_audio": duracion_audio,
+                "duracion": duracion_escena,
+                "semilla": semilla,
+                "clave": clave,
+                "fondo": fondo_path,
+                "escena_output": os.path.join(TEMP_VIDEO_DIR, f"escena_{unique_id}_{idx}.mp4"),
+                "variantes": variantes_escena,
+                "bgm": musica_por_mood.get(bgm_mood) if bgm_mood else None,
+                "sfx": media_manager.get_random_sfx(sfx_type, random.Random(f"{semilla}|sfx")) if sfx_type else None,
+                "registro": registro_escena,
+            })
+
+        # 5. RENDER: todo el video en un grafo único o una pasada por escena
+        if _trabajo_cancelado(registro):
+            return None
+        job_registry.marcar_etapa(registro, "render")
+        en_cache = sum(scene_cache.esta_en_cache(p["clave"], nombres_variantes) for p in preparadas)
+        visto_antes = scene_cache.registrar_articulo(article_id, registro.get("perfil"))
+        registro["modo_render"] = grafo_unico.elegir_modo(len(preparadas), en_cache, visto_antes)
+        render = None
+        if registro["modo_render"] == "grafo":
+            render = _renderizar_en_grafo(
+                preparadas, unique_id, thumbnail_output_path, nombres_variantes, registro, archivos_temporales
+            )
+            if render is None and not _trabajo_cancelado(registro):
+                logger.warning("  [Orchestrator] Falló el grafo único. Volviendo al render por escena...")
+                registro["modo_render"] = "escenas"
+        if render is None and not _trabajo_cancelado(registro):
+            render = _renderizar_por_escena(preparadas, unique_id, thumbnail_output_path, archivos_temporales, pausa)
+        if _trabajo_cancelado(registro):
+            return None
+
+        escenas_renderizadas = render["escenas"]
+        linea_de_tiempo = render["linea_de_tiempo"]
+        duracion_total = render["duracion"]
+
+        # 6. BANDA SONORA Y CONCATENACIÓN FINAL
         if len(escenas_renderizadas) > 0:
-            exito_final = concatenar_escenas(escenas_renderizadas, final_output_path, unique_id)
+            job_registry.marcar_etapa(registro, "concat")
+            # Toda la voz, la música y los efectos se mezclan y codifican una sola vez
+            banda_sonora_path = None
+            if MEZCLADOR_AUDIO == "numpy":
+                banda_sonora_path = os.path.join(TEMP_AUDIO_DIR, f"banda_sonora_{unique_id}.wav")
+                archivos_temporales.append(banda_sonora_path)
+                if not audio_mixer.mezclar_banda_sonora(linea_de_tiempo, banda_sonora_path):
+                    logger.warning("  [Orchestrator] Mezcla en NumPy fallida. Usando el grafo de FFmpeg...")
+                    banda_sonora_path = None
+
+            if not banda_sonora_path:
+                banda_sonora_path = os.path.join(TEMP_AUDIO_DIR, f"banda_sonora_{unique_id}.m4a")
+                archivos_temporales.append(banda_sonora_path)
+                if not soundtrack_builder.construir_banda_sonora(linea_de_tiempo, banda_sonora_path):
+                    logger.error("  [Orchestrator] Falló la construcción de la banda sonora.")
+                    return None
+
+            exito_final = concatenar_escenas(
+                escenas_renderizadas, final_output_path, unique_id, duracion_total, audio_path=banda_sonora_path
+            )
             if exito_final:
+                # Las variantes usan la misma banda sonora; solo se arman si tienen todas las escenas
+                registro["variantes"] = {}
+                for v, lista in render["variantes"].items():
+                    if len(lista) != len(escenas_renderizadas):
+                        logger.warning(f"  [Orchestrator] Variante '{v}' incompleta ({len(lista)}/{len(escenas_renderizadas)} escenas). Se omite.")
+                        continue
+                    variante_output = os.path.join(OUTPUT_DIR, f"{article_id}{sufijo_salida}_{v}.mp4")
+                    if concatenar_escenas(lista, variante_output, f"{unique_id}_{v}", duracion_total, audio_path=banda_sonora_path):
+                        registro["variantes"][v] = variante_output
+                    else:
+                        logger.warning(f"  [Orchestrator] Falló la concatenación de la variante '{v}'.")
+
                 logger.info(f"========== ¡SISTEMA COMPLETADO EXITOSAMENTE! Video: {final_output_path} ==========")
                 return final_output_path
             else:
@@ -203,14 +383,177 @@ def process_video_payload(payload):
     except Exception as e:
         logger.error(f"  [Orchestrator] ERROR FATAL EN EL PROCESO: {e}")
         return None
-        
+
     finally:
-        logger.info("  [Orchestrator] Activando recolección de basura...")
+        logger.info("  [Orchestrator] Borrando temporales del trabajo...")
+        if registro.get("cancelado"):
+            # Un trabajo cancelado no deja nada: ni miniatura ni salidas a medio escribir
+            archivos_temporales.extend([final_output_path, thumbnail_output_path])
+            archivos_temporales.extend(
+                os.path.join(OUTPUT_DIR, f"{article_id}{sufijo_salida}_{v}.mp4") for v in nombres_variantes
+            )
         for archivo in archivos_temporales:
             try:
                 if archivo and os.path.exists(archivo):
                     os.remove(archivo)
             except Exception:
                 pass
-        gc.collect()
-        logger.info("  [Orchestrator] Limpieza finalizada. Servidor libre.")
\ No newline at end of file
+        logger.info("  [Orchestrator] Limpieza finalizada. Servidor libre.")
+
+# ==============================================================================
+# MOTORES DE RENDER (Por escena o grafo único)
+# ==============================================================================
+def _entrada_banda_sonora(preparada, inicio):
+    """Voz, música y efecto de la escena en la línea de tiempo de la banda sonora."""
+    return {
+        "inicio": inicio,
+        "duracion": preparada["duracion"],
+        "voz": preparada["audio_path"],
+        "bgm": preparada["bgm"],
+        "sfx": preparada["sfx"],
+        "refuerzo": ffmpeg_intro.REFUERZO_MUSICA_INTRO if preparada["tipo"] == "intro" else 1.0,
+    }
+
+def _renderizar_por_escena(preparadas, unique_id, thumbnail_output_path, archivos_temporales, pausa=None):
+    """
+    Un FFmpeg por escena (con caché de escenas y reintento ligero por memoria).
+    'pausa' se llama antes de cada escena menos la primera (ver process_video_payload).
+    Retorna {"escenas", "variantes", "linea_de_tiempo", "duracion"} para concatenar.
+    """
+    escenas_renderizadas = []
+    escenas_por_variante = {}
+    linea_de_tiempo = []  # Voz, música y efectos de cada escena para la banda sonora
+    duracion_total = 0.0
+    miniatura_creada = False
+
+    for n, p in enumerate(preparadas):
+        if n and pausa:
+            pausa()
+        if ffmpeg_core.cancelado():
+            break
+        idx, scene, registro_escena = p["idx"], p["scene"], p["registro"]
+        escena_output, variantes_escena = p["escena_output"], p["variantes"]
+        logger.info(f"  --- Renderizando Escena {n + 1}/{len(preparadas)} ---")
+
+        # La primera escena "body" (la que tiene la imagen original) trae la miniatura en su render
+        miniatura_escena = thumbnail_output_path if p["tipo"] == "body" and not miniatura_creada else None
+        registro_escena["estado"] = "renderizando"
+        archivos_temporales.append(escena_output)  # También si el render queda a medias
+
+        # Caché de escenas: si nada de lo que define esta escena cambió, no se renderiza
+        desde_cache = scene_cache.recuperar(p["clave"], escena_output, variantes_escena, miniatura_escena)
+        registro_escena["cache"] = desde_cache
+
+        with ffmpeg_core.contexto_escena(registro_escena):
+            exito = desde_cache or renderizar_escena(
+                scene, idx, unique_id, p["audio_path"], p["duracion_audio"],
+                escena_output, archivos_temporales, variantes=variantes_escena,
+                miniatura=miniatura_escena, rng=random.Random(p["semilla"]), fondo_path=p["fondo"],
+                registro=registro_escena
+            )
+
+            # Vigilante de memoria: si FFmpeg fue cortado por RAM, no perdemos la
+            # escena; la repetimos con la variante barata.
+            if not exito and registro_escena.get("motivo_fallo") == "memoria":
+                logger.warning(f"  [Orchestrator] Escena {idx} cortada por memoria. Reintentando en modo ligero...")
+                registro_escena["variante"] = "ligera"
+                exito = renderizar_escena(
+                    scene, idx, unique_id, p["audio_path"], p["duracion_audio"],
+                    escena_output, archivos_temporales, ligero=True, variantes=variantes_escena,
+                    miniatura=miniatura_escena, rng=random.Random(p["semilla"]), fondo_path=p["fondo"],
+                    registro=registro_escena
+                )
+        if ffmpeg_core.cancelado():
+            registro_escena["estado"] = "cancelada"
+            break
+        registro_escena["estado"] = "ok" if exito else "fallo"
+
+        # La variante ligera no va a la caché: la clave es la de la escena con calidad completa
+        ligera = registro_escena.get("variante") == "ligera"
+        if exito and not desde_cache and not ligera and os.path.exists(escena_output):
+            scene_cache.guardar(p["clave"], escena_output, variantes_escena, miniatura_escena)
+
+        # ==========================================================
+        # GUARDAR SI FUE EXITOSO
+        # ==========================================================
+        if exito and os.path.exists(escena_output):
+            escenas_renderizadas.append(escena_output)
+            for v, ruta in variantes_escena.items():
+                if os.path.exists(ruta):
+                    escenas_por_variante.setdefault(v, []).append(ruta)
+            linea_de_tiempo.append(_entrada_banda_sonora(p, duracion_total))
+            duracion_total += p["duracion"]
+
+            # --- 📸 MINIATURA (salió del mismo render de la escena) ---
+            if miniatura_escena and os.path.exists(miniatura_escena):
+                logger.info(f"  [Orchestrator] 📸 Miniatura capturada y guardada exitosamente.")
+                miniatura_creada = True # Cerramos el candado
+            elif miniatura_escena:
+                logger.warning(f"  [Orchestrator] ⚠️ El render no dejó la miniatura. Se intentará con la próxima escena body.")
+            # -----------------------------
+        else:
+            logger.error(f"  [Orchestrator] Falló el ensamblaje de la escena {idx} ({p['tipo']}).")
+
+    return {
+        "escenas": escenas_renderizadas,
+        "variantes": escenas_por_variante,
+        "linea_de_tiempo": linea_de_tiempo,
+        "duracion": duracion_total,
+    }
+
+def _renderizar_en_grafo(preparadas, unique_id, thumbnail_output_path, nombres_variantes, registro, archivos_temporales):
+    """
+    Todo el video en una sola invocación de FFmpeg (grafo_unico.py), con transiciones.
+    Retorna lo mismo que _renderizar_por_escena (un solo "clip" a concatenar) o None si falló.
+    """
+    partes, incluidas = [], []
+    for p in preparadas:
+        parte = renderizar_escena(
+            p["scene"], p["idx"], unique_id, p["audio_path"], p["duracion_audio"],
+            p["escena_output"], archivos_temporales, rng=random.Random(p["semilla"]), solo_grafo=True,
+            fondo_path=p["fondo"], registro=p["registro"]
+        )
+        if parte:
+            archivos_temporales.extend(parte["temporales"])
+            partes.append(parte)
+            incluidas.append(p)
+        else:
+            p["registro"]["estado"] = "fallo"
+            logger.error(f"  [Orchestrator] La escena {p['idx']} ({p['tipo']}) no pudo armarse. Queda fuera del video.")
+    if not partes:
+        return None
+
+    # La miniatura sale de la primera escena "body", dentro de su tramo del video
+    body = next((k for k, p in enumerate(incluidas) if p["tipo"] == "body"), None)
+    inicios = grafo_unico.compilar_grafo(partes)[4]
+    segundo_miniatura = None
+    if body is not None:
+        segundo_miniatura = inicios[body] + min(ffmpeg_core.SEGUNDO_MINIATURA, incluidas[body]["duracion"] / 2)
+
+    video_output = os.path.join(TEMP_VIDEO_DIR, f"grafo_{unique_id}.mp4")
+    variantes = {v: os.path.join(TEMP_VIDEO_DIR, f"grafo_{unique_id}_{v}.mp4") for v in nombres_variantes}
+    archivos_temporales.extend([video_output, *variantes.values()])
+
+    registro["grafo"] = {"escenas": len(partes), "estado": "renderizando"}
+    with ffmpeg_core.contexto_escena(registro["grafo"]):
+        inicios = grafo_unico.renderizar_video(
+            partes, video_output, variantes,
+            thumbnail_output_path if body is not None else None, segundo_miniatura
+        )
+    registro["grafo"]["estado"] = "ok" if inicios else "fallo"
+    if not inicios:
+        return None
+
+    for p in incluidas:
+        p["registro"]["estado"] = "ok"
+    if body is not None and os.path.exists(thumbnail_output_path):
+        logger.info(f"  [Orchestrator] 📸 Miniatura capturada y guardada exitosamente.")
+
+    ultima = incluidas[-1]
+    return {
+        "escenas": [video_output],
+        "variantes": {v: [ruta] for v, ruta in variantes.items() if os.path.exists(ruta)},
+        # Cada escena arranca donde empieza su transición: la voz nunca se pisa (ver grafo_unico)
+        "linea_de_tiempo": [_entrada_banda_sonora(p, inicio) for p, inicio in zip(incluidas, inicios)],
+        "duracion": inicios[-1] + ultima["duracion"],
+    }
@@ -3,8 +3,10 @@
 ==============================================================================
 MEDIA MANAGER (Gestor de Recursos Visuales y Sonoros)
 ==============================================================================
-Este módulo se encarga de escanear los directorios locales para seleccionar
-aleatoriamente músicas, efectos, intros y layouts sin causar errores.
+Este módulo se encarga de seleccionar aleatoriamente músicas, efectos, intros
+y layouts sin causar errores. Con un 'rng' (random.Random sembrado) la elección
+es reproducible: así funciona el caché de escenas (scene_cache.py). Las listas salen del catálogo en memoria
+(asset_catalog.py), sin escanear el disco en cada selección.
 También maneja la descarga de imágenes dinámicas enviadas por Node.js.
 """
 
@@ -12,6 +14,8 @@ import os
 import random
 import logging
 import requests
+import asset_catalog
+import audio_library
 from config import *
 
 logger = logging.getLogger(__name__)
@@ -19,60 +23,70 @@ logger = logging.getLogger(__name__)
 # ==============================================================================
 # FUNCIONES DE SELECCIÓN ALEATORIA LOCAL
 # ==============================================================================
-def get_random_file_from_dir(directory):
+def get_random_file_from_dir(directory, rng=None):
     """
     Busca en un directorio dado y devuelve la ruta absoluta de un archivo al azar.
+    'rng' es un random.Random sembrado para elegir siempre lo mismo (o None).
     Si la carpeta está vacía o no existe, devuelve None.
     """
     if not os.path.exists(directory):
         logger.warning(f"  [MediaManager] Directorio no encontrado: {directory}")
         return None
         
-    files = [f for f in os.listdir(directory) if os.path.isfile(os.path.join(directory, f))]
+    # Las carpetas de templates, bgm y sfx ya están catalogadas en memoria
+    files = asset_catalog.archivos_de_carpeta(directory)
     
-    # Ignorar archivos ocultos o de sistema (como .DS_Store)
-    files = [f for f in files if not f.startswith('.')]
+    if files is None:
+        files = [os.path.join(directory, f) for f in os.listdir(directory) if os.path.isfile(os.path.join(directory, f))]
+        # Ignorar archivos ocultos o de sistema (como .DS_Store)
+        files = [f for f in files if not os.path.basename(f).startswith('.')]
     
     if not files:
         logger.warning(f"  [MediaManager] Directorio vacío: {directory}")
         return None
         
-    chosen_file = random.choice(files)
-    return os.path.join(directory, chosen_file)
+    # Orden fijo: con la misma semilla, la misma elección
+    return (rng or random).choice(sorted(files))
 
-def get_random_bgm(mood):
+def get_random_bgm(mood, rng=None):
     """
     Busca una música de fondo según el mood ('urgencia', 'analisis', 'tension').
     """
     mood_dir = os.path.join(BGM_DIR, mood)
-    bgm_path = get_random_file_from_dir(mood_dir)
+    bgm_path = get_random_file_from_dir(mood_dir, rng)
     
     # Fallback de seguridad si no hay música en esa carpeta
     if not bgm_path:
         logger.warning(f"  [MediaManager] Fallback a primera música disponible.")
         # Intenta buscar en cualquier carpeta de BGM
-        for d in os.listdir(BGM_DIR):
-            fallback_dir = os.path.join(BGM_DIR, d)
-            if os.path.isdir(fallback_dir):
-                bgm_path = get_random_file_from_dir(fallback_dir)
-                if bgm_path: break
+        for d in asset_catalog.tipos("bgm"):
+            bgm_path = get_random_file_from_dir(os.path.join(BGM_DIR, d), rng)
+            if bgm_path: break
                 
-    return bgm_path
+    # Versión normalizada (EBU R128) y ya en el formato del pipeline
+    return audio_library.obtener_audio_normalizado(bgm_path)
 
-def get_random_sfx(sfx_type):
+def get_random_sfx(sfx_type, rng=None):
     """
     Busca un efecto de sonido ('transiciones', 'impactos', 'alertas', 'tecnologia').
     """
     sfx_dir = os.path.join(SFX_DIR, sfx_type)
-    return get_random_file_from_dir(sfx_dir)
+    return audio_library.obtener_audio_normalizado(get_random_file_from_dir(sfx_dir, rng))
 
-def get_random_template(template_type):
+def get_random_template(template_type, rng=None):
     """
     Busca un video base según el tipo ('intros', 'hombre', 'mujer', 'sin_presentador').
     Devuelve la ruta absoluta.
     """
     template_dir = os.path.join(TEMPLATES_DIR, template_type)
-    return get_random_file_from_dir(template_dir)
+    return get_random_file_from_dir(template_dir, rng)
+
+def obtener_info_asset(path):
+    """
+    Metadatos pre-medidos de un template, bgm o sfx (duración, resolución, fps,
+    sample rate, layout y hash). None si no está en el catálogo.
+    """
+    return asset_catalog.obtener_info_asset(path)
 
 # ==============================================================================
 # FUNCIONES DE DESCARGA (FOTOS Y VIDEOS DINÁMICOS)
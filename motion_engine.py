@@ -0,0 +1,137 @@
+# -*- coding: utf-8 -*-
+"""
+==============================================================================
+MOTION ENGINE (Motor de Movimiento de Cámara / Ken Burns)
+==============================================================================
+El movimiento del fondo es el filtro más pesado de las escenas con imagen.
+Este módulo centraliza los movimientos y ofrece varias implementaciones
+intercambiables ("presets") para elegir entre calidad y velocidad:
+
+- zoompan:    El clásico. Escala la foto y zoompan remuestrea el cuadro
+              completo en CADA fotograma. Suave, pero el más caro.
+- scale_eval: La foto se escala una sola vez; el zoom se hace con 'scale'
+              evaluado por fotograma (sub-píxel) y un 'crop' centrado.
+- crop:       La foto se escala una sola vez y se anima solo una ventana de
+              'crop' (paneos puros, sin remuestreo por fotograma).
+- estatico:   Sin movimiento. Foto ajustada a pantalla una sola vez.
+
+Los presets que escalan "una sola vez" leen la imagen como un único fotograma
+y la repiten con el filtro 'loop', así el escalado no se repite por cuadro.
+Para comparar fps por preset: python benchmark_movimiento.py
+"""
+
+import logging
+from config import *
+from ffmpeg_core import perfil_activo
+
+logger = logging.getLogger(__name__)
+
+PRESETS_MOVIMIENTO = ("zoompan", "scale_eval", "crop", "estatico")
+EFECTOS_MOVIMIENTO = ("zoom_in", "paneo_derecha", "paneo_izquierda", "paneo_abajo")
+
+def _entrada_unica(indice, factor, w, h, fps):
+    """
+    Escala la foto una vez (recortada al centro a w x h por 'factor', siempre en
+    la proporción de la pantalla) y la repite infinitamente a 'fps' (sin re-escalar por cuadro).
+    """
+    return (
+        f"[{indice}:v]scale={int(w*factor)}:{int(h*factor)}:force_original_aspect_ratio=increase,"
+        f"crop={int(w*factor)}:{int(h*factor)},"
+        f"loop=loop=-1:size=1:start=0,setpts=N/({fps}*TB),fps={fps}"
+    )
+
+def _zoompan(indice, salida, efecto, factor, velocidad, zoom_max, w, h, fps, cuadros_zoom):
+    pasos_paneo = 2  # píxeles por fotograma en los paneos
+    if efecto == "zoom_in":
+        return f"[{indice}:v]scale={int(w*factor)}:-2,zoompan=z='min(zoom+{velocidad},{zoom_max})':d={cuadros_zoom}:x='iw/2-(iw/zoom/2)':y='ih/2-(ih/zoom/2)':s={w}x{h}:fps={fps}[{salida}];"
+    if efecto == "paneo_derecha":
+        return f"[{indice}:v]scale=-2:{int(h*factor)},zoompan=z=1.1:d=200:x='x+{pasos_paneo}':y='ih/2-(ih/zoom/2)':s={w}x{h}:fps={fps}[{salida}];"
+    if efecto == "paneo_izquierda":
+        return f"[{indice}:v]scale=-2:{int(h*factor)},zoompan=z=1.1:d=200:x='if(eq(on,1),iw-iw/zoom,x-{pasos_paneo})':y='ih/2-(ih/zoom/2)':s={w}x{h}:fps={fps}[{salida}];"
+    return f"[{indice}:v]scale={int(w*factor)}:-2,zoompan=z=1.1:d=200:x='iw/2-(iw/zoom/2)':y='y+{pasos_paneo}':s={w}x{h}:fps={fps}[{salida}];"
+
+def _crop(indice, salida, efecto, w, h, fps, duracion=None):
+    # Como mucho la velocidad de paneo de zoompan (2 px por fotograma); si se sabe
+    # cuánto dura la escena, más lento para que el margen alcance hasta el final
+    # y la imagen no quede quieta contra el borde.
+    # 'crop' no puede cambiar de tamaño por fotograma, así que el "zoom" se
+    # reemplaza por una deriva diagonal lenta desde el centro.
+    factor = 1.15
+    margen_x, margen_y = int(w * factor) - w, int(h * factor) - h
+    vel_x = vel_y = 2 * fps
+    if duracion:
+        vel_x, vel_y = min(vel_x, margen_x / duracion), min(vel_y, margen_y / duracion)
+    base = _entrada_unica(indice, factor, w, h, fps)
+    if efecto == "paneo_derecha":
+        x, y = f"min(iw-ow,t*{vel_x:.3f})", "(ih-oh)/2"
+    elif efecto == "paneo_izquierda":
+        x, y = f"max(0,(iw-ow)-t*{vel_x:.3f})", "(ih-oh)/2"
+    elif efecto == "paneo_abajo":
+        x, y = "(iw-ow)/2", f"min(ih-oh,t*{vel_y:.3f})"
+    else:
+        x, y = f"max(0,(iw-ow)/2-t*{vel_x/2:.3f})", f"max(0,(ih-oh)/2-t*{vel_y/2:.3f})"
+    return f"{base},crop={w}:{h}:x='{x}':y='{y}'[{salida}];"
+
+def _scale_eval(indice, salida, efecto, velocidad, zoom_max, w, h, fps, duracion=None):
+    if efecto != "zoom_in":
+        # Los paneos no necesitan remuestrear: la ventana de crop es exacta
+        return _crop(indice, salida, efecto, w, h, fps, duracion)
+    # El zoom por fotograma de zoompan equivale a 'velocidad * fps' por segundo.
+    # Ancho y alto van explícitos: el cuadro siempre cubre w x h por el zoom
+    # (la entrada ya viene en la proporción de la pantalla, no se deforma)
+    zoom = f"min(1+{velocidad * fps}*t,{zoom_max})"
+    base = _entrada_unica(indice, zoom_max, w, h, fps)
+    return (
+        f"{base},scale=w='ceil({w}*{zoom}/2)*2':h='ceil({h}*{zoom}/2)*2':eval=frame,"
+        f"crop={w}:{h}:x='(iw-ow)/2':y='(ih-oh)/2'[{salida}];"
+    )
+
+def _estatico(indice, salida, w, h, fps):
+    base = _entrada_unica(indice, 1.0, w, h, fps)
+    return f"{base},crop={w}:{h}[{salida}];"
+
+def preset_efectivo(preset=None):
+    """
+    El preset pedido (o MOTION_PRESET), abaratado hasta el tope que fije la
+    degradación por carga activa ('movimiento' del perfil, ver contexto_degradacion).
+    """
+    preset = preset or MOTION_PRESET
+    tope = perfil_activo().get("movimiento")
+    if tope in PRESETS_MOVIMIENTO and preset in PRESETS_MOVIMIENTO:
+        if PRESETS_MOVIMIENTO.index(tope) > PRESETS_MOVIMIENTO.index(preset):
+            return tope
+    return preset
+
+def construir_movimiento(preset=None, efecto="zoom_in", indice=0, salida="bg",
+                         factor=1.5, velocidad=0.001, zoom_max=1.3, cuadros_zoom=200,
+                         w=RESOLUTION_W, h=RESOLUTION_H, fps=FPS, duracion=None):
+    """
+    Arma el movimiento de cámara para una imagen fija.
+
+    Parámetros:
+    - preset: 'zoompan', 'scale_eval', 'crop' o 'estatico' (por defecto MOTION_PRESET de config;
+      nunca más caro que el tope de la degradación por carga, ver preset_efectivo).
+    - efecto: 'zoom_in', 'paneo_derecha', 'paneo_izquierda' o 'paneo_abajo'.
+    - indice / salida: entrada de FFmpeg y etiqueta del filtro resultante.
+    - factor, velocidad, zoom_max: escala previa y parámetros del zoom (como en zoompan).
+    - cuadros_zoom: 'd' del zoom_in con zoompan (cada plantilla conserva el suyo:
+      200 la universal, 450 mapa y Pexels).
+    - duracion: segundos de la escena; los paneos de 'crop' se reparten el margen en ese tiempo.
+
+    Retorna (argumentos_de_entrada, filtro): los argumentos van justo antes de '-i imagen'.
+    """
+    preset = preset_efectivo(preset)
+    if preset not in PRESETS_MOVIMIENTO:
+        logger.warning(f"    [Motion Engine] Preset desconocido '{preset}'. Usando zoompan.")
+        preset = "zoompan"
+
+    if preset == "zoompan":
+        # zoompan necesita un flujo continuo de fotogramas de entrada
+        return ["-loop", "1", "-framerate", str(fps)], _zoompan(
+            indice, salida, efecto, factor, velocidad, zoom_max, w, h, fps, cuadros_zoom
+        )
+    if preset == "scale_eval":
+        return [], _scale_eval(indice, salida, efecto, velocidad, zoom_max, w, h, fps, duracion)
+    if preset == "crop":
+        return [], _crop(indice, salida, efecto, w, h, fps, duracion)
+    return [], _estatico(indice, salida, w, h, fps)
@@ -0,0 +1,129 @@
+# -*- coding: utf-8 -*-
+"""
+==============================================================================
+OVERLAY CACHE (Overlays en Ping-Pong Precalculados)
+==============================================================================
+Las escenas de Pexels muestran el overlay "ida y vuelta" (ping-pong). Armarlo
+en cada render obliga al filtro 'reverse' a guardar TODOS los fotogramas en RAM.
+Este módulo lo genera una sola vez por plantilla y resolución (la del perfil de
+render: así ningún render lo re-escala por fotograma), con el verde convertido
+en transparencia (canal alfa), y lo reutiliza en todos los trabajos.
+Si la plantilla cambia (contenido o parámetros de chroma), se regenera.
+"""
+
+import os
+import re
+import glob
+import hashlib
+import logging
+import threading
+import asset_catalog
+from config import *
+from ffmpeg_core import ejecutar_render, perfil_activo
+
+logger = logging.getLogger(__name__)
+
+PINGPONG_DIR = os.path.join(CACHE_DIR, "pingpong")
+os.makedirs(PINGPONG_DIR, exist_ok=True)
+
+# Subir este número obliga a regenerar todos los overlays (cambio de receta)
+VERSION_RECETA = 1
+
+_locks_plantillas = {}
+_lock_global = threading.Lock()
+
+def _lock_de(plantilla):
+    with _lock_global:
+        return _locks_plantillas.setdefault(plantilla, threading.Lock())
+
+def _clave_plantilla(overlay_path, ancho, alto):
+    """Huella de la plantilla + todo lo que afecta al resultado (resolución y chroma)."""
+    # El hash de contenido del catálogo sobrevive a copias y redeploys; si la
+    # plantilla no está catalogada usamos tamaño y fecha.
+    huella = asset_catalog.hash_asset(overlay_path)
+    if not huella:
+        info = os.stat(overlay_path)
+        huella = f"{info.st_size}|{info.st_mtime_ns}"
+    datos = (
+        f"{os.path.basename(overlay_path)}|{huella}|"
+        f"{ancho}x{alto}|{CHROMA_COLOR}|{CHROMA_SIMILARITY}|{CHROMA_BLEND}|v{VERSION_RECETA}"
+    )
+    return hashlib.sha1(datos.encode("utf-8")).hexdigest()[:12]
+
+def _prefijo(overlay_path, ancho, alto):
+    """Nombre de los archivos de la plantilla a esa resolución (cada resolución tiene el suyo)."""
+    nombre = os.path.splitext(os.path.basename(overlay_path))[0]
+    return os.path.join(PINGPONG_DIR, f"{nombre}_{ancho}x{alto}")
+
+def _ruta_cache(overlay_path, ancho, alto):
+    return f"{_prefijo(overlay_path, ancho, alto)}_{_clave_plantilla(overlay_path, ancho, alto)}.mov"
+
+def _generar_pingpong(overlay_path, destino, ancho, alto):
+    """
+    Renderiza ida + vuelta con alfa en QuickTime Animation (qtrle): sin pérdidas,
+    soporta transparencia y se decodifica muy rápido.
+    """
+    temporal = f"{destino}.{os.getpid()}.tmp.mov"  # Otro proceso puede estar generando el mismo
+    cmd = [
+        "ffmpeg", "-y", "-v", "error",
+        "-i", overlay_path,
+        "-filter_complex",
+        f"[0:v]scale={ancho}:{alto},format=yuv420p,split=2[ida][vuelta_src];"
+        f"[vuelta_src]reverse[vuelta];"
+        f"[ida][vuelta]concat=n=2:v=1:a=0,"
+        f"chromakey={CHROMA_COLOR}:{CHROMA_SIMILARITY}:{CHROMA_BLEND},format=argb[out]",
+        "-map", "[out]", "-an",
+        "-c:v", "qtrle",
+        temporal
+    ]
+    resultado = ejecutar_render(cmd, "pingpong")
+    if resultado["ok"] and os.path.exists(temporal):
+        os.replace(temporal, destino)
+        return True
+
+    logger.error(f"  [Overlay Cache] No se pudo generar el ping-pong de {os.path.basename(overlay_path)} ({resultado['motivo']})")
+    if os.path.exists(temporal):
+        os.remove(temporal)
+    return False
+
+def _borrar_versiones_viejas(overlay_path, vigente, ancho, alto):
+    """Las otras versiones de la plantilla a esta resolución y las de antes de separar por resolución."""
+    nombre = os.path.splitext(os.path.basename(overlay_path))[0]
+    sin_resolucion = glob.glob(os.path.join(PINGPONG_DIR, f"{nombre}_*.mov"))
+    sin_resolucion = [r for r in sin_resolucion if re.fullmatch(r"[0-9a-f]{12}\.mov", os.path.basename(r)[len(nombre) + 1:])]
+    for viejo in glob.glob(f"{_prefijo(overlay_path, ancho, alto)}_*.mov") + sin_resolucion:
+        if viejo != vigente:
+            try:
+                os.remove(viejo)
+            except OSError:
+                pass
+
+def obtener_overlay_pingpong(overlay_path, ancho=RESOLUTION_W, alto=RESOLUTION_H):
+    """
+    Devuelve la ruta del overlay en ping-pong con alfa para esta plantilla a
+    ancho x alto, generándolo si no existe o si la plantilla cambió. None si no se pudo.
+    """
+    if not overlay_path or not os.path.exists(overlay_path):
+        return None
+
+    with _lock_de(f"{overlay_path}|{ancho}x{alto}"):
+        destino = _ruta_cache(overlay_path, ancho, alto)
+        if os.path.exists(destino) and os.path.getsize(destino) > 1024:
+            return destino
+
+        logger.info(f"  [Overlay Cache] Generando ping-pong con alfa para {os.path.basename(overlay_path)}...")
+        if not _generar_pingpong(overlay_path, destino, ancho, alto):
+            return None
+
+        _borrar_versiones_viejas(overlay_path, destino, ancho, alto)
+        return destino
+
+def precalentar_pingpong(template_type="sin_presentador"):
+    """Genera por adelantado los ping-pong de todas las plantillas de una categoría (perfil de producción)."""
+    plantillas = asset_catalog.listar("templates", template_type)
+    if not plantillas:
+        return
+    perfil = perfil_activo()  # Al arrancar, sin contexto: el de PERFIL_RENDER
+    for plantilla in plantillas:
+        obtener_overlay_pingpong(plantilla, perfil["ancho"], perfil["alto"])
+    logger.info(f"  [Overlay Cache] Ping-pong listos para '{template_type}'.")
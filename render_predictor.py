@@ -0,0 +1,200 @@
+# -*- coding: utf-8 -*-
+"""
+==============================================================================
+RENDER PREDICTOR (Cuánto va a tardar un Trabajo)
+==============================================================================
+Cada trabajo terminado deja una línea en el historial (STATS_DIR) con las
+características de sus escenas (tipo, largo del texto, duración de la voz,
+plantilla, tipo de fondo) y los segundos medidos de cada etapa.
+
+Con ese historial se ajusta una regresión lineal chica (mínimos cuadrados con
+NumPy, por perfil de render) que predice la duración de un trabajo nuevo solo
+con su payload: así la API puede dar una ETA al aceptar el pedido y la cola
+puede ordenar por costo (ver job_queue.py). Mientras no haya historial
+suficiente se estima con las velocidades históricas de FFmpeg por plantilla.
+"""
+
+import os
+import json
+import time
+import logging
+import threading
+import numpy as np
+from config import *
+import ffmpeg_core
+
+logger = logging.getLogger(__name__)
+
+ARCHIVO_HISTORIAL = os.path.join(STATS_DIR, "historial_trabajos.jsonl")
+
+# Solo los trabajos más recientes entran al ajuste (el servidor y las plantillas cambian)
+MAX_MUESTRAS = 500
+# Con menos trabajos del perfil que esto, la regresión no es confiable
+MIN_MUESTRAS_MODELO = 20
+# Regularización (ridge): evita coeficientes absurdos con pocas muestras parecidas
+PESO_REGULARIZACION = 1.0
+
+# Estimación sin historial: ritmo del TTS y costo fijo por trabajo y por escena
+CARACTERES_POR_SEGUNDO_VOZ = 15.0
+SEGUNDOS_TTS_POR_ESCENA = 2.0
+SEGUNDOS_FIJOS_TRABAJO = 10.0
+# Cada variante (Shorts, web) suma una codificación extra por escena
+COSTO_POR_VARIANTE = 0.5
+
+PREDICCION_MINIMA = 5.0
+
+TIPOS_ESCENA = ("body", "pexels", "mapa", "intro")
+
+# Etiqueta de ejecutar_render de la plantilla de cada tipo (velocidades históricas)
+ETIQUETA_RENDER = {"body": "universal", "pexels": "pexels", "mapa": "mapa", "intro": "intro"}
+
+# Fondo de cada tipo de escena (lo que se descarga o decodifica además del overlay)
+FONDO_POR_TIPO = {"body": "foto", "pexels": "video_stock", "mapa": "mapa", "intro": "plantilla"}
+
+# Plantillas sin presentador: las demás suman el overlay del presentador con chroma
+PLANTILLAS_SIN_PRESENTADOR = ("sin_presentador", "intros")
+
+_lock_modelo = threading.Lock()
+_modelos = {}  # perfil -> (muestras usadas, coeficientes o None)
+
+# ==============================================================================
+# CARACTERÍSTICAS
+# ==============================================================================
+def caracteristicas_escena(scene):
+    """Lo que se sabe de una escena antes de renderizarla."""
+    tipo = scene.get("type", "body")
+    fondo = FONDO_POR_TIPO.get(tipo, "foto")
+    if tipo == "body" and not scene.get("image_url"):
+        fondo = "generico"
+    # Lo que elegiría main_orchestrator.renderizar_escena; la plantilla que de verdad
+    # se usó la anota el render en el registro y registrar_trabajo la toma de ahí
+    plantilla = {"intro": "intros", "mapa": "sin_presentador"}.get(tipo) or scene.get("layout_category") \
+        or ("hombre" if tipo == "body" else "sin_presentador")
+    return {
+        "tipo": tipo,
+        "caracteres": len(scene.get("text", "")),
+        "plantilla": plantilla,
+        "fondo": fondo,
+    }
+
+def segundos_voz(escena):
+    """Segundos de video de la escena: la voz medida si está en el historial, si no estimada por el texto."""
+    if escena.get("duracion_audio"):
+        return escena["duracion_audio"] + ffmpeg_core.PADDING_VOZ
+    return escena["caracteres"] / CARACTERES_POR_SEGUNDO_VOZ + ffmpeg_core.PADDING_VOZ
+
+def _vector(escenas, n_variantes):
+    """
+    Vector de la regresión: término fijo, cantidad de escenas y segundos de voz
+    de cada tipo (lo que más pesa en el render), costo de las variantes (por
+    segundo de video), escenas con presentador y escenas con fondo genérico.
+    """
+    # Las que no llegaron a renderizarse o salieron de la caché de escenas casi no
+    # cuestan: contarlas haría que un trabajo servido desde la caché tire las
+    # estimaciones para abajo (al predecir nunca traen estas marcas)
+    escenas = [e for e in escenas if not e.get("omitida") and not e.get("cache")]
+    segundos = [segundos_voz(e) for e in escenas]
+    return [
+        1.0,
+        *(sum(1 for e in escenas if e["tipo"] == tipo) for tipo in TIPOS_ESCENA),
+        *(sum(s for e, s in zip(escenas, segundos) if e["tipo"] == tipo) for tipo in TIPOS_ESCENA),
+        n_variantes * sum(segundos),
+        sum(1 for e in escenas if e["plantilla"] not in PLANTILLAS_SIN_PRESENTADOR),
+        sum(1 for e in escenas if e["fondo"] == "generico"),
+    ]
+
+# ==============================================================================
+# HISTORIAL
+# ==============================================================================
+def registrar_trabajo(payload, registro, segundos):
+    """Agrega al historial un trabajo completado: sus escenas, sus etapas y su duración real."""
+    escenas = [caracteristicas_escena(s) for s in payload.get("scenes", [])]
+    # El registro no trae las escenas cuyo TTS falló: se emparejan por índice, no por posición
+    publicadas = {e.get("indice"): e for e in registro.get("escenas", [])}
+    for indice, escena in enumerate(escenas):
+        publicada = publicadas.get(indice)
+        if publicada is None:
+            escena["omitida"] = True
+            continue
+        escena["duracion_audio"] = publicada.get("duracion_audio")
+        escena["cache"] = bool(publicada.get("cache"))
+        escena["plantilla"] = publicada.get("plantilla") or escena["plantilla"]
+    linea = {
+        "fecha": time.time(),
+        "perfil": registro.get("perfil", PERFIL_RENDER),
+        "modo_render": registro.get("modo_render"),
+        "degradacion": registro.get("degradacion"),
+        "variantes": len(registro.get("variantes", {})),
+        "escenas": escenas,
+        "etapas": registro.get("tiempos_etapas", {}),
+        "segundos": round(segundos, 2),
+    }
+    with _lock_modelo:
+        try:
+            with open(ARCHIVO_HISTORIAL, 'a', encoding='utf-8') as f:
+                f.write(json.dumps(linea, ensure_ascii=False) + "\n")
+        except Exception as e:
+            logger.warning(f"  [Predictor] No se pudo guardar el historial de trabajos: {e}")
+            return
+        _modelos.pop(linea["perfil"], None)  # El próximo pedido reajusta con esta muestra
+
+def _leer_historial(perfil):
+    try:
+        with open(ARCHIVO_HISTORIAL, 'r', encoding='utf-8') as f:
+            lineas = f.readlines()[-MAX_MUESTRAS:]
+    except FileNotFoundError:
+        return []
+    muestras = []
+    for linea in lineas:
+        try:
+            muestra = json.loads(linea)
+        except ValueError:
+            continue
+        # Los trabajos abaratados por carga no representan lo que tarda uno normal
+        if muestra.get("perfil") == perfil and muestra.get("segundos") and not muestra.get("degradacion"):
+            muestras.append(muestra)
+    return muestras
+
+# ==============================================================================
+# MODELO
+# ==============================================================================
+def _ajustar(muestras):
+    """Coeficientes de la regresión ridge sobre las muestras (None si no alcanzan)."""
+    if len(muestras) < MIN_MUESTRAS_MODELO:
+        return None
+    x = np.array([_vector(m["escenas"], m.get("variantes", 0)) for m in muestras])
+    y = np.array([m["segundos"] for m in muestras])
+    # Ridge como mínimos cuadrados aumentados (sin penalizar el término fijo)
+    penalizacion = np.sqrt(PESO_REGULARIZACION) * np.eye(x.shape[1])[1:]
+    x_aumentada = np.vstack([x, penalizacion])
+    y_aumentada = np.concatenate([y, np.zeros(len(penalizacion))])
+    coeficientes, *_ = np.linalg.lstsq(x_aumentada, y_aumentada, rcond=None)
+    return coeficientes
+
+def _modelo(perfil):
+    with _lock_modelo:
+        if perfil not in _modelos:
+            muestras = _leer_historial(perfil)
+            _modelos[perfil] = (len(muestras), _ajustar(muestras))
+        return _modelos[perfil]
+
+def _estimar_sin_historial(escenas, n_variantes):
+    """Estimación inicial: voz estimada por el largo del texto y velocidad histórica de cada plantilla."""
+    segundos = SEGUNDOS_FIJOS_TRABAJO
+    for escena in escenas:
+        duracion = segundos_voz(escena)
+        velocidad = ffmpeg_core.velocidad_historica(ETIQUETA_RENDER.get(escena["tipo"], "universal"))
+        segundos += SEGUNDOS_TTS_POR_ESCENA + duracion / max(velocidad, 0.01) * (1 + COSTO_POR_VARIANTE * n_variantes)
+    return segundos
+
+def predecir(payload, perfil=None):
+    """Segundos que debería tardar el trabajo del payload (de la cola vacía hasta subido)."""
+    perfil = perfil or PERFIL_RENDER
+    escenas = [caracteristicas_escena(s) for s in payload.get("scenes", [])]
+    n_variantes = len([v for v in payload.get("variantes", []) if v in VARIANTES_SALIDA])
+    _, coeficientes = _modelo(perfil)
+    if coeficientes is None:
+        segundos = _estimar_sin_historial(escenas, n_variantes)
+    else:
+        segundos = float(np.dot(coeficientes, _vector(escenas, n_variantes)))
+    return round(max(PREDICCION_MINIMA, segundos), 1)
@@ -11,7 +11,7 @@ import os
 import textwrap
 import logging
 from config import *
-from ffmpeg_core import execute_ffmpeg_command
+from ffmpeg_core import ejecutar_render
 
 logger = logging.getLogger(__name__)
 
@@ -88,7 +88,7 @@ def build_intro_scene(template_path, audio_path, bgm_path, title_text, output_pa
         "-c:a", "aac", "-b:a", "128k", "-shortest", output_path
     ])
     
-    return execute_ffmpeg_command(cmd)
+    return ejecutar_render(cmd, "escena", timeout=300)["ok"]
 
 # ==============================================================================
 # CONSTRUCTOR DE CUERPO DE NOTICIA (CHROMA KEY)
@@ -172,4 +172,4 @@ def build_body_scene(image_path, template_path, audio_path, bgm_path, sfx_path,
         "-c:a", "aac", "-b:a", "128k", "-shortest", output_path
     ])
     
-    return execute_ffmpeg_command(cmd)
\ No newline at end of file
+    return ejecutar_render(cmd, "escena", timeout=300)["ok"]
\ No newline at end of file
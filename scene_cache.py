@@ -0,0 +1,188 @@
+# -*- coding: utf-8 -*-
+"""
+==============================================================================
+SCENE CACHE (Escenas Renderizadas por Contenido)
+==============================================================================
+Cuando una noticia vuelve con un solo párrafo corregido, las demás escenas son
+idénticas: mismo texto, voz, plantilla, fondo y perfil de render. Este módulo
+guarda cada escena renderizada bajo una clave calculada con TODAS sus entradas,
+así solo se vuelve a renderizar lo que cambió.
+
+Para que la clave alcance, las elecciones "al azar" (plantilla, movimiento de
+cámara, color, video de stock) salen de un random.Random sembrado con la
+semilla de la escena: la misma noticia siempre elige lo mismo.
+
+El caché vive en disco con un tope de tamaño (MAX_MB_CACHE_ESCENAS); al pasarse
+se borran las escenas usadas hace más tiempo.
+
+El grafo único no guarda escenas sueltas: por eso también se anotan las noticias
+ya producidas (registrar_articulo) y una noticia que vuelve se renderiza por
+escena (ver grafo_unico.elegir_modo), así sus escenas quedan en el caché.
+"""
+
+import os
+import glob
+import json
+import time
+import shutil
+import hashlib
+import logging
+import threading
+import asset_catalog
+import shared_store
+from config import *
+
+logger = logging.getLogger(__name__)
+
+ESCENAS_CACHE_DIR = os.path.join(CACHE_DIR, "escenas")
+os.makedirs(ESCENAS_CACHE_DIR, exist_ok=True)
+
+# Subir este número invalida todas las escenas guardadas (cambio en las plantillas)
+VERSION_RECETA = 1
+
+# Campos de la escena que cambian el video (la voz solo importa por su duración)
+CAMPOS_VISUALES = ("type", "text", "layout_category", "image_url", "termino_busqueda", "ubicacion")
+
+# Noticias ya producidas ("article_id|perfil" -> fecha), compartidas entre procesos de trabajo
+ARCHIVO_ARTICULOS = os.path.join(CACHE_DIR, "articulos_vistos.json")
+MAX_ARTICULOS_VISTOS = 2000
+
+_lock_cache = threading.Lock()
+
+# ==============================================================================
+# SEMILLA Y CLAVE DE CADA ESCENA
+# ==============================================================================
+def semilla_escena(semilla_articulo, scene):
+    """
+    Semilla determinista de la escena: la de la noticia más su contenido (no su
+    posición), así insertar un párrafo no cambia las elecciones de las demás.
+    """
+    contenido = json.dumps(scene, sort_keys=True, ensure_ascii=False)
+    return hashlib.sha256(f"{semilla_articulo}|{contenido}".encode("utf-8")).hexdigest()[:16]
+
+def _huella_plantillas():
+    """Huella de todas las plantillas catalogadas: si cambia una, cambian las elecciones."""
+    hashes = []
+    for tipo in asset_catalog.tipos("templates"):
+        for plantilla in asset_catalog.listar("templates", tipo):
+            hashes.append(f"{tipo}/{os.path.basename(plantilla)}:{asset_catalog.hash_asset(plantilla)}")
+    return hashlib.sha1("|".join(sorted(hashes)).encode("utf-8")).hexdigest()[:12]
+
+def clave_escena(scene, semilla, duracion, perfil, variantes=()):
+    """Clave de contenido de la escena renderizada (todas las entradas que la definen)."""
+    datos = {
+        "escena": {campo: scene.get(campo) for campo in CAMPOS_VISUALES},
+        "semilla": semilla,
+        "duracion": duracion,
+        "perfil": perfil,
+        "variantes": {v: VARIANTES_SALIDA[v] for v in sorted(variantes)},
+        "plantillas": _huella_plantillas(),
+        "version": VERSION_RECETA,
+    }
+    firma = json.dumps(datos, sort_keys=True, ensure_ascii=False)
+    return hashlib.sha256(firma.encode("utf-8")).hexdigest()[:24]
+
+def registrar_articulo(article_id, perfil):
+    """
+    Anota la noticia como producida con ese perfil de render y retorna True si ya
+    lo había sido (una vista previa en borrador no cuenta para el render final).
+    """
+    clave = f"{article_id}|{perfil}"
+    with shared_store.modificar(ARCHIVO_ARTICULOS, {}) as vistos:
+        visto = clave in vistos
+        vistos[clave] = time.time()
+        if len(vistos) > MAX_ARTICULOS_VISTOS:
+            for viejo in sorted(vistos, key=vistos.get)[:len(vistos) - MAX_ARTICULOS_VISTOS]:
+                del vistos[viejo]
+    return visto
+
+# ==============================================================================
+# LECTURA Y ESCRITURA
+# ==============================================================================
+def _ruta(clave, sufijo=""):
+    extension = ".jpg" if sufijo == "miniatura" else ".mp4"
+    return os.path.join(ESCENAS_CACHE_DIR, f"{clave}{'_' + sufijo if sufijo else ''}{extension}")
+
+def _copiar(origen, destino, enlazar=False):
+    """
+    Copia un archivo. Con 'enlazar' usa un enlace duro si se puede (gratis): solo
+    para los temporales del trabajo, que se leen y se borran pero nunca se reescriben.
+    """
+    if os.path.exists(destino):
+        os.remove(destino)
+    if enlazar:
+        try:
+            os.link(origen, destino)
+            return
+        except OSError:
+            pass
+    shutil.copyfile(origen, destino)
+
+def _salidas(clave, escena_output, variantes, miniatura):
+    """Pares (archivo_en_cache, archivo_del_trabajo) de una escena."""
+    pares = [(_ruta(clave), escena_output)]
+    pares += [(_ruta(clave, v), ruta) for v, ruta in (variantes or {}).items()]
+    if miniatura:
+        pares.append((_ruta(clave, "miniatura"), miniatura))
+    return pares
+
+def recuperar(clave, escena_output, variantes=None, miniatura=None):
+    """
+    Si la escena (con todas las salidas pedidas) está en caché, la deja en las
+    rutas del trabajo y retorna True.
+    """
+    pares = _salidas(clave, escena_output, variantes, miniatura)
+    with _lock_cache:
+        if not all(os.path.exists(origen) for origen, _ in pares):
+            return False
+        try:
+            for origen, destino in pares:
+                # La miniatura queda en OUTPUT_DIR y otro trabajo puede sobrescribirla: va copiada
+                _copiar(origen, destino, enlazar=destino != miniatura)
+                os.utime(origen)  # Marca de uso reciente para la poda
+        except OSError as e:
+            logger.warning(f"  [Scene Cache] No se pudo recuperar la escena {clave}: {e}")
+            return False
+    logger.info(f"  [Scene Cache] Escena sin cambios: recuperada del caché ({clave}).")
+    return True
+
+def esta_en_cache(clave, variantes=()):
+    """True si la escena (master y variantes pedidas) está en caché, sin tocar nada."""
+    return all(os.path.exists(_ruta(clave, sufijo)) for sufijo in ["", *variantes])
+
+def guardar(clave, escena_output, variantes=None, miniatura=None):
+    """Guarda en caché las salidas de una escena recién renderizada."""
+    with _lock_cache:
+        try:
+            for destino, origen in _salidas(clave, escena_output, variantes, miniatura):
+                if os.path.exists(origen):
+                    _copiar(origen, destino)
+        except OSError as e:
+            logger.warning(f"  [Scene Cache] No se pudo guardar la escena {clave}: {e}")
+            return
+        _podar_cache()
+
+def _podar_cache():
+    """Borra las escenas usadas hace más tiempo hasta quedar bajo MAX_MB_CACHE_ESCENAS."""
+    # La caché la comparten los procesos de trabajo: un archivo listado puede
+    # desaparecer (otro proceso lo podó) antes de mirarlo, y se saltea
+    archivos = []
+    for archivo in glob.glob(os.path.join(ESCENAS_CACHE_DIR, "*")):
+        try:
+            estado = os.stat(archivo)
+        except OSError:
+            continue
+        archivos.append((estado.st_mtime, estado.st_size, archivo))
+    tope = MAX_MB_CACHE_ESCENAS * 1024 * 1024
+    total = sum(tamano for _, tamano, _ in archivos)
+    if total <= tope:
+        return
+    archivos.sort()
+    for _, tamano, viejo in archivos:
+        if total <= tope:
+            break
+        total -= tamano
+        try:
+            os.remove(viejo)
+        except OSError:
+            pass
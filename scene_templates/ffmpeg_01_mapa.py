@@ -10,22 +10,16 @@ la ubicación de la noticia. Utiliza Mapbox para geocodificar y obtener la image
 import os
 import logging
 import requests
-import subprocess
-import textwrap
 import urllib.parse
-import uuid
 from config import *
+from ffmpeg_core import (
+    obtener_duracion_escena, completar_plantilla, perfil_activo, filtro_overlay_congelado
+)
+from motion_engine import construir_movimiento
+from zocalo_renderer import renderizar_zocalo, filtro_zocalo
 
 logger = logging.getLogger(__name__)
 
-def obtener_duracion_audio(audio_path):
-    cmd = ["ffprobe", "-v", "error", "-show_entries", "format=duration", "-of", "default=noprint_wrappers=1:nokey=1", audio_path]
-    try:
-        resultado = subprocess.run(cmd, stdout=subprocess.PIPE, text=True, check=True)
-        return float(resultado.stdout.strip()) + 0.4
-    except Exception:
-        return 25.0
-
 # Necesitas agregar tu API KEY de Mapbox en tu archivo .env y cargarla en config.py,
 # o ponerla directamente aquí si estás en fase de pruebas:
 MAPBOX_API_KEY = os.getenv("MAPBOX_API_KEY", "TU_CLAVE_MAPBOX_AQUI")
@@ -69,30 +63,15 @@ def obtener_imagen_mapa(ubicacion_texto, save_path):
         logger.error(f"  [FFmpeg 01 Mapa] Error en la API de Mapbox: {e}")
         return None
 
-def formatear_texto_mapa(texto, max_chars):
-    """Corta el texto dinámicamente y limpia la basura de Windows"""
-    if not texto:
-        return ""
-    
-    # 1. EXTERMINIO DE LA "n" Y RETORNOS DE CARRO FANTASMAS
-    texto = texto.replace("\\n", " ").replace("\n", " ").replace("\r", "")
-    texto = " ".join(texto.split()) # Quita espacios dobles
-    texto = texto.replace("'", "\u2019").replace(":", "\:") # Protege comillas y dos puntos
-    
-    # 2. CORTAR TEXTO
-    wrapper = textwrap.TextWrapper(width=max_chars)
-    word_list = wrapper.wrap(text=texto)
-    
-    if len(word_list) > 3:
-        return "\n".join(word_list[:3]) + "..."
-    return "\n".join(word_list)
-
-def renderizar_escena_mapa(ubicacion_texto, overlay_mp4_path, audio_tts_path, bgm_path, sfx_path, texto_zocalo, output_path, unique_id):
+def renderizar_escena_mapa(ubicacion_texto, overlay_mp4_path, audio_tts_path, bgm_path, sfx_path, texto_zocalo, output_path, unique_id, duracion_audio=None, ligero=False, sin_audio=False, variantes=None, solo_grafo=False):
     """
     Ensambla la imagen del mapa con un zoom lento, perfora el chroma del overlay,
     agrega los textos, la voz y la música.
+    Con 'ligero' el zoom de dron usa el preset 'crop' del motor de movimiento (reintento tras quedarse sin RAM).
     """
     logger.info("  [FFmpeg 01 Mapa] Iniciando renderizado de la escena...")
+    perfil = perfil_activo()
+    duracion_exacta = obtener_duracion_escena(audio_tts_path, duracion_audio)
     
     # 1. Obtener la foto del mapa
     mapa_img_path = os.path.join(TEMP_IMG_DIR, f"mapa_{unique_id}.jpg")
@@ -104,104 +83,62 @@ def renderizar_escena_mapa(ubicacion_texto, overlay_mp4_path, audio_tts_path, bg
     # Reemplazamos la función de búsqueda para que sea universal
     config = get_layout_config(filename) if 'get_layout_config' in globals() else LAYOUT_CONFIG.get(filename, DEFAULT_LAYOUT)
     
-    clean_text = formatear_texto_mapa(texto_zocalo, config["max_letras_por_linea"])
-    x, y = config["texto_x"], config["texto_y"]
-    color, size = config["color"], config["font_size"]
-    
-    # --- AQUÍ ESTÁ EL CONTORNO MÁS FINO ---
-    shadow = "bordercolor=black:borderw=2" 
-
-    # Escribimos el archivo en MODO BINARIO ("wb") para matar el cuadradito de Windows
-    texto_path = os.path.join(TEMP_VIDEO_DIR, f"txt_map_{uuid.uuid4().hex[:6]}.txt").replace('\\', '/')
-    if clean_text:
-        with open(texto_path, "wb") as f:
-            f.write(clean_text.encode("utf-8"))
+    # Zócalo pre-renderizado en PNG (contorno negro fino de 2px)
+    zocalo = renderizar_zocalo(texto_zocalo, config, ancho=perfil["ancho"], alto=perfil["alto"])
     
     # 3. Construir el filtro complejo de FFmpeg
     # [bg]: Efecto de ZOOM lento al mapa (zoompan) para que parezca un dron
     # [v_scaled]: Overlay verde
     # [v_keyed]: Perforación del verde
 # 3. Construir el filtro complejo de FFmpeg
+    args_mapa, fondo_filtro = construir_movimiento(
+        "crop" if ligero else None, "zoom_in", factor=2, velocidad=0.002, zoom_max=1.5, cuadros_zoom=450,
+        w=perfil["ancho"], h=perfil["alto"], fps=perfil["fps"], duracion=duracion_exacta
+    )
+
+    # Con la degradación 'overlay_simple' el overlay es su primer cuadro, perforado una vez
+    overlay_simple = perfil.get("overlay_simple")
+    if overlay_simple:
+        overlay_filtro = filtro_overlay_congelado(1, "v_keyed", f"-2:{perfil['alto']}", perfil["fps"])
+    else:
+        overlay_filtro = (
+            f"[1:v]scale=-1:{perfil['alto']}[v_scaled];"
+            f"[v_scaled]chromakey={CHROMA_COLOR}:{CHROMA_SIMILARITY}:{CHROMA_BLEND}[v_keyed];"
+        )
     filter_complex = (
-        f"[0:v]scale={RESOLUTION_W*2}:-2,zoompan=z='min(zoom+0.002,1.5)':d=450:x='iw/2-(iw/zoom/2)':y='ih/2-(ih/zoom/2)':s={RESOLUTION_W}x{RESOLUTION_H}:fps=15[bg];"
-        f"[1:v]scale=-1:{RESOLUTION_H}[v_scaled];"
-        f"[v_scaled]chromakey={CHROMA_COLOR}:{CHROMA_SIMILARITY}:{CHROMA_BLEND}[v_keyed];"
+        fondo_filtro + overlay_filtro +
         f"[bg][v_keyed]overlay=(W-w)/2:(H-h)/2:shortest=1[comp];"
     )
     
-    # INYECCIÓN DEL ZÓCALO DE TEXTO (Blindaje Windows)
-    if clean_text:
-        font_safe = str(FONT_PATH).replace('\\', '/').replace(':', '\\:')
-        txt_safe = str(texto_path).replace('\\', '/').replace(':', '\\:')
-        filter_complex += f"[comp]drawtext=fontfile='{font_safe}':textfile='{txt_safe}':fontcolor={color}:fontsize={size}:{shadow}:x={x}:y={y}[vout];"
+    # INYECCIÓN DEL ZÓCALO DE TEXTO (PNG estático, sin drawtext por fotograma)
+    if zocalo:
+        filter_complex += filtro_zocalo(zocalo, "comp", "vout")
     else:
         filter_complex += f"[comp]copy[vout];"
     
-    # 4. Gestión dinámica de audio
-    audio_inputs = "[2:a]"
-    input_count = 1
-    
     cmd = [
         "ffmpeg", "-y",
-        "-loop", "1", "-i", mapa_img_path,         # [0:v] Foto del mapa
-        "-stream_loop", "-1", "-i", overlay_mp4_path, # [1:v] Video verde sin presentador
-        "-i", audio_tts_path                       # [2:a] Voz TTS
+        *args_mapa, "-i", mapa_img_path,           # [0:v] Foto del mapa
+        *([] if overlay_simple else ["-stream_loop", "-1"]),
+        "-i", overlay_mp4_path,                    # [1:v] Video verde sin presentador
     ]
-    
-    if bgm_path and os.path.exists(bgm_path):
-        cmd.extend(["-i", bgm_path])               # [3:a] Música
-        audio_inputs += "[3:a]"
-        input_count += 1
-        
-    if sfx_path and os.path.exists(sfx_path):
-        cmd.extend(["-i", sfx_path])               # [4:a] Sonido (Ej. Teclado procesando datos)
-        audio_inputs += "[4:a]"
-        input_count += 1
-
-    if input_count > 1:
-        filter_complex += f"{audio_inputs}amix=inputs={input_count}:duration=first:dropout_transition=2:weights=1 0.1 0.2[aout]"
-        audio_map = "-map [aout]"
-    else:
-        filter_complex = filter_complex.rstrip(';')
-        audio_map = "-map 2:a"
-        
-    duracion_exacta = obtener_duracion_audio(audio_tts_path)
 
-    cmd.extend([
-        "-filter_threads", "2",
-        "-filter_complex", filter_complex,
-        "-map", "[vout]", 
-        *audio_map.split(),
-        "-c:v", "libx264", "-preset", "superfast", "-threads", "2", "-r", str(FPS),
-        "-c:a", "aac", "-b:a", "128k", "-t", str(duracion_exacta), output_path
-    ])
-    
-    # 5. Ejecutar el subproceso
+    # 4. Audio, salidas y render (en modo grafo la foto del mapa se borra al terminar el trabajo)
     try:
-        proceso = subprocess.Popen(cmd, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
-        proceso.communicate(timeout=200)
-        return proceso.returncode == 0 and os.path.exists(output_path)
-    except subprocess.TimeoutExpired:
-        logger.error("  [FFmpeg 01 Mapa] TIMEOUT: Matando zombi...")
-        proceso.kill()
-        proceso.communicate()
-        return False
+        resultado = completar_plantilla(
+            cmd, filter_complex, "mapa", output_path, duracion_exacta,
+            voz=None if sin_audio else audio_tts_path, bgm_path=bgm_path, sfx_path=sfx_path,
+            variantes=variantes, solo_grafo=solo_grafo, temporales=[mapa_img_path]
+        )
+        if solo_grafo:
+            return resultado
+        return resultado["ok"] and os.path.exists(output_path)
     except Exception as e:
         logger.error(f"  [FFmpeg 01 Mapa] Fallo crítico renderizando: {e}")
-        if 'proceso' in locals():
-            proceso.kill()
-            proceso.communicate()
         return False
     finally:
-        # 1. Borrar el archivo de texto temporal
-        if 'texto_path' in locals() and os.path.exists(texto_path):
-            try:
-                os.remove(texto_path)
-            except:
-                pass
-                
-        # 2. Borrar la imagen JPG del mapa descargada
-        if 'mapa_img_path' in locals() and os.path.exists(mapa_img_path):
+        # Borrar la imagen JPG del mapa descargada
+        if not solo_grafo and os.path.exists(mapa_img_path):
             try:
                 os.remove(mapa_img_path)
             except:
@@ -7,45 +7,34 @@ PLANTILLA: ESCENAS CON VIDEOS DE STOCK (PEXELS)
 
 import os
 import logging
-import subprocess
-import textwrap
-import uuid
 from config import *
+from ffmpeg_core import (
+    obtener_duracion_escena, completar_plantilla, perfil_activo, filtro_overlay_congelado
+)
+from motion_engine import construir_movimiento
+from overlay_cache import obtener_overlay_pingpong
+from zocalo_renderer import renderizar_zocalo, filtro_zocalo
 
 logger = logging.getLogger(__name__)
 
-# ==============================================================================
-# FUNCIONES DE TEXTO PARA PEXELS (Blindado Anti-N)
-# ==============================================================================
-def formatear_texto(texto, max_chars):
-    """Corta el texto dinámicamente para que encaje en los zócalos de Canva."""
-    if not texto:
-        return ""
-        
-    # 1. EXTERMINIO DE LA "n" Y LIMPIEZA EXTREMA
-    texto = texto.replace("\\n", " ").replace("\n", " ") # Adiós saltos ocultos
-    texto = " ".join(texto.split()) # Quita espacios dobles
-    texto = texto.replace("'", "\u2019").replace(":", "\:") # Protege comillas
-    
-    # 2. CORTAR TEXTO
-    wrapper = textwrap.TextWrapper(width=max_chars)
-    word_list = wrapper.wrap(text=texto)
-    
-    if len(word_list) > 3:
-        return "\n".join(word_list[:3]) + "..." # Máximo 3 líneas
-    return "\n".join(word_list)
-
 # ==============================================================================
 # EL ENSAMBLADOR DE PEXELS
 # ==============================================================================
-def renderizar_escena_pexels(termino, overlay_path, audio_tts_path, bgm_path, sfx_path, texto, output_path, unique_id):
+def renderizar_escena_pexels(termino, overlay_path, audio_tts_path, bgm_path, sfx_path, texto, output_path, unique_id, duracion_audio=None, ligero=False, sin_audio=False, variantes=None, rng=None, solo_grafo=False):
+    """
+    Fondo de stock (o imagen por defecto) + overlay en ping-pong con chroma + zócalo.
+    Con 'ligero' se elimina el ping-pong (el filtro 'reverse' guarda todo el overlay
+    en RAM) y el zoom de la imagen: es la variante de reintento tras un corte por memoria.
+    'rng' (random.Random sembrado) fija qué video de stock se elige.
+    """
     import background_fetcher
-    
+
+    perfil = perfil_activo()
     logger.info(f"  [Pexels] Buscando video para: '{termino}'...")
     
     # Intentar descargar el video de Pexels
     fondo_path = os.path.join(TEMP_VIDEO_DIR, f"pexels_bg_{unique_id}.mp4")
-    fondo_path = background_fetcher.obtener_video_stock(termino, fondo_path)
+    fondo_path = background_fetcher.obtener_video_stock(termino, fondo_path, rng)
     
     # Si falla, usamos un fondo por defecto
     if not fondo_path:
@@ -56,23 +45,14 @@ def renderizar_escena_pexels(termino, overlay_path, audio_tts_path, bgm_path, sf
     if not os.path.exists(fondo_path) or not os.path.exists(overlay_path) or not os.path.exists(audio_tts_path):
         logger.error("  [Pexels] Faltan archivos clave para ensamblar la escena.")
         return False
+    duracion_exacta = obtener_duracion_escena(audio_tts_path, duracion_audio)
 
     # Configuración del diseño
     filename = os.path.basename(overlay_path)
     config = get_layout_config(filename)
     
-    clean_text = formatear_texto(texto, config["max_letras_por_linea"])
-    x, y = config["texto_x"], config["texto_y"]
-    color, size = config["color"], config["font_size"]
-    
-    # --- AQUÍ ESTÁ EL CONTORNO (BORDER) NEGRO PARA PEXELS ---
-    shadow = "bordercolor=black:borderw=2" 
-
-    # Escribimos el texto en un archivo temporal a prueba de balas
-    texto_path = os.path.join(TEMP_VIDEO_DIR, f"txt_{uuid.uuid4().hex[:6]}.txt").replace('\\', '/')
-    if clean_text:
-        with open(texto_path, "wb") as f:
-            f.write(clean_text.encode("utf-8"))
+    # Zócalo pre-renderizado en PNG (con el contorno negro de 2px)
+    zocalo = renderizar_zocalo(texto, config, ancho=perfil["ancho"], alto=perfil["alto"])
 
     # 3. DETECTAR TIPO DE FONDO Y APLICAR FILTROS
     es_video_fondo = fondo_path.lower().endswith(('.mp4', '.mov', '.avi'))
@@ -80,79 +60,70 @@ def renderizar_escena_pexels(termino, overlay_path, audio_tts_path, bgm_path, sf
 
     if es_video_fondo:
         cmd.extend(["-stream_loop", "-1", "-i", fondo_path])
-        # Bucle normal limpio para videos de Pexels, forzando a 12 FPS para máxima velocidad
+        # Bucle normal limpio para videos de Pexels, llevado ya a los fps de salida del perfil
+        # (decodificar a menos fps y subirlo con -r duplica cuadros y se ve a saltos)
         fondo_filtro_complex = (
             f"[0:v]format=yuv420p,"
-            f"fps=12,"
-            f"scale={RESOLUTION_W}:{RESOLUTION_H}:force_original_aspect_ratio=increase,"
-            f"crop={RESOLUTION_W}:{RESOLUTION_H}:(iw-ow)/2:(ih-oh)/2[bg];"
+            f"fps={perfil['fps']},"
+            f"scale={perfil['ancho']}:{perfil['alto']}:force_original_aspect_ratio=increase,"
+            f"crop={perfil['ancho']}:{perfil['alto']}:(iw-ow)/2:(ih-oh)/2[bg];"
         )
     else:
-        cmd.extend(["-loop", "1", "-framerate", "12", "-i", fondo_path])
-        # Zoom sutil optimizado: d=450 (quita el límite infinito) y fijado a 12 FPS
-        fondo_filtro_complex = f"[0:v]scale={RESOLUTION_W*2}:-1,zoompan=z='min(zoom+0.0005,1.5)':d=450:x='iw/2-(iw/zoom/2)':y='ih/2-(ih/zoom/2)':s={RESOLUTION_W}x{RESOLUTION_H}:fps=12[bg];"
+        # Zoom sutil optimizado a los fps del perfil (preset 'crop' en modo ligero)
+        args_entrada, fondo_filtro_complex = construir_movimiento(
+            "crop" if ligero else None, "zoom_in", factor=2, velocidad=0.0005, zoom_max=1.5, cuadros_zoom=450,
+            w=perfil["ancho"], h=perfil["alto"], fps=perfil["fps"], duracion=duracion_exacta
+        )
+        cmd.extend([*args_entrada, "-i", fondo_path])
+    # El ping-pong precalculado ya viene a la resolución del perfil y con el verde convertido en alfa
+    # (con la degradación 'overlay_simple' el overlay es un solo cuadro: sin ping-pong)
+    overlay_simple = perfil.get("overlay_simple")
+    pingpong_path = None if ligero or overlay_simple else obtener_overlay_pingpong(overlay_path, perfil["ancho"], perfil["alto"])
+
     # Entradas de FFmpeg
-    cmd.extend(["-stream_loop", "-1", "-i", overlay_path])
-    cmd.extend(["-i", audio_tts_path])
+    cmd.extend([*([] if overlay_simple else ["-stream_loop", "-1"]), "-i", pingpong_path or overlay_path])
 
-    filter_complex = fondo_filtro_complex + (
-        f"[1:v]format=yuv420p,split=2[ov1][ov2];"
-        f"[ov2]reverse[ov2r];"
-        f"[ov1][ov2r]concat=n=2:v=1:a=0[pingpong_ov];"
-        f"[pingpong_ov]scale={RESOLUTION_W}:{RESOLUTION_H}[v_scaled];"
-        f"[v_scaled]chromakey={CHROMA_COLOR}:{CHROMA_SIMILARITY}:{CHROMA_BLEND}[v_keyed];"
+    if overlay_simple:
+        overlay_filtro = filtro_overlay_congelado(1, "v_keyed", f"{perfil['ancho']}:{perfil['alto']}", perfil["fps"])
+    elif pingpong_path:
+        overlay_filtro = "[1:v]format=yuva420p[v_keyed];"
+    elif ligero:
+        overlay_filtro = (
+            f"[1:v]format=yuv420p,scale={perfil['ancho']}:{perfil['alto']}[v_scaled];"
+            f"[v_scaled]chromakey={CHROMA_COLOR}:{CHROMA_SIMILARITY}:{CHROMA_BLEND}[v_keyed];"
+        )
+    else:
+        # Respaldo si no se pudo generar el caché: ping-pong al vuelo (pesado en RAM)
+        overlay_filtro = (
+            f"[1:v]format=yuv420p,split=2[ov1][ov2];"
+            f"[ov2]reverse[ov2r];"
+            f"[ov1][ov2r]concat=n=2:v=1:a=0[pingpong_ov];"
+            f"[pingpong_ov]scale={perfil['ancho']}:{perfil['alto']}[v_scaled];"
+            f"[v_scaled]chromakey={CHROMA_COLOR}:{CHROMA_SIMILARITY}:{CHROMA_BLEND}[v_keyed];"
+        )
+
+    filter_complex = fondo_filtro_complex + overlay_filtro + (
         f"[bg][v_keyed]overlay=(W-w)/2:(H-h)/2:shortest=1[comp];"
     )
 
-    # 5. INYECCIÓN DEL ZÓCALO DE TEXTO (Usando el archivo temporal)
-# 5. INYECCIÓN DEL ZÓCALO DE TEXTO (Blindaje Windows)
-    if clean_text:
-        # Escapamos los dos puntos y barras para que FFmpeg en Windows no explote
-        font_safe = str(FONT_PATH).replace('\\', '/').replace(':', '\\:')
-        txt_safe = str(texto_path).replace('\\', '/').replace(':', '\\:')
-        
-        filter_complex += f"[comp]drawtext=fontfile='{font_safe}':textfile='{txt_safe}':fontcolor={color}:fontsize={size}:{shadow}:x={x}:y={y}[vout];"
+    # 5. INYECCIÓN DEL ZÓCALO DE TEXTO (PNG estático, sin drawtext por fotograma)
+    if zocalo:
+        filter_complex += filtro_zocalo(zocalo, "comp", "vout")
     else:
         filter_complex += f"[comp]copy[vout];"
 
-    # Mezclador de Audio
-    audio_inputs = "[2:a]"
-    input_count = 1
-
-    if bgm_path and os.path.exists(bgm_path):
-        cmd.extend(["-i", bgm_path])
-        audio_inputs += "[3:a]"
-        input_count += 1
-        
-    if sfx_path and os.path.exists(sfx_path):
-        cmd.extend(["-i", sfx_path])
-        audio_inputs += "[4:a]"
-        input_count += 1
-
-    if input_count > 1:
-        filter_complex += f"{audio_inputs}amix=inputs={input_count}:duration=first:dropout_transition=2:weights=1 0.1 0.2[aout]"
-        audio_map = "-map [aout]"
-    else:
-        filter_complex = filter_complex.rstrip(';')
-        audio_map = "-map 2:a"
-
-    cmd.extend([
-        "-filter_complex", filter_complex,
-        "-map", "[vout]", 
-        *audio_map.split(),
-        "-c:v", "libx264", 
-        "-preset", VIDEO_PRESET, 
-        "-r", str(FPS),
-        "-c:a", "aac", 
-        "-b:a", "128k", 
-        "-shortest", 
-        output_path
-    ])
-
+    # Audio, salidas y render (en modo grafo el video de stock sigue en uso hasta el render único)
+    es_descarga = "default_news_bg" not in fondo_path
     try:
-        subprocess.run(cmd, check=True, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL, timeout=600)
-        
-        if os.path.exists(output_path) and os.path.getsize(output_path) > 1024:
+        resultado = completar_plantilla(
+            cmd, filter_complex, "pexels", output_path, duracion_exacta,
+            voz=None if sin_audio else audio_tts_path, bgm_path=bgm_path, sfx_path=sfx_path,
+            variantes=variantes, solo_grafo=solo_grafo, temporales=[fondo_path] if es_descarga else []
+        )
+        if solo_grafo:
+            return resultado
+
+        if resultado["ok"] and os.path.exists(output_path) and os.path.getsize(output_path) > 1024:
             return True
         return False
             
@@ -160,17 +131,10 @@ def renderizar_escena_pexels(termino, overlay_path, audio_tts_path, bgm_path, sf
         logger.error(f"  [FFmpeg Pexels] Error: {e}")
         return False 
     finally:
-        # 1. Borrar el archivo de texto temporal para mantener limpio el disco
-        if 'texto_path' in locals() and os.path.exists(texto_path):
-            try:
-                os.remove(texto_path)
-            except:
-                pass
-        
-        # 2. Borrar el video descargado de Pexels para que AWS no colapse
-        if 'fondo_path' in locals() and os.path.exists(fondo_path):
+        # Borrar el video descargado de Pexels para que AWS no colapse
+        if not solo_grafo and os.path.exists(fondo_path):
             # ¡IMPORTANTE! Validamos que NO sea la imagen por defecto de tus assets
-            if "default_news_bg" not in fondo_path:
+            if es_descarga:
                 try:
                     os.remove(fondo_path)
                 except Exception as e:
@@ -10,30 +10,22 @@ ni videos de fondo superpuestos. Es video directo + texto gigante + audio mezcla
 
 import os
 import logging
-import subprocess
-import textwrap
 from config import *
+from ffmpeg_core import obtener_duracion_escena, completar_plantilla, perfil_activo
+from zocalo_renderer import renderizar_zocalo, filtro_zocalo
 
 logger = logging.getLogger(__name__)
 
-def formatear_texto_intro(texto, max_chars):
-    """Corta el titular para que encaje perfecto y se vea gigante y agresivo."""
-    if not texto:
-        return ""
-    # Escapar comillas simples
-    texto = texto.replace("'", "\u2019").replace(":", "\\:")
-    wrapper = textwrap.TextWrapper(width=max_chars)
-    word_list = wrapper.wrap(text=texto)
-    # Las intros suelen tener 1 o 2 líneas máximo para mayor impacto
-    if len(word_list) > 2:
-        return "\\n".join(word_list[:2]) + "..."
-    return "\\n".join(word_list)
+# La música y los efectos de la intro suenan más fuerte que en el resto del video
+REFUERZO_MUSICA_INTRO = 1.5
 
-def ensamblar_intro(intro_path, audio_tts_path, bgm_path, sfx_path, texto, output_path):
+def ensamblar_intro(intro_path, audio_tts_path, bgm_path, sfx_path, texto, output_path, duracion_audio=None, sin_audio=False, variantes=None, solo_grafo=False):
     """
     Toma el video de intro base y le incrusta el título, la voz y la música.
+    La música y los efectos suenan REFUERZO_MUSICA_INTRO veces más fuerte que en el resto.
     """
     logger.info(f"  [FFmpeg Intro] Ensamblando escena de Introducción...")
+    perfil = perfil_activo()
     logger.info(f"  --> Intro Base: {os.path.basename(intro_path)}")
 
     # 1. VALIDACIONES
@@ -45,73 +37,41 @@ def ensamblar_intro(intro_path, audio_tts_path, bgm_path, sfx_path, texto, outpu
     filename = os.path.basename(intro_path)
     config = get_layout_config(filename)
     
-    clean_text = formatear_texto_intro(texto, config["max_letras_por_linea"])
-    
-    # Variables visuales
-    x, y = config["texto_x"], config["texto_y"]
-    color, size = config["color"], config["font_size"]
-    shadow = "shadowcolor=black@0.8:shadowx=0:shadowy=0" # Sombra más fuerte para intros
+    # Las intros suelen tener 1 o 2 líneas máximo para mayor impacto (sin contorno)
+    zocalo = renderizar_zocalo(texto, config, max_lineas=2, borde=0, ancho=perfil["ancho"], alto=perfil["alto"])
 
     # 3. CONSTRUIR COMANDO BASE
     cmd = [
         "ffmpeg", "-y",
         "-stream_loop", "-1", "-i", intro_path, # [0:v] Video de Intro en loop por si la voz dura más
-        "-i", audio_tts_path                    # [1:a] Voz TTS principal
     ]
 
     # 4. TUBERÍA VISUAL (Solo escala y texto, nada de verde)
     filter_complex = (
-        f"[0:v]scale={RESOLUTION_W}:{RESOLUTION_H}:force_original_aspect_ratio=increase,"
-        f"crop={RESOLUTION_W}:{RESOLUTION_H}:(iw-ow)/2:(ih-oh)/2[bg];"
+        f"[0:v]scale={perfil['ancho']}:{perfil['alto']}:force_original_aspect_ratio=increase,"
+        f"crop={perfil['ancho']}:{perfil['alto']}:(iw-ow)/2:(ih-oh)/2[bg];"
     )
 
-    if clean_text:
-        filter_complex += f"[bg]drawtext=fontfile='{FONT_PATH}':text='{clean_text}':fontcolor={color}:fontsize={size}:{shadow}:x={x}:y={y}[vout];"
+    if zocalo:
+        filter_complex += filtro_zocalo(zocalo, "bg", "vout")
     else:
         filter_complex += f"[bg]copy[vout];"
 
-    # 5. MEZCLADOR DE AUDIO
-    audio_inputs = "[1:a]"
-    input_count = 1
-
-    if bgm_path and os.path.exists(bgm_path):
-        cmd.extend(["-i", bgm_path])  # Entrada 2
-        audio_inputs += "[2:a]"
-        input_count += 1
-        
-    if sfx_path and os.path.exists(sfx_path):
-        cmd.extend(["-i", sfx_path])  # Entrada 3
-        audio_inputs += "[3:a]"
-        input_count += 1
-
-    # Mezclamos los audios
-    if input_count > 1:
-        # La música en la intro puede estar un poquitito más fuerte (0.15) para dar impacto
-        filter_complex += f"{audio_inputs}amix=inputs={input_count}:duration=first:dropout_transition=2:weights=1 0.15 0.3[aout]"
-        audio_map = "-map [aout]"
-    else:
-        filter_complex = filter_complex.rstrip(';')
-        audio_map = "-map 1:a"
-
-    # 6. EMPAQUETADO FINAL
-    cmd.extend([
-        "-filter_complex", filter_complex,
-        "-map", "[vout]", 
-        *audio_map.split(),
-        "-c:v", "libx264", 
-        "-preset", VIDEO_PRESET, 
-        "-r", str(FPS),
-        "-c:a", "aac", 
-        "-b:a", "128k", 
-        "-shortest", # Corta la intro cuando la IA termina de leer el titular
-        output_path
-    ])
+    # 5. EMPAQUETADO FINAL
+    # Corta la intro cuando la IA termina de leer el titular (más el padding de cortesía)
+    duracion_exacta = obtener_duracion_escena(audio_tts_path, duracion_audio)
 
-    # 7. EJECUCIÓN
+    # 6. AUDIO, SALIDAS Y EJECUCIÓN
     try:
-        subprocess.run(cmd, check=True, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL, timeout=200)
-        
-        if os.path.exists(output_path) and os.path.getsize(output_path) > 1024:
+        resultado = completar_plantilla(
+            cmd, filter_complex, "intro", output_path, duracion_exacta,
+            voz=None if sin_audio else audio_tts_path, bgm_path=bgm_path, sfx_path=sfx_path,
+            refuerzo_musica=REFUERZO_MUSICA_INTRO, variantes=variantes, solo_grafo=solo_grafo
+        )
+        if solo_grafo:
+            return resultado
+
+        if resultado["ok"] and os.path.exists(output_path) and os.path.getsize(output_path) > 1024:
             logger.info("  [FFmpeg Intro] Intro renderizada con éxito.")
             return True
         else:
@@ -0,0 +1,84 @@
+# -*- coding: utf-8 -*-
+"""
+==============================================================================
+SHARED STORE (Estado Compartido entre Procesos)
+==============================================================================
+Desde que los renders corren en procesos de trabajo (worker_pool.py), una
+variable de módulo ya no se comparte entre trabajos: cada proceso tiene la suya
+y muere con él. Lo que sí tiene que sobrevivir y verse desde todos los procesos
+(historial de Pexels, velocidades de FFmpeg, renders activos del gobernador)
+vive en un archivo JSON con estas dos operaciones:
+
+- leer():      el contenido actual (releído solo si el archivo cambió).
+- modificar(): bloque 'with' con el archivo bloqueado (flock) para los demás
+               procesos; al salir se escribe completo con os.replace, así nadie
+               lee un archivo a medio escribir ni pisa el cambio de otro.
+"""
+
+import os
+import copy
+import json
+import logging
+import threading
+from contextlib import contextmanager
+
+try:
+    import fcntl
+except ImportError:  # Sin flock (Windows): solo queda el candado entre hilos
+    fcntl = None
+
+logger = logging.getLogger(__name__)
+
+_lock_local = threading.Lock()
+_lock_escritura = threading.Lock()
+_cache = {}  # ruta -> ((mtime_ns, tamaño), datos)
+
+def _firma(ruta):
+    try:
+        estado = os.stat(ruta)
+    except OSError:
+        return None
+    return estado.st_mtime_ns, estado.st_size
+
+def _cargar(ruta, defecto):
+    try:
+        with open(ruta, 'r', encoding='utf-8') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return copy.deepcopy(defecto)
+
+def leer(ruta, defecto=None):
+    """Contenido del archivo (o 'defecto' si no existe). No modificar lo que retorna."""
+    firma = _firma(ruta)
+    with _lock_local:
+        guardado = _cache.get(ruta)
+        if firma is not None and guardado and guardado[0] == firma:
+            return guardado[1]
+    datos = _cargar(ruta, defecto)
+    if firma is not None:
+        with _lock_local:
+            _cache[ruta] = (firma, datos)
+    return datos
+
+@contextmanager
+def modificar(ruta, defecto=None):
+    """
+    Entrega el contenido del archivo para cambiarlo en el lugar dentro del 'with';
+    al salir sin error se guarda. Los demás procesos esperan mientras tanto.
+    """
+    with _lock_escritura, open(ruta + ".lock", 'a') as candado:
+        if fcntl:
+            fcntl.flock(candado, fcntl.LOCK_EX)
+        try:
+            datos = _cargar(ruta, defecto)
+            yield datos
+            temporal = f"{ruta}.{os.getpid()}.tmp"
+            try:
+                with open(temporal, 'w', encoding='utf-8') as f:
+                    json.dump(datos, f, ensure_ascii=False, indent=2)
+                os.replace(temporal, ruta)
+            except OSError as e:
+                logger.warning(f"  [Shared Store] No se pudo guardar {os.path.basename(ruta)}: {e}")
+        finally:
+            if fcntl:
+                fcntl.flock(candado, fcntl.LOCK_UN)
@@ -0,0 +1,183 @@
+# -*- coding: utf-8 -*-
+"""
+==============================================================================
+SOUNDTRACK BUILDER (Banda Sonora Única del Video)
+==============================================================================
+Antes cada escena mezclaba voz + música + efecto con 'amix', codificaba su
+propio AAC y la música volvía a empezar en cada corte.
+Ahora las escenas se renderizan SIN audio y este módulo arma una sola línea
+de tiempo para todo el video:
+
+- Todos los clips de voz (TTS), cada uno en el instante donde empieza su escena.
+- Una cama de música continua: escenas seguidas con la misma pista comparten
+  una sola reproducción, con fundidos en los cambios. La voz la "agacha"
+  (ducking con sidechaincompress) para que siempre se entienda.
+- Los efectos (SFX) al inicio de su escena, recortados a la duración de la misma.
+
+Se codifica UNA sola vez y el orquestador la une al video en la concatenación.
+"""
+
+import os
+import logging
+from config import *
+from ffmpeg_core import ejecutar_render, argumentos_audio
+
+logger = logging.getLogger(__name__)
+
+# Fundido de entrada/salida de cada tramo de música (segundos)
+FUNDIDO_MUSICA = 1.0
+
+# Ducking: cuánto y qué tan rápido la voz agacha la música
+DUCKING_UMBRAL = 0.02
+DUCKING_RATIO = 4
+DUCKING_ATAQUE_MS = 50
+DUCKING_LIBERACION_MS = 600
+
+# Techo de la mezcla final (las pistas se suman sin normalizar)
+LIMITE_MEZCLA = 0.95
+
+# Todo entra al grafo convertido al formato del pipeline
+FORMATO_AUDIO = f"aresample={AUDIO_SAMPLE_RATE},aformat=sample_fmts=fltp:channel_layouts=stereo"
+
+def _ms(segundos):
+    return int(round(segundos * 1000))
+
+def _tramos_de_musica(escenas):
+    """Agrupa escenas consecutivas que usan la misma pista de música."""
+    tramos = []
+    for escena in escenas:
+        bgm = escena.get("bgm")
+        if bgm and tramos and tramos[-1]["bgm"] == bgm:
+            tramos[-1]["escenas"].append(escena)
+        elif bgm:
+            tramos.append({"bgm": bgm, "escenas": [escena]})
+    return tramos
+
+def _expresion_volumen(tramo, peso):
+    """
+    Volumen de la música en un tramo. Las escenas con 'refuerzo' (ej. la intro)
+    suben la música solo mientras duran (tiempos relativos al inicio del tramo).
+    """
+    inicio_tramo = tramo["escenas"][0]["inicio"]
+    expresion = str(peso)
+    for escena in tramo["escenas"]:
+        refuerzo = escena.get("refuerzo", 1.0)
+        if refuerzo != 1.0:
+            desde = escena["inicio"] - inicio_tramo
+            hasta = desde + escena["duracion"]
+            expresion = f"if(between(t,{desde:.3f},{hasta:.3f}),{peso * refuerzo:.3f},{expresion})"
+    if expresion == str(peso):
+        return f"volume={peso}"
+    return f"volume='{expresion}':eval=frame"
+
+def construir_banda_sonora(escenas, output_path):
+    """
+    Arma y codifica la banda sonora completa.
+
+    'escenas' es la línea de tiempo, una entrada por escena renderizada:
+    {"inicio", "duracion", "voz", "bgm" (o None), "sfx" (o None), "refuerzo" (opcional)}.
+    Retorna True si el archivo de audio quedó listo.
+    """
+    if not escenas:
+        return False
+
+    duracion_total = escenas[-1]["inicio"] + escenas[-1]["duracion"]
+    cmd = ["ffmpeg", "-y"]
+    filtros = []
+    entradas = 0
+
+    def agregar_entrada(path, en_bucle=False):
+        nonlocal entradas
+        if en_bucle:
+            cmd.extend(["-stream_loop", "-1"])
+        cmd.extend(["-i", path])
+        entradas += 1
+        return entradas - 1
+
+    # 1. VOCES: cada clip en el instante donde arranca su escena
+    voces = []
+    for n, escena in enumerate(escenas):
+        if not escena.get("voz"):
+            continue
+        idx = agregar_entrada(escena["voz"])
+        filtros.append(f"[{idx}:a]{FORMATO_AUDIO},adelay={_ms(escena['inicio'])}:all=1[voz{n}]")
+        voces.append(f"[voz{n}]")
+
+    if not voces:
+        logger.error("  [Banda Sonora] No hay clips de voz para armar la banda sonora.")
+        return False
+
+    if len(voces) > 1:
+        filtros.append(f"{''.join(voces)}amix=inputs={len(voces)}:normalize=0:duration=longest[voz_total]")
+    else:
+        filtros.append(f"{voces[0]}anull[voz_total]")
+
+    # 2. CAMA DE MÚSICA CONTINUA
+    tramos = _tramos_de_musica(escenas)
+    mezcla = []
+    if tramos:
+        filtros.append("[voz_total]asplit=2[voz][voz_sc]")
+        mezcla.append("[voz]")
+
+        camas = []
+        for n, tramo in enumerate(tramos):
+            # Del inicio de la primera escena al final de la última: en el grafo único
+            # las escenas se solapan en las transiciones y la suma sería más larga
+            inicio = tramo["escenas"][0]["inicio"]
+            duracion = tramo["escenas"][-1]["inicio"] + tramo["escenas"][-1]["duracion"] - inicio
+            fundido = min(FUNDIDO_MUSICA, duracion / 4)
+            idx = agregar_entrada(tramo["bgm"], en_bucle=True)
+            filtros.append(
+                f"[{idx}:a]{FORMATO_AUDIO},atrim=0:{duracion:.3f},asetpts=PTS-STARTPTS,"
+                f"afade=t=in:d={fundido:.3f},afade=t=out:st={duracion - fundido:.3f}:d={fundido:.3f},"
+                f"{_expresion_volumen(tramo, PESO_MUSICA)},adelay={_ms(inicio)}:all=1[cama{n}]"
+            )
+            camas.append(f"[cama{n}]")
+
+        if len(camas) > 1:
+            filtros.append(f"{''.join(camas)}amix=inputs={len(camas)}:normalize=0:duration=longest[cama]")
+        else:
+            filtros.append(f"{camas[0]}anull[cama]")
+
+        # Ducking: la voz (con silencio al final para no cortar la cola de la música) comprime la cama
+        filtros.append("[voz_sc]apad[voz_sc_pad]")
+        filtros.append(
+            f"[cama][voz_sc_pad]sidechaincompress=threshold={DUCKING_UMBRAL}:ratio={DUCKING_RATIO}:"
+            f"attack={DUCKING_ATAQUE_MS}:release={DUCKING_LIBERACION_MS}[cama_duck]"
+        )
+        mezcla.append("[cama_duck]")
+    else:
+        mezcla.append("[voz_total]")
+
+    # 3. EFECTOS: al inicio de su escena, sin pasarse de ella
+    for n, escena in enumerate(escenas):
+        if not escena.get("sfx"):
+            continue
+        idx = agregar_entrada(escena["sfx"])
+        peso = PESO_EFECTOS * escena.get("refuerzo", 1.0)
+        filtros.append(
+            f"[{idx}:a]{FORMATO_AUDIO},atrim=0:{escena['duracion']:.3f},asetpts=PTS-STARTPTS,"
+            f"volume={peso:.3f},adelay={_ms(escena['inicio'])}:all=1[sfx{n}]"
+        )
+        mezcla.append(f"[sfx{n}]")
+
+    # 4. MEZCLA FINAL (suma directa + limitador, rellenada hasta el final del video)
+    filtros.append(
+        f"{''.join(mezcla)}amix=inputs={len(mezcla)}:normalize=0:duration=longest,"
+        f"alimiter=limit={LIMITE_MEZCLA}:level=0:latency=1,apad[aout]"
+    )
+
+    cmd.extend([
+        "-filter_complex", ";".join(filtros),
+        "-map", "[aout]",
+        *argumentos_audio(),
+        "-t", f"{duracion_total:.3f}",
+        output_path
+    ])
+
+    logger.info(
+        f"  [Banda Sonora] {len(voces)} voces, {len(tramos)} tramos de música y "
+        f"{len(mezcla) - (2 if tramos else 1)} efectos en {duracion_total:.1f}s de audio..."
+    )
+    resultado = ejecutar_render(cmd, "banda_sonora", duracion_total)
+    return resultado["ok"] and os.path.exists(output_path) and os.path.getsize(output_path) > 1024
@@ -0,0 +1,103 @@
+# -*- coding: utf-8 -*-
+"""
+==============================================================================
+TEST DEL MEZCLADOR NUMPY (Niveles contra 'amix')
+==============================================================================
+Comprueba que audio_mixer respeta los mismos niveles relativos que la mezcla
+con 'amix' de las plantillas (weights=1 PESO_MUSICA PESO_EFECTOS).
+
+'amix' escala cada entrada por peso/suma_de_pesos; el mezclador NumPy suma
+directo con el peso de cada pista. Lo que debe coincidir es la relación
+música/voz y efectos/voz, así que se mide cada pista por separado con las
+demás en silencio (sin ducking ni limitador, que 'amix' no tiene).
+
+Uso:  python test_mezclador.py
+"""
+
+import os
+import sys
+import subprocess
+import numpy as np
+from config import *
+import audio_mixer
+
+DURACION = 6.0
+TOLERANCIA_DB = 0.5
+PISTAS = {
+    # Voz como la entrega edge-tts: mono a 24 kHz
+    "voz": ("sine=frequency=220:sample_rate=24000", ["-ac", "1", "-ar", "24000"]),
+    "bgm": ("anoisesrc=color=pink:amplitude=0.3:sample_rate=48000", ["-ac", "2"]),
+    "sfx": ("sine=frequency=1000:sample_rate=44100", ["-ac", "2"]),
+}
+SILENCIO = f"anullsrc=r={AUDIO_SAMPLE_RATE}:cl=stereo"
+
+def generar_pista(nombre):
+    fuente, formato = PISTAS[nombre]
+    ruta = os.path.join(TEMP_AUDIO_DIR, f"test_mezclador_{nombre}.wav")
+    cmd = ["ffmpeg", "-y", "-v", "error", "-f", "lavfi", "-i", fuente, "-t", str(DURACION), *formato, ruta]
+    subprocess.run(cmd, check=True)
+    return ruta
+
+def rms_db(pcm):
+    """RMS de la parte central (sin los fundidos de la música) en dBFS."""
+    centro = pcm[int(1.5 * AUDIO_SAMPLE_RATE):int(4.5 * AUDIO_SAMPLE_RATE)]
+    return 20 * np.log10(np.sqrt(np.mean(centro.astype(np.float64) ** 2)) + 1e-12)
+
+def nivel_amix(pistas, activa):
+    """Mezcla las 3 entradas como las plantillas, con solo 'activa' sonando."""
+    cmd = ["ffmpeg", "-y", "-v", "error"]
+    for nombre in ("voz", "bgm", "sfx"):
+        if nombre == activa:
+            cmd.extend(["-i", pistas[nombre]])
+        else:
+            cmd.extend(["-f", "lavfi", "-t", str(DURACION), "-i", SILENCIO])
+    salida = os.path.join(TEMP_AUDIO_DIR, "test_mezclador_amix.wav")
+    cmd.extend([
+        "-filter_complex",
+        f"[0:a][1:a][2:a]amix=inputs=3:duration=first:dropout_transition=2:weights=1 {PESO_MUSICA} {PESO_EFECTOS}[aout]",
+        "-map", "[aout]", "-ar", str(AUDIO_SAMPLE_RATE), "-ac", str(AUDIO_CHANNELS), salida
+    ])
+    subprocess.run(cmd, check=True)
+    try:
+        return rms_db(audio_mixer.decodificar_pcm(salida))
+    finally:
+        os.remove(salida)
+
+def nivel_numpy(pistas, activa):
+    escena = {"inicio": 0.0, "duracion": DURACION, "voz": None, "bgm": None, "sfx": None}
+    escena[activa] = pistas[activa]
+    return rms_db(audio_mixer.mezclar([escena], ducking=False, limitador=False))
+
+def ejecutar_test():
+    print("\n" + "=" * 70)
+    print(f"🎚️  TEST MEZCLADOR NUMPY vs AMIX (weights=1 {PESO_MUSICA} {PESO_EFECTOS})")
+    print("=" * 70 + "\n")
+
+    pistas = {nombre: generar_pista(nombre) for nombre in PISTAS}
+    try:
+        amix = {nombre: nivel_amix(pistas, nombre) for nombre in pistas}
+        numpy_ = {nombre: nivel_numpy(pistas, nombre) for nombre in pistas}
+    finally:
+        for ruta in pistas.values():
+            os.remove(ruta)
+
+    print(f"{'PISTA':<6} {'AMIX (rel. voz)':>16} {'NUMPY (rel. voz)':>17} {'DIFERENCIA':>11}")
+    print("-" * 54)
+    fallos = 0
+    for nombre in ("bgm", "sfx"):
+        rel_amix = amix[nombre] - amix["voz"]
+        rel_numpy = numpy_[nombre] - numpy_["voz"]
+        diferencia = rel_numpy - rel_amix
+        ok = abs(diferencia) <= TOLERANCIA_DB
+        fallos += 0 if ok else 1
+        print(f"{nombre:<6} {rel_amix:>13.2f} dB {rel_numpy:>14.2f} dB {diferencia:>8.2f} dB  {'✅' if ok else '❌'}")
+
+    print()
+    if fallos:
+        print(f"❌ {fallos} pista(s) fuera de la tolerancia de ±{TOLERANCIA_DB} dB.")
+        sys.exit(1)
+    print(f"✅ Los niveles relativos coinciden con amix (±{TOLERANCIA_DB} dB).")
+
+if __name__ == "__main__":
+    init_directories()
+    ejecutar_test()
@@ -5,18 +5,29 @@ TTS ENGINE (Motor de Texto a Voz)
 ==============================================================================
 Este módulo se encarga de convertir el texto del guion en archivos de audio MP3
 usando Microsoft Edge TTS. Soporta múltiples voces y limpia el texto para
-evitar bloqueos del sintetizador.
+evitar bloqueos del sintetizador. Las locuciones se guardan en caché por texto
+y voz: una noticia corregida solo vuelve a sintetizar los párrafos que cambiaron.
 """
 
 import os
 import re
+import glob
+import json
+import shutil
+import hashlib
 import asyncio
 import logging
 import edge_tts
-from config import TEMP_AUDIO_DIR, VOICES
+from config import TEMP_AUDIO_DIR, CACHE_DIR, VOICES
 
 logger = logging.getLogger(__name__)
 
+VOCES_CACHE_DIR = os.path.join(CACHE_DIR, "voces")
+os.makedirs(VOCES_CACHE_DIR, exist_ok=True)
+
+# Máximo de locuciones en caché; al pasarnos borramos las menos usadas
+MAX_VOCES_EN_CACHE = 3000
+
 # ==============================================================================
 # FUNCIONES DE LIMPIEZA DE TEXTO
 # ==============================================================================
@@ -42,24 +53,137 @@ def sanitize_text_for_tts(text):
 # ==============================================================================
 # GENERADOR ASÍNCRONO DE AUDIO
 # ==============================================================================
+# Edge TTS entrega MP3 CBR "audio-24khz-48kbitrate-mono-mp3": cada byte son
+# 8 bits a 48 kbps, así que la duración sale del tamaño sin llamar a ffprobe.
+EDGE_TTS_BYTES_POR_SEGUNDO = 48000 / 8
+
+# Los eventos WordBoundary vienen en unidades de 100 nanosegundos
+EDGE_TTS_TICKS_POR_SEGUNDO = 10_000_000
+
+def _crear_communicate(text, voice_code):
+    """
+    Las versiones nuevas de edge-tts solo emiten SentenceBoundary por defecto;
+    pedimos WordBoundary explícitamente y caemos al constructor viejo si no existe.
+    """
+    try:
+        return edge_tts.Communicate(text, voice_code, boundary="WordBoundary")
+    except TypeError:
+        return edge_tts.Communicate(text, voice_code)
+
 async def _async_generate_audio(text, voice_code, output_path):
     """
     Función interna asíncrona que se comunica con Edge TTS.
+    Escribe el MP3 mientras captura los tiempos de cada palabra.
+    Retorna un diccionario {duracion, palabras} o None si falla.
     """
     try:
-        communicate = edge_tts.Communicate(text, voice_code)
-        await communicate.save(output_path)
-        return True
+        communicate = _crear_communicate(text, voice_code)
+        palabras = []
+        bytes_audio = 0
+
+        with open(output_path, "wb") as f:
+            async for chunk in communicate.stream():
+                if chunk["type"] == "audio":
+                    f.write(chunk["data"])
+                    bytes_audio += len(chunk["data"])
+                elif chunk["type"] == "WordBoundary":
+                    inicio = chunk["offset"] / EDGE_TTS_TICKS_POR_SEGUNDO
+                    fin = (chunk["offset"] + chunk["duration"]) / EDGE_TTS_TICKS_POR_SEGUNDO
+                    palabras.append({"texto": chunk["text"], "inicio": round(inicio, 3), "fin": round(fin, 3)})
+
+        duracion = bytes_audio / EDGE_TTS_BYTES_POR_SEGUNDO
+        if palabras:
+            # Por si el formato cambia algún día: la voz nunca termina antes que su última palabra
+            duracion = max(duracion, palabras[-1]["fin"])
+
+        return {"duracion": round(duracion, 3), "palabras": palabras}
     except Exception as e:
         logger.error(f"  [TTS Engine] Fallo interno en Edge TTS: {e}")
-        return False
+        return None
+
+# ==============================================================================
+# TIEMPOS DE PALABRAS (ARCHIVO COMPAÑERO .json)
+# ==============================================================================
+def ruta_tiempos(audio_path):
+    """Ruta del JSON con duración y tiempos por palabra que acompaña a cada MP3."""
+    return audio_path.rsplit('.', 1)[0] + '.json'
+
+def guardar_tiempos(audio_path, tiempos):
+    """Persiste los tiempos junto al MP3 para que cualquier copia del audio los conserve."""
+    try:
+        with open(ruta_tiempos(audio_path), 'w', encoding='utf-8') as f:
+            json.dump(tiempos, f, ensure_ascii=False)
+    except Exception as e:
+        logger.warning(f"  [TTS Engine] No se pudieron guardar los tiempos de {audio_path}: {e}")
+
+def cargar_tiempos(audio_path):
+    """
+    Lee los tiempos guardados junto a un MP3.
+    Retorna {duracion, palabras} o None si el audio no tiene archivo compañero.
+    """
+    archivo = ruta_tiempos(audio_path)
+    if not os.path.exists(archivo):
+        return None
+    try:
+        with open(archivo, 'r', encoding='utf-8') as f:
+            return json.load(f)
+    except Exception as e:
+        logger.warning(f"  [TTS Engine] Tiempos ilegibles en {archivo}: {e}")
+        return None
+
+# ==============================================================================
+# CACHÉ DE LOCUCIONES (MP3 + tiempos, por texto y voz)
+# ==============================================================================
+def _ruta_cache_voz(clean_text, voice_code):
+    clave = hashlib.sha1(f"{voice_code}|{clean_text}".encode("utf-8")).hexdigest()[:20]
+    return os.path.join(VOCES_CACHE_DIR, f"{clave}.mp3")
+
+def _recuperar_voz(clean_text, voice_code, output_path):
+    """Copia la locución guardada (y sus tiempos) a 'output_path'. Retorna los tiempos o None."""
+    cacheado = _ruta_cache_voz(clean_text, voice_code)
+    tiempos = cargar_tiempos(cacheado) if os.path.exists(cacheado) else None
+    if not tiempos:
+        return None
+    try:
+        shutil.copyfile(cacheado, output_path)
+        guardar_tiempos(output_path, tiempos)
+        os.utime(cacheado)  # Marca de uso reciente para la poda
+        return tiempos
+    except OSError:
+        return None
+
+def _ultimo_uso(ruta):
+    """mtime del archivo, o 0 si otro proceso de trabajo ya lo borró (la caché es compartida)."""
+    try:
+        return os.path.getmtime(ruta)
+    except OSError:
+        return 0.0
+
+def _guardar_voz(clean_text, voice_code, output_path, tiempos):
+    cacheado = _ruta_cache_voz(clean_text, voice_code)
+    try:
+        shutil.copyfile(output_path, cacheado)
+        guardar_tiempos(cacheado, tiempos)
+    except OSError as e:
+        logger.warning(f"  [TTS Engine] No se pudo guardar la locución en caché: {e}")
+        return
+
+    archivos = glob.glob(os.path.join(VOCES_CACHE_DIR, "*.mp3"))
+    if len(archivos) > MAX_VOCES_EN_CACHE:
+        archivos.sort(key=_ultimo_uso)
+        for viejo in archivos[:len(archivos) - MAX_VOCES_EN_CACHE]:
+            for archivo in (viejo, ruta_tiempos(viejo)):
+                try:
+                    os.remove(archivo)
+                except OSError:
+                    pass
 
 # ==============================================================================
 # CONTROLADOR PRINCIPAL DEL MOTOR TTS
 # ==============================================================================
-def generate_audio_clip(text, voice_key, filename):
+def generate_audio_with_timings(text, voice_key, filename):
     """
-    Genera un archivo MP3 a partir de texto.
+    Genera un archivo MP3 a partir de texto y captura los tiempos de cada palabra.
     
     Parámetros:
     - text: El texto a leer.
@@ -67,7 +191,9 @@ def generate_audio_clip(text, voice_key, filename):
     - filename: Nombre del archivo de salida (ej: 'escena_1.mp3').
     
     Retorna:
-    - La ruta absoluta del archivo generado o None si falla.
+    - Un diccionario {path, duracion, palabras} o None si falla.
+      'duracion' son los segundos exactos del MP3 y 'palabras' una lista de
+      {texto, inicio, fin} en segundos, útil para subtítulos sincronizados.
     """
     logger.info(f"  [TTS Engine] Preparando locución para: {filename}")
     
@@ -81,22 +207,31 @@ def generate_audio_clip(text, voice_key, filename):
     output_path = os.path.join(TEMP_AUDIO_DIR, filename)
     
     # Si el archivo ya existe (por alguna ejecución trabada anterior), lo borramos
-    if os.path.exists(output_path):
-        try:
-            os.remove(output_path)
-        except OSError:
-            logger.warning(f"  [TTS Engine] No se pudo sobrescribir {output_path}")
+    for viejo in (output_path, ruta_tiempos(output_path)):
+        if os.path.exists(viejo):
+            try:
+                os.remove(viejo)
+            except OSError:
+                logger.warning(f"  [TTS Engine] No se pudo sobrescribir {viejo}")
+
+    # Mismo texto y misma voz: la locución ya existe (y Edge TTS no se vuelve a llamar)
+    tiempos = _recuperar_voz(clean_text, voice_code, output_path)
+    if tiempos:
+        logger.info(f"  [TTS Engine] {filename} recuperado del caché ({tiempos['duracion']}s).")
+        return {"path": output_path, **tiempos}
     
     # 4. Generación con reintentos
     max_retries = 3
     for attempt in range(max_retries):
         try:
             # Ejecutar el loop asíncrono desde código síncrono
-            success = asyncio.run(_async_generate_audio(clean_text, voice_code, output_path))
+            tiempos = asyncio.run(_async_generate_audio(clean_text, voice_code, output_path))
             
-            if success and os.path.exists(output_path) and os.path.getsize(output_path) > 100:
-                logger.info(f"  [TTS Engine] Éxito: {filename} generado correctamente.")
-                return output_path
+            if tiempos and os.path.exists(output_path) and os.path.getsize(output_path) > 100:
+                guardar_tiempos(output_path, tiempos)
+                _guardar_voz(clean_text, voice_code, output_path, tiempos)
+                logger.info(f"  [TTS Engine] Éxito: {filename} generado correctamente ({tiempos['duracion']}s, {len(tiempos['palabras'])} palabras).")
+                return {"path": output_path, **tiempos}
             else:
                 logger.warning(f"  [TTS Engine] Archivo vacío o no generado. Intento {attempt + 1}/{max_retries}")
                 
@@ -110,6 +245,15 @@ def generate_audio_clip(text, voice_key, filename):
     logger.error(f"  [TTS Engine] ERROR FATAL: No se pudo generar audio para {filename} tras {max_retries} intentos.")
     return None
 
+def generate_audio_clip(text, voice_key, filename):
+    """
+    Genera un archivo MP3 a partir de texto.
+    Retorna la ruta absoluta del archivo generado o None si falla.
+    (Los tiempos quedan guardados junto al MP3, ver cargar_tiempos).
+    """
+    clip = generate_audio_with_timings(text, voice_key, filename)
+    return clip["path"] if clip else None
+
 # ==============================================================================
 # PROCESAMIENTO POR LOTES PARA ESCENAS
 # ==============================================================================
@@ -0,0 +1,304 @@
+# -*- coding: utf-8 -*-
+"""
+==============================================================================
+WORKER POOL (Procesos de Trabajo Reciclables)
+==============================================================================
+Antes cada video se producía en un hilo del proceso de Flask y terminaba con un
+gc.collect(): el estado de módulo y la memoria fragmentada se acumulaban en la
+API durante días. Ahora el render (orquestador, TTS, plantillas, FFmpeg) corre
+en un proceso de trabajo aparte, arrancado con 'spawn' (no hereda hilos ni
+candados de la API), y la API solo encola, sube y notifica.
+
+Un proceso de trabajo produce un trabajo a la vez y se recicla (sale y se
+arranca otro en su lugar) tras TRABAJOS_POR_PROCESO trabajos, si al terminar
+uno su RSS pasa de MAX_RSS_PROCESO_MB o si terminó mal. Si el kernel lo mata
+a mitad de un render, falla ese trabajo y la API sigue en pie.
+
+Comunicación con cada proceso:
+- Tubo de control (API -> proceso): el trabajo, "cancelar", "seguir" (fin de
+  una pausa entre escenas) y "salir".
+- Cola de eventos (proceso -> API): copias del registro del trabajo cuando
+  cambia (progreso para GET /jobs/<id>), los pedidos de pausa y el resultado.
+
+Lo que los trabajos comparten entre sí (historial de Pexels, velocidades de
+FFmpeg, renders activos del gobernador, grupos de procesos lanzados) vive en
+archivos (shared_store.py).
+"""
+
+import os
+import copy
+import time
+import queue
+import logging
+import threading
+import multiprocessing
+from config import *
+import ffmpeg_core
+
+logger = logging.getLogger(__name__)
+
+# Cada cuánto el proceso manda el registro si cambió (y la API revisa cancelación)
+INTERVALO_REGISTRO = 1.0
+# Tras pedir la cancelación, cuánto se espera a que el proceso termine solo antes de matarlo
+ESPERA_CANCELACION = 30
+# Cuánto se espera a que un proceso reciclado salga por las buenas
+ESPERA_SALIDA = 10
+# Procesos libres que se mantienen arrancados (los demás salen al terminar)
+PROCESOS_EN_ESPERA = 1
+
+# Campos de etapa que la API cambia durante una pausa (job_registry.marcar_pausa)
+# y que el proceso adopta al seguir, para no contar la pausa como render
+CAMPOS_ETAPA = ("etapa", "etapa_desde", "tiempos_etapas")
+
+_contexto_mp = multiprocessing.get_context("spawn")
+_lock_pool = threading.Lock()
+_libres = []
+_ocupados = []
+
+# ==============================================================================
+# LADO DEL PROCESO DE TRABAJO
+# ==============================================================================
+def _copia(registro):
+    """Copia del registro para mandar a la API (None si el hilo del trabajo justo lo estaba cambiando)."""
+    try:
+        return copy.deepcopy(registro)
+    except RuntimeError:
+        return None
+
+def _producir(main_orchestrator, orden, control, eventos):
+    """Corre un trabajo en un hilo y atiende el tubo de control mientras tanto."""
+    registro = {}
+    cancelacion = threading.Event()
+    pausa_pedida = {"seguir": threading.Event(), "etapa": {}}
+    envio = {"lock": threading.Lock(), "ultimo": None}
+    resultado = {"video_path": None}
+
+    def enviar_registro():
+        with envio["lock"]:
+            copia = _copia(registro)
+            if copia is not None and copia != envio["ultimo"]:
+                envio["ultimo"] = copia
+                eventos.put({"tipo": "registro", "registro": copia})
+
+    def pausa():
+        # Entre escenas (hilo del trabajo): la API decide si cede su turno y avisa cuándo seguir
+        enviar_registro()
+        eventos.put({"tipo": "pausa"})
+        pausa_pedida["seguir"].wait()
+        pausa_pedida["seguir"].clear()
+        registro.update(pausa_pedida["etapa"])
+
+    def correr():
+        try:
+            resultado["video_path"] = main_orchestrator.process_video_payload(
+                orden["payload"], registro, perfil=orden["perfil"], cancelacion=cancelacion,
+                pausa=pausa if orden["pausable"] else None, degradacion=orden["degradacion"]
+            )
+        except Exception as e:
+            logger.error(f"  [Workers] Error no controlado en el proceso {os.getpid()}: {e}")
+
+    hilo = threading.Thread(target=correr, name="render", daemon=True)
+    hilo.start()
+    salir = False
+    while hilo.is_alive():
+        try:
+            if control.poll(INTERVALO_REGISTRO):
+                mensaje = control.recv()
+                if mensaje["tipo"] == "cancelar":
+                    cancelacion.set()
+                elif mensaje["tipo"] == "seguir":
+                    pausa_pedida["etapa"] = mensaje["etapa"]
+                    pausa_pedida["seguir"].set()
+        except (EOFError, OSError):
+            # La API se cayó: no hay a quién entregarle el video
+            cancelacion.set()
+            pausa_pedida["seguir"].set()
+            salir = True
+        enviar_registro()
+    hilo.join()
+    # El hilo ya terminó: nadie más toca el registro, va tal cual
+    eventos.put({"tipo": "resultado", "video_path": resultado["video_path"], "registro": registro})
+    return salir
+
+def _bucle_proceso(control, eventos):
+    """Programa principal del proceso de trabajo: espera trabajos hasta que le pidan salir."""
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - [%(levelname)s] - %(message)s')
+    # Solo los procesos de trabajo cargan el orquestador (y NumPy, Pillow, plantillas...)
+    import main_orchestrator
+    logger.info(f"  [Workers] Proceso {os.getpid()} listo.")
+    while True:
+        try:
+            mensaje = control.recv()
+        except (EOFError, OSError):
+            return
+        if mensaje["tipo"] == "salir":
+            return
+        # Un "cancelar" que llegó cuando el trabajo ya había terminado se ignora
+        if mensaje["tipo"] == "trabajo" and _producir(main_orchestrator, mensaje, control, eventos):
+            return
+
+# ==============================================================================
+# LADO DE LA API
+# ==============================================================================
+def _arrancar():
+    control, control_proceso = _contexto_mp.Pipe()
+    eventos = _contexto_mp.Queue()
+    proceso = _contexto_mp.Process(
+        target=_bucle_proceso, args=(control_proceso, eventos), name="worker-render", daemon=True
+    )
+    proceso.start()
+    control_proceso.close()
+    logger.info(f"  [Workers] Proceso de trabajo {proceso.pid} arrancado.")
+    return {"proceso": proceso, "control": control, "eventos": eventos, "trabajos": 0, "arranque": time.time()}
+
+def _cerrar(trabajador):
+    """Pide al proceso que salga y, si no lo hace a tiempo, lo mata."""
+    proceso = trabajador["proceso"]
+    try:
+        trabajador["control"].send({"tipo": "salir"})
+    except (OSError, ValueError):
+        pass
+    proceso.join(ESPERA_SALIDA)
+    if proceso.is_alive():
+        proceso.terminate()
+        proceso.join()
+    # Los FFmpeg van en su propia sesión: si el proceso murió a mitad de un render, siguen vivos
+    ffmpeg_core.matar_grupos_huerfanos()
+    trabajador["control"].close()
+    trabajador["eventos"].close()
+
+def _tomar():
+    """Un proceso libre (o uno nuevo) para el trabajo que arranca."""
+    with _lock_pool:
+        while _libres:
+            trabajador = _libres.pop()
+            if trabajador["proceso"].is_alive():
+                _ocupados.append(trabajador)
+                return trabajador
+            threading.Thread(target=_cerrar, args=(trabajador,), daemon=True).start()
+    trabajador = _arrancar()
+    with _lock_pool:
+        _ocupados.append(trabajador)
+    return trabajador
+
+def _devolver(trabajador, sano):
+    """Vuelve a dejar libre el proceso, o lo recicla si ya cumplió su ciclo."""
+    proceso = trabajador["proceso"]
+    rss_mb = ffmpeg_core.leer_rss_mb(proceso.pid) if proceso.is_alive() else 0.0
+    motivo = None
+    if not sano or not proceso.is_alive():
+        motivo = "terminó mal"
+    elif trabajador["trabajos"] >= TRABAJOS_POR_PROCESO:
+        motivo = f"{trabajador['trabajos']} trabajos"
+    elif rss_mb >= MAX_RSS_PROCESO_MB:
+        motivo = f"RSS {rss_mb:.0f} MB"
+
+    with _lock_pool:
+        _ocupados.remove(trabajador)
+        if not motivo and len(_libres) < PROCESOS_EN_ESPERA:
+            _libres.append(trabajador)
+            return
+        reponer = motivo is not None and not _libres
+
+    if motivo:
+        logger.info(f"  [Workers] Reciclando el proceso {proceso.pid} ({motivo}).")
+
+    def reciclar():
+        _cerrar(trabajador)
+        # El reemplazo arranca ya (importar el orquestador tarda) y no en el próximo trabajo
+        if reponer:
+            nuevo = _arrancar()
+            with _lock_pool:
+                _libres.append(nuevo)
+
+    threading.Thread(target=reciclar, name="worker-reciclaje", daemon=True).start()
+
+def _actualizar_registro(registro, copia):
+    """Pasa la copia del proceso al registro que lee la API, sin dejarlo vacío en el medio."""
+    registro.update(copia)
+    for clave in [c for c in registro if c not in copia]:
+        registro.pop(clave, None)
+
+def procesar_video(payload, registro=None, perfil=None, cancelacion=None, pausa=None, degradacion=None):
+    """
+    Mismo contrato que main_orchestrator.process_video_payload, pero en un proceso
+    de trabajo. 'registro' se mantiene al día con lo que el proceso publica;
+    'cancelacion' (Event de la API) se le reenvía; 'pausa' se llama aquí, en la
+    API, cada vez que el orquestador llega a un punto de pausa entre escenas.
+    Retorna la ruta del video final o None.
+    """
+    if registro is None:
+        registro = {}
+    trabajador = _tomar()
+    proceso, control, eventos = trabajador["proceso"], trabajador["control"], trabajador["eventos"]
+    sano = False
+    cancelado_en = None
+
+    def avisar_cancelacion():
+        nonlocal cancelado_en
+        if cancelacion is not None and cancelacion.is_set() and cancelado_en is None:
+            control.send({"tipo": "cancelar"})
+            cancelado_en = time.time()
+
+    try:
+        control.send({
+            "tipo": "trabajo", "payload": payload, "perfil": perfil,
+            "degradacion": degradacion, "pausable": pausa is not None
+        })
+        while True:
+            avisar_cancelacion()
+            try:
+                evento = eventos.get(timeout=INTERVALO_REGISTRO)
+            except queue.Empty:
+                if not proceso.is_alive():
+                    logger.error(f"  [Workers] El proceso {proceso.pid} murió a mitad del trabajo (código {proceso.exitcode}).")
+                    return None
+                if cancelado_en and time.time() - cancelado_en > ESPERA_CANCELACION:
+                    logger.error(f"  [Workers] El proceso {proceso.pid} no respondió a la cancelación. Matándolo...")
+                    proceso.terminate()
+                    registro["cancelado"] = True
+                    return None
+                continue
+
+            if evento["tipo"] == "registro":
+                _actualizar_registro(registro, evento["registro"])
+            elif evento["tipo"] == "pausa":
+                pausa()
+                avisar_cancelacion()  # Si lo cancelaron en pausa, que lo sepa antes de seguir
+                control.send({"tipo": "seguir", "etapa": {c: registro[c] for c in CAMPOS_ETAPA if c in registro}})
+            elif evento["tipo"] == "resultado":
+                _actualizar_registro(registro, evento["registro"])
+                trabajador["trabajos"] += 1
+                sano = True
+                return evento["video_path"]
+    except (OSError, EOFError, ValueError) as e:
+        logger.error(f"  [Workers] Se perdió la comunicación con el proceso {proceso.pid}: {e}")
+        return None
+    finally:
+        _devolver(trabajador, sano)
+
+def estado():
+    """Procesos de trabajo vivos: pid, trabajos hechos, RSS actual y si está ocupado."""
+    with _lock_pool:
+        trabajadores = [(t, False) for t in _libres] + [(t, True) for t in _ocupados]
+    return [
+        {
+            "pid": t["proceso"].pid,
+            "busy": ocupado,
+            "jobs_done": t["trabajos"],
+            "rss_mb": round(ffmpeg_core.leer_rss_mb(t["proceso"].pid), 1),
+            "uptime_seconds": round(time.time() - t["arranque"]),
+        }
+        for t, ocupado in trabajadores
+    ]
+
+def iniciar():
+    """Deja un proceso de trabajo arrancado para el primer trabajo (una sola vez)."""
+    ffmpeg_core.olvidar_renders_activos()
+    ffmpeg_core.matar_grupos_huerfanos()  # Los que dejó la ejecución anterior de la API
+    with _lock_pool:
+        if _libres or _ocupados:
+            return
+    trabajador = _arrancar()
+    with _lock_pool:
+        _libres.append(trabajador)
@@ -0,0 +1,169 @@
+# -*- coding: utf-8 -*-
+"""
+==============================================================================
+ZÓCALO RENDERER (Textos Pre-Renderizados en PNG)
+==============================================================================
+El filtro 'drawtext' de FFmpeg vuelve a maquetar y rasterizar el texto en CADA
+fotograma. Este módulo dibuja el zócalo UNA sola vez con Pillow, usando las
+coordenadas de config.LAYOUT_CONFIG y las fuentes Arial incluidas, y lo guarda
+como PNG transparente recortado al tamaño del texto. Las plantillas lo pegan
+como overlay estático. Zócalos idénticos se reutilizan desde el caché.
+"""
+
+import os
+import glob
+import hashlib
+import logging
+import textwrap
+import threading
+from PIL import Image, ImageDraw, ImageFont, PngImagePlugin
+from config import *
+
+logger = logging.getLogger(__name__)
+
+ZOCALOS_DIR = os.path.join(CACHE_DIR, "zocalos")
+os.makedirs(ZOCALOS_DIR, exist_ok=True)
+
+# Fuente incluida en los assets (la misma Arial que usaba drawtext)
+FUENTE_ZOCALO = os.path.join(ASSETS_DIR, "fonts", "ARIAL.TTF")
+
+# Máximo de PNGs en caché; al pasarnos borramos los menos usados
+MAX_ZOCALOS_EN_CACHE = 500
+
+# Subir este número invalida todos los zócalos guardados (cambio de estilo)
+VERSION_ESTILO = 1
+
+_lock_cache = threading.Lock()
+_fuentes = {}
+
+def _fuente(tamano):
+    if tamano not in _fuentes:
+        ruta = FUENTE_ZOCALO if os.path.exists(FUENTE_ZOCALO) else FONT_PATH
+        try:
+            _fuentes[tamano] = ImageFont.truetype(ruta, tamano)
+        except OSError:
+            logger.warning(f"  [Zócalo] No se encontró la fuente {ruta}. Usando la fuente por defecto de Pillow.")
+            _fuentes[tamano] = ImageFont.load_default(size=tamano)
+    return _fuentes[tamano]
+
+# ==============================================================================
+# FORMATEO DE TEXTO (Sin escapes de FFmpeg: Pillow dibuja el texto tal cual)
+# ==============================================================================
+def formatear_lineas(texto, max_chars, max_lineas=3):
+    """Limpia saltos y espacios fantasma y corta el texto en líneas para el zócalo."""
+    if not texto:
+        return []
+
+    texto = texto.replace("\\n", " ").replace("\n", " ").replace("\r", "")
+    texto = " ".join(texto.split())
+    texto = texto.replace("'", "’")
+
+    lineas = textwrap.TextWrapper(width=max_chars).wrap(text=texto)
+    if len(lineas) > max_lineas:
+        lineas = lineas[:max_lineas]
+        lineas[-1] += "..."
+    return lineas
+
+# ==============================================================================
+# DIBUJO Y CACHÉ
+# ==============================================================================
+def _dibujar(lineas, x, y, color, tamano, borde, ancho, alto):
+    """
+    Dibuja las líneas sobre un lienzo transparente del tamaño del video y lo
+    recorta a la caja del texto. Retorna (imagen, x, y) o None si nada queda en pantalla.
+    """
+    fuente = _fuente(tamano)
+    ascenso, descenso = fuente.getmetrics()
+    alto_linea = ascenso + descenso  # Igual que drawtext con line_spacing=0
+
+    lienzo = Image.new("RGBA", (ancho, alto), (0, 0, 0, 0))
+    dibujo = ImageDraw.Draw(lienzo)
+    for i, linea in enumerate(lineas):
+        dibujo.text(
+            (x, y + i * alto_linea), linea, font=fuente, fill=color,
+            stroke_width=borde, stroke_fill="black", anchor="la"
+        )
+
+    caja = lienzo.getbbox()
+    if not caja:
+        return None  # Layouts con coordenadas fuera de pantalla (ej. intros)
+    return lienzo.crop(caja), caja[0], caja[1]
+
+def _ultimo_uso(ruta):
+    """Para ordenar al podar: un PNG que otro proceso ya borró cuenta como el más viejo."""
+    try:
+        return os.path.getmtime(ruta)
+    except OSError:
+        return 0.0
+
+def _podar_cache():
+    archivos = glob.glob(os.path.join(ZOCALOS_DIR, "*.png"))
+    if len(archivos) <= MAX_ZOCALOS_EN_CACHE:
+        return
+    archivos.sort(key=_ultimo_uso)
+    for viejo in archivos[:len(archivos) - MAX_ZOCALOS_EN_CACHE]:
+        try:
+            os.remove(viejo)
+        except OSError:
+            pass
+
+def renderizar_zocalo(texto, layout, max_lineas=3, borde=2, ancho=RESOLUTION_W, alto=RESOLUTION_H):
+    """
+    Devuelve el zócalo de 'texto' con el diseño 'layout' (entrada de LAYOUT_CONFIG)
+    como {path, x, y}: un PNG transparente y la posición donde pegarlo.
+    Las coordenadas de LAYOUT_CONFIG son de RESOLUTION_W x RESOLUTION_H; con otro
+    'ancho' (perfiles draft/high) posición, letra y contorno se escalan igual.
+    Retorna None si no hay texto visible.
+    """
+    lineas = formatear_lineas(texto, layout["max_letras_por_linea"], max_lineas)
+    if not lineas:
+        return None
+
+    escala = ancho / RESOLUTION_W
+    x, y = round(layout["texto_x"] * escala), round(layout["texto_y"] * escala)
+    color, tamano = layout["color"], max(1, round(layout["font_size"] * escala))
+    borde = round(borde * escala) if borde else 0
+
+    firma = "|".join([
+        "\n".join(lineas), str(x), str(y), color, str(tamano), str(borde),
+        f"{ancho}x{alto}", os.path.basename(FUENTE_ZOCALO), f"v{VERSION_ESTILO}"
+    ])
+    clave = hashlib.sha1(firma.encode("utf-8")).hexdigest()[:16]
+    ruta = os.path.join(ZOCALOS_DIR, f"{clave}.png")
+
+    with _lock_cache:
+        # Caché: el PNG guarda su posición en un bloque de texto interno
+        if os.path.exists(ruta):
+            try:
+                with Image.open(ruta) as png:
+                    pos_x, pos_y = (int(v) for v in png.text["posicion"].split(","))
+                os.utime(ruta)  # Marca de uso reciente para la poda
+                return {"path": ruta, "x": pos_x, "y": pos_y}
+            except Exception:
+                logger.warning(f"  [Zócalo] PNG de caché dañado, se vuelve a dibujar: {ruta}")
+
+        dibujado = _dibujar(lineas, x, y, color, tamano, borde, ancho, alto)
+        if not dibujado:
+            return None
+        imagen, pos_x, pos_y = dibujado
+
+        metadatos = PngImagePlugin.PngInfo()
+        metadatos.add_text("posicion", f"{pos_x},{pos_y}")
+        temporal = f"{ruta}.{os.getpid()}.tmp"  # Otro proceso de trabajo puede estar dibujando el mismo
+        imagen.save(temporal, format="PNG", pnginfo=metadatos)
+        os.replace(temporal, ruta)
+        _podar_cache()
+
+    return {"path": ruta, "x": pos_x, "y": pos_y}
+
+def filtro_zocalo(zocalo, in_name, out_name):
+    """
+    Cadena de filtro que pega el PNG del zócalo (leído una sola vez con 'movie')
+    sobre el video. 'overlay' repite el último cuadro del PNG durante toda la escena.
+    """
+    # Escapamos los dos puntos y barras para que FFmpeg en Windows no explote
+    png_safe = str(zocalo["path"]).replace('\\', '/').replace(':', '\\:')
+    return (
+        f"movie='{png_safe}'[{out_name}_png];"
+        f"[{in_name}][{out_name}_png]overlay={zocalo['x']}:{zocalo['y']}[{out_name}];"
+    )